@@ -1,95 +1,299 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import String, func, select, tuple_, type_coerce
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
+from fastapi_app.db.database import GROUP_COMMIT_ENABLED
+from fastapi_app.db.group_commit import get_group_commit_writer
 from fastapi_app.db.session import get_db
-from fastapi_app.services.dream_analyzer import DreamAnalyzer
+from fastapi_app.services.dream_analyzer import DreamAnalyzer, BULK_CHUNK_SIZE
 from fastapi_app.services.dream_counselor import counseling_note
-from fastapi_app.models.dream import Dream, DreamAnalysis
+from fastapi_app.services.inference_executor import get_inference_executor
+from fastapi_app.services.daily_rollup import add_to_rollup, month_range, read_month
+from fastapi_app.services.user_version import bump_versions, etag_for, get_version, is_not_modified
+from fastapi_app.models.dream import FACETS, Dream, DreamAnalysis, DreamDailyEmotion
 from fastapi_app.models.image import Image
-from fastapi_app.schemas.dream import DreamAnalyzeRes, CalendarDayEmotion, DreamDetail
+from fastapi_app.schemas.dream import (
+    DreamAnalyzeRes, CalendarDayEmotion, DreamDetail, DreamHistoryItem, DreamHistoryPage, FacetTrendDay,
+)
 from fastapi_app.services.dream_analyzer import analyze_dream_with_e5
 
 
 router = APIRouter(tags=["dreams"])
 
+# 배치 분석 요청 한 번에 받을 최대 개수
+BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "256"))
+
+# 히스토리 페이지 크기 / 미리보기 길이
+HISTORY_DEFAULT_LIMIT = 20
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "100"))
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", "80"))
+
 class AnalyzeReq(BaseModel):
     text: str
     user_id: Optional[str] = None
     date: Optional[str] = None  # "YYYY-MM-DD"
 
-@router.post("/analyze")
-def analyze(req: AnalyzeReq, db: Session = Depends(get_db)):
-    res = DreamAnalyzer.get().analyze(req.text)
+class AnalyzeBatchReq(BaseModel):
+    items: List[AnalyzeReq]
+    counseling: bool = False  # True면 항목마다 counseling_note 생성
+
+def _parse_day(value: str) -> date:
+    """"YYYY-MM-DD" → date (형식이 틀리면 ValueError)"""
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _parse_day_param(value: str, name: str = "date") -> date:
+    try:
+        return _parse_day(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"invalid {name}: {value!r} (expected YYYY-MM-DD)")
 
+def _new_dream(req: AnalyzeReq, stt_text: Optional[str] = None) -> Dream:
     # 날짜 기본값: 요청에 없으면 오늘 날짜
-    date_str = req.date or datetime.now().date().isoformat()
+    day = _parse_day(req.date) if req.date else datetime.now().date()
 
     # user_id 기본값: 요청에 없으면 "test_user" (지금 앱에서 쓰는 값이랑 맞춰둠)
     user_id = req.user_id or "test_user"
 
     # Dream 필수 필드 채워 저장
-    dream = Dream(
+    # 음성 입력(/dreams/voice)이면 STT 결과를 stt_text 에
+    return Dream(
         user_id=user_id,
         text=req.text,
-        input_type="text",
-        input_text=req.text,
-        date=date_str,
+        input_type="voice" if stt_text is not None else "text",
+        input_text=None if stt_text is not None else req.text,
+        stt_text=stt_text,
+        date=day,
     )
-    db.add(dream)
-    db.flush()  # dream.id 확보
 
-    analysis = DreamAnalysis.from_result(dream_id=dream.id, result=res)
-    db.add(analysis)
-    db.commit()
-    db.refresh(analysis)
+def _validate_item(req: AnalyzeReq) -> Optional[str]:
+    """배치 항목 검증: 문제가 있으면 에러 메시지, 없으면 None"""
+    if not req.text or not req.text.strip():
+        return "text is empty"
+    if req.date is not None:
+        try:
+            _parse_day(req.date)
+        except ValueError:
+            return f"invalid date: {req.date!r} (expected YYYY-MM-DD)"
+    return None
+
+def _analyze_one(text: str) -> dict:
+    return DreamAnalyzer.get().analyze(text)
 
-    res["dream_id"] = dream.id
-    res["saved_analysis_id"] = analysis.id
+def _rollup_item(dream: Dream, analysis: DreamAnalysis):
+    return (dream.user_id, dream.date, analysis.pos_prob, analysis.neg_prob)
+
+def _fill_result(req: AnalyzeReq, res: dict, dream_id: int, analysis_id: int) -> dict:
+    res["dream_id"] = dream_id
+    res["saved_analysis_id"] = analysis_id
     res["counseling_note"] = counseling_note(
         req.text,
         res["valence"],
         res["facets"]["probs"],  # ← 확률 dict만 전달
     )
-
     return res
 
+def _stage_analysis(db: Session, req: AnalyzeReq, res: dict, stt_text: Optional[str] = None):
+    """Dream + DreamAnalysis + 롤업을 flush 까지만 (commit 은 호출하는 쪽). (dream_id, analysis_id) 반환"""
+    dream = _new_dream(req, stt_text)
+    db.add(dream)
+    db.flush()  # dream.id 확보
+
+    analysis = DreamAnalysis.from_result(dream_id=dream.id, result=res)
+    db.add(analysis)
+    dream.latest_analysis = analysis
+    # 캘린더 롤업 / 유저 데이터 버전도 같은 트랜잭션에서 갱신
+    add_to_rollup(db, [_rollup_item(dream, analysis)])
+    bump_versions(db, [dream.user_id])
+    db.flush()  # analysis.id + latest_analysis_id
+    return dream.id, analysis.id
+
+def _save_analysis(db: Session, req: AnalyzeReq, res: dict) -> dict:
+    dream_id, analysis_id = _stage_analysis(db, req, res)
+    db.commit()
+    return _fill_result(req, res, dream_id, analysis_id)
+
+@router.post("/analyze")
+async def analyze(req: AnalyzeReq, db: Session = Depends(get_db)):
+    if req.date is not None:
+        _parse_day_param(req.date)
+
+    # 모델 추론은 전용 inference executor 에서 (포화 시 503 + Retry-After)
+    res = await get_inference_executor().run(_analyze_one, req.text)
+
+    if GROUP_COMMIT_ENABLED:
+        # 동시 요청들과 한 트랜잭션으로 묶어서 저장, commit 이 끝난 뒤에 id 를 받음
+        dream_id, analysis_id = await asyncio.wrap_future(
+            get_group_commit_writer().submit(_stage_analysis, req, res)
+        )
+        return await run_in_threadpool(_fill_result, req, res, dream_id, analysis_id)
+
+    # DB 저장은 기본 스레드풀에서 (이벤트 루프 블로킹 방지)
+    return await run_in_threadpool(_save_analysis, db, req, res)
+
+def _infer_batch(req: AnalyzeBatchReq, valid: List[int], out: List[dict]) -> dict:
+    """배치 추론 (청크 단위로 실패해도 나머지는 계속). {index: result} 반환"""
+    analyzer = DreamAnalyzer.get()
+    results: dict = {}
+    for c in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[c : c + BULK_CHUNK_SIZE]
+        try:
+            chunk_res = analyzer.analyze_many([req.items[i].text for i in chunk])
+        except Exception as e:
+            for i in chunk:
+                out[i]["error"] = f"analysis failed: {e}"
+            continue
+        results.update(zip(chunk, chunk_res))
+    return results
+
+def _fill_batch_results(req: AnalyzeBatchReq, results: dict, ids: dict, out: List[dict]):
+    for i, res in results.items():
+        res["dream_id"], res["saved_analysis_id"] = ids[i]
+        if req.counseling:
+            res["counseling_note"] = counseling_note(
+                req.items[i].text,
+                res["valence"],
+                res["facets"]["probs"],
+            )
+        out[i] = {"index": i, "ok": True, "result": res}
+
+def _batch_summary(out: List[dict]) -> dict:
+    succeeded = sum(1 for o in out if o["ok"])
+    return {
+        "items": out,
+        "succeeded": succeeded,
+        "failed": len(out) - succeeded,
+    }
+
+def _save_batch(db: Session, req: AnalyzeBatchReq, results: dict, out: List[dict]):
+    """Dream / DreamAnalysis 를 한 트랜잭션으로 저장하고 out 을 채움"""
+    if results:
+        order = sorted(results)
+        try:
+            dreams = {i: _new_dream(req.items[i]) for i in order}
+            db.add_all(dreams.values())
+            db.flush()  # dream.id 확보
+
+            analyses = {
+                i: DreamAnalysis.from_result(dream_id=dreams[i].id, result=results[i])
+                for i in order
+            }
+            db.add_all(analyses.values())
+            for i in order:
+                dreams[i].latest_analysis = analyses[i]
+            # 캘린더 롤업 / 유저 데이터 버전도 같은 트랜잭션에서 갱신
+            add_to_rollup(db, [_rollup_item(dreams[i], analyses[i]) for i in order])
+            bump_versions(db, [dreams[i].user_id for i in order])
+            db.flush()  # analysis.id + latest_analysis_id
+
+            # commit 하면 객체가 expire 되어 .id 마다 SELECT 가 나가므로 그 전에 id 를 받아 둠
+            ids = {i: (dreams[i].id, analyses[i].id) for i in order}
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for i in order:
+                out[i]["error"] = f"save failed: {e}"
+            return
+
+        _fill_batch_results(req, results, ids, out)
+
+def _validate_batch(req: AnalyzeBatchReq):
+    """개수 제한 + 항목 검증 → (항목별 결과 틀, 유효한 인덱스들)"""
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"too many items: {len(req.items)} > {BATCH_MAX_ITEMS}",
+        )
+
+    out: List[dict] = [{"index": i, "ok": False} for i in range(len(req.items))]
+    valid: List[int] = []
+    for i, item in enumerate(req.items):
+        err = _validate_item(item)
+        if err:
+            out[i]["error"] = err
+        else:
+            valid.append(i)
+    return out, valid
+
+@router.post("/analyze/batch")
+async def analyze_batch(req: AnalyzeBatchReq, db: Session = Depends(get_db)):
+    """
+    여러 꿈을 한 번에 분석/저장 (임포터, 안드로이드 오프라인 동기화용).
+    - 유효한 항목만 모아서 몇 번의 배치 encode_texts + 분류기 패스로 처리
+    - Dream / DreamAnalysis 는 한 트랜잭션으로 저장
+    - 항목별 결과 또는 에러를 입력 순서대로 반환
+    """
+    # 1) 항목 검증
+    out, valid = _validate_batch(req)
+
+    # 2) 추론은 inference executor, 3) 저장은 기본 스레드풀
+    results = await get_inference_executor().run(_infer_batch, req, valid, out)
+    await run_in_threadpool(_save_batch, db, req, results, out)
+
+    return _batch_summary(out)
+
+def _parse_month_param(month: str) -> str:
+    try:
+        month_range(month)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"invalid month: {month!r} (expected YYYY-MM)")
+    return month
+
+# =========================
+# ETag (유저 데이터 버전 기반 조건부 조회)
+# =========================
+# 버전은 반드시 데이터보다 "먼저" 읽는다: 사이에 쓰기가 끼어들면
+# 더 새로운 데이터에 옛 ETag 가 붙을 뿐이고, 다음 요청에서 버전이 달라 다시 받게 된다.
+
+def _cache_headers(etag: str) -> dict:
+    # 클라이언트가 캐시해 두되 매번 If-None-Match 로 재검증하게
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def _conditional(request: Request, response: Response, kind: str, version: str) -> Optional[Response]:
+    """변경이 없으면 304 응답, 있으면 응답 헤더에 ETag 를 달고 None"""
+    etag = etag_for(kind, version)
+    if is_not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    response.headers.update(_cache_headers(etag))
+    return None
+
 @router.get("/calendar", response_model=List[CalendarDayEmotion])
 def get_calendar_emotions(
     user_id: str,
     month: str,  # "2025-11" 이런 형태
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     """
     특정 유저의 특정 month(YYYY-MM)에 대해
     날짜별 감정 평균을 캘린더용으로 반환.
+    분석 저장 시 누적해 둔 dream_daily_emotions 롤업을 (user_id, day) 범위로 읽음.
+    If-None-Match 가 현재 ETag 와 같으면 롤업을 읽지 않고 304.
     """
+    month = _parse_month_param(month)
+    not_modified = _conditional(request, response, "calendar", get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
 
-    like_pattern = f"{month}-%"  # "2025-11-%"
-
-    q = (
-        db.query(
-            Dream.date.label("date"),
-            func.avg(DreamAnalysis.pos_prob).label("avg_pos"),
-            func.avg(DreamAnalysis.neg_prob).label("avg_neg"),
-            func.count(Dream.id).label("dream_count"),
-        )
-        .join(DreamAnalysis, DreamAnalysis.dream_id == Dream.id)
-        .filter(Dream.user_id == user_id)
-        .filter(Dream.date.like(like_pattern))
-        .group_by(Dream.date)
-        .order_by(Dream.date)
-    )
+    return _calendar_days(read_month(db, user_id, month))
 
-    rows = q.all()
+def _calendar_days(rows: List[DreamDailyEmotion]) -> List[CalendarDayEmotion]:
     result: List[CalendarDayEmotion] = []
 
     for r in rows:
-        avg_pos = float(r.avg_pos or 0.0)
-        avg_neg = float(r.avg_neg or 0.0)
+        if not r.dream_count:
+            continue
+        avg_pos = float(r.pos_sum) / r.dream_count
+        avg_neg = float(r.neg_sum) / r.dream_count
 
         # 간단한 라벨링 규칙
         if avg_pos >= 0.6 and avg_neg <= 0.4:
@@ -103,7 +307,7 @@ def get_calendar_emotions(
 
         result.append(
             CalendarDayEmotion(
-                date=r.date,
+                date=r.day.isoformat(),
                 avg_positive=avg_pos,
                 avg_negative=avg_neg,
                 score=avg_pos,  # 0(빨강) ~ 1(초록)로 쓰면 됨
@@ -118,30 +322,99 @@ def get_calendar_emotions(
 def get_dreams_by_date(
     user_id: str,
     date: str,  # "YYYY-MM-DD"
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     """
     특정 유저의 특정 날짜에 해당하는 모든 꿈 + 분석 + 이미지들을 반환.
+    꿈 개수와 상관없이 쿼리 2번: (꿈 + 최신 분석 JOIN) 1번, 이미지 IN 조회 1번.
+    If-None-Match 가 현재 ETag 와 같으면 조회 없이 304.
+    """
+    day = _parse_day_param(date)
+    not_modified = _conditional(request, response, "by-date", get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+
+    dreams = db.execute(_by_date_stmt(user_id, day)).scalars().all()
+    return _dream_details(dreams)
+
+def _facet_trend_stmt(user_id: str, month: str):
+    """
+    월간 facet 추이: 날짜별 최신 분석의 facet 평균 확률 / 라벨 1 개수.
+    (user_id, date) 인덱스 범위 스캔 + latest_analysis_id PK 조인, 집계는 전부 DB 에서.
+    """
+    start, end = month_range(month)
+    cols = []
+    for name in FACETS:
+        cols.append(func.avg(getattr(DreamAnalysis, f"{name}_prob")).label(f"{name}_avg"))
+        cols.append(func.sum(getattr(DreamAnalysis, f"{name}_label")).label(f"{name}_high"))
+    return (
+        select(Dream.date, func.count(Dream.id).label("dream_count"), *cols)
+        .join(DreamAnalysis, DreamAnalysis.id == Dream.latest_analysis_id)
+        .where(Dream.user_id == user_id, Dream.date >= start, Dream.date < end)
+        .group_by(Dream.date)
+        .order_by(Dream.date)
+    )
+
+def _facet_trend_days(rows) -> List[FacetTrendDay]:
+    return [
+        FacetTrendDay(
+            date=r.date.isoformat(),
+            dream_count=r.dream_count,
+            avg_probs={
+                name: float(getattr(r, f"{name}_avg"))
+                for name in FACETS if getattr(r, f"{name}_avg") is not None
+            },
+            high_counts={name: int(getattr(r, f"{name}_high") or 0) for name in FACETS},
+        )
+        for r in rows
+    ]
+
+@router.get("/facets/trend", response_model=List[FacetTrendDay])
+def get_facet_trend(
+    user_id: str,
+    month: str,  # "2025-11"
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
     """
-    dreams = (
-        db.query(Dream)
-        .filter(Dream.user_id == user_id)
-        .filter(Dream.date == date)
-        .all()
+    특정 유저의 month(YYYY-MM) 동안 날짜별 facet(공격성/친밀감/성적 요소) 추이.
+    """
+    month = _parse_month_param(month)
+    not_modified = _conditional(request, response, "facet-trend", get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+
+    return _facet_trend_days(db.execute(_facet_trend_stmt(user_id, month)).all())
+
+def _by_date_stmt(user_id: str, day: date):
+    """by-date 조회 SELECT (동기 / 비동기 세션 공용)"""
+    return (
+        select(Dream)
+        .options(
+            joinedload(Dream.latest_analysis),
+            selectinload(Dream.images),
+        )
+        .where(Dream.user_id == user_id, Dream.date == day)
     )
 
+def _dream_details(dreams: List[Dream]) -> List[DreamDetail]:
     result: List[DreamDetail] = []
 
     for d in dreams:
-        # 분석은 꿈당 1개라고 가정, 여러 개면 마지막(최신) 사용
-        analysis = d.analyses[-1] if d.analyses else None
+        # 최신 분석 포인터 사용 (analyses 컬렉션은 로딩하지 않음)
+        analysis = d.latest_analysis
 
         if analysis:
             valence = {
                 "positive": float(analysis.pos_prob),
                 "negative": float(analysis.neg_prob),
             }
-            facets = dict(analysis.facets_json or {})
+            # facets_json 은 {"labels": ..., "probs": ...} 구조 → 응답에는 확률만
+            facets_json = analysis.facets_json or {}
+            facets = dict(facets_json.get("probs", facets_json))
             nlg_notes = list(analysis.notes_json or [])
         else:
             valence = {"positive": 0.5, "negative": 0.5}
@@ -158,7 +431,7 @@ def get_dreams_by_date(
         result.append(
             DreamDetail(
                 id=d.id,
-                date=d.date,
+                date=d.date.isoformat() if d.date else None,
                 text=d.text,
                 emotion=d.emotion,
                 interpretation=d.interpretation,
@@ -170,3 +443,103 @@ def get_dreams_by_date(
         )
 
     return result
+
+# =========================
+# 히스토리 (keyset 페이지네이션)
+# =========================
+
+def _created_key(dialect_name: str):
+    """
+    keyset 비교에 쓰는 created_at 표현.
+    SQLite 는 DATETIME 을 텍스트로 저장하고 server_default(CURRENT_TIMESTAMP) 와
+    SQLAlchemy 가 쓰는 값의 형식(마이크로초 유무)이 달라서,
+    datetime 으로 다시 바인딩하면 경계 행이 중복/누락될 수 있다.
+    → 저장된 문자열 그대로 비교 (SQL 은 같으므로 인덱스도 그대로 사용)
+    """
+    if dialect_name == "sqlite":
+        return type_coerce(Dream.created_at, String)
+    return Dream.created_at
+
+def _encode_cursor(created, dream_id: int) -> str:
+    raw = created if isinstance(created, str) else created.isoformat()
+    payload = json.dumps({"t": raw, "i": dream_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, dialect_name: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        created, dream_id = payload["t"], int(payload["i"])
+        if dialect_name != "sqlite":
+            created = datetime.fromisoformat(created)
+        return created, dream_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="invalid cursor")
+
+def _history_stmt(dialect_name: str, user_id: str, cursor: Optional[str], limit: int):
+    """최신순 (created_at DESC, id DESC), limit + 1 행 (다음 페이지 존재 여부 확인용)"""
+    created_key = _created_key(dialect_name)
+    thumbnail = (
+        select(Image.image_url)
+        .where(Image.dream_id == Dream.id)
+        .order_by(Image.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Dream.id,
+            Dream.date,
+            func.substr(Dream.text, 1, HISTORY_PREVIEW_CHARS).label("preview"),
+            created_key.label("created_key"),
+            DreamAnalysis.pos_prob,
+            DreamAnalysis.neg_prob,
+            thumbnail.label("thumbnail"),
+        )
+        .outerjoin(DreamAnalysis, DreamAnalysis.id == Dream.latest_analysis_id)
+        .where(Dream.user_id == user_id)
+        .order_by(created_key.desc(), Dream.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created, dream_id = _decode_cursor(cursor, dialect_name)
+        # 마지막으로 본 행보다 "뒤"만 → 인덱스 범위 스캔이라 페이지 깊이와 상관없이 일정
+        stmt = stmt.where(tuple_(created_key, Dream.id) < tuple_(created, dream_id))
+    return stmt
+
+def _history_page(rows, limit: int) -> DreamHistoryPage:
+    items = [
+        DreamHistoryItem(
+            id=r.id,
+            date=r.date.isoformat() if r.date else None,
+            preview=r.preview or "",
+            positive=r.pos_prob,
+            negative=r.neg_prob,
+            thumbnail=("/" + r.thumbnail.lstrip("/")) if r.thumbnail else None,
+        )
+        for r in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last.created_key, last.id)
+    return DreamHistoryPage(items=items, next_cursor=next_cursor)
+
+def _check_limit(limit: int) -> int:
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {HISTORY_MAX_LIMIT}")
+    return limit
+
+@router.get("/history", response_model=DreamHistoryPage)
+def get_dream_history(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    db: Session = Depends(get_db),
+):
+    """
+    히스토리 화면용 꿈 목록 (최신순).
+    다음 페이지는 응답의 next_cursor 를 cursor 로 넘겨서 요청.
+    """
+    limit = _check_limit(limit)
+    stmt = _history_stmt(db.get_bind().dialect.name, user_id, cursor, limit)
+    return _history_page(db.execute(stmt).all(), limit)
@@ -0,0 +1,196 @@
+"""
+dreams 라우트의 AsyncSession 버전 (DB_ASYNC=1 일 때 main.py 에서 dreams.py 대신 등록)
+
+동기 버전은 DB 작업마다 기본 스레드풀 스레드를 하나씩 잡고 있어서
+동시 요청 수가 스레드풀 크기에 묶인다.
+여기서는 aiosqlite / asyncpg 로 이벤트 루프에서 바로 await 하고,
+요청 / 응답 형식과 검증 / 응답 조립 로직은 dreams.py 의 것을 그대로 쓴다.
+DB_GROUP_COMMIT=1 이면 /analyze 저장은 dreams.py 와 같이 group commit writer 로 보낸다
+(writer 는 동기 세션 스레드 하나라서 AsyncSession 은 쓰지 않음).
+"""
+
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_app.api.dreams import (
+    HISTORY_DEFAULT_LIMIT,
+    AnalyzeBatchReq,
+    AnalyzeReq,
+    _analyze_one,
+    _batch_summary,
+    _by_date_stmt,
+    _calendar_days,
+    _check_limit,
+    _conditional,
+    _dream_details,
+    _facet_trend_days,
+    _facet_trend_stmt,
+    _fill_batch_results,
+    _fill_result,
+    _history_page,
+    _history_stmt,
+    _infer_batch,
+    _new_dream,
+    _parse_day_param,
+    _parse_month_param,
+    _rollup_item,
+    _stage_analysis,
+    _validate_batch,
+)
+from fastapi_app.db.database import GROUP_COMMIT_ENABLED
+from fastapi_app.db.group_commit import get_group_commit_writer
+from fastapi_app.db.session import get_async_db
+from fastapi_app.models.dream import DreamAnalysis
+from fastapi_app.schemas.dream import CalendarDayEmotion, DreamDetail, DreamHistoryPage, FacetTrendDay
+from fastapi_app.services.daily_rollup import add_to_rollup, month_stmt
+from fastapi_app.services.inference_executor import get_inference_executor
+from fastapi_app.services.user_version import bump_versions, version_stmt, version_token
+
+
+router = APIRouter(tags=["dreams"])
+
+
+async def _get_version(db: AsyncSession, user_id: str) -> str:
+    return version_token((await db.execute(version_stmt(user_id))).all(), user_id)
+
+
+@router.post("/analyze")
+async def analyze(req: AnalyzeReq, db: AsyncSession = Depends(get_async_db)):
+    if req.date is not None:
+        _parse_day_param(req.date)
+
+    # 모델 추론은 전용 inference executor 에서 (포화 시 503 + Retry-After)
+    res = await get_inference_executor().run(_analyze_one, req.text)
+
+    if GROUP_COMMIT_ENABLED:
+        # 동시 요청들과 한 트랜잭션으로 묶어서 저장, commit 이 끝난 뒤에 id 를 받음
+        dream_id, analysis_id = await asyncio.wrap_future(
+            get_group_commit_writer().submit(_stage_analysis, req, res)
+        )
+        return await run_in_threadpool(_fill_result, req, res, dream_id, analysis_id)
+
+    dream = _new_dream(req)
+    db.add(dream)
+    await db.flush()  # dream.id 확보
+
+    analysis = DreamAnalysis.from_result(dream_id=dream.id, result=res)
+    db.add(analysis)
+    dream.latest_analysis = analysis
+    # 캘린더 롤업 / 유저 데이터 버전도 같은 트랜잭션에서 갱신 (동기 헬퍼를 그대로 사용)
+    await db.run_sync(add_to_rollup, [_rollup_item(dream, analysis)])
+    await db.run_sync(bump_versions, [dream.user_id])
+    await db.commit()
+
+    # counseling_note 는 OpenAI 호출이 있을 수 있어서 스레드풀에서
+    return await run_in_threadpool(_fill_result, req, res, dream.id, analysis.id)
+
+
+@router.post("/analyze/batch")
+async def analyze_batch(req: AnalyzeBatchReq, db: AsyncSession = Depends(get_async_db)):
+    """dreams.py 의 /analyze/batch 와 동일 (저장만 AsyncSession 한 트랜잭션)"""
+    # 1) 항목 검증
+    out, valid = _validate_batch(req)
+
+    # 2) 추론은 inference executor
+    results = await get_inference_executor().run(_infer_batch, req, valid, out)
+    if not results:
+        return _batch_summary(out)
+
+    # 3) 저장
+    order = sorted(results)
+    dreams = {i: _new_dream(req.items[i]) for i in order}
+    db.add_all(dreams.values())
+    try:
+        await db.flush()  # dream.id 확보
+
+        analyses = {
+            i: DreamAnalysis.from_result(dream_id=dreams[i].id, result=results[i])
+            for i in order
+        }
+        db.add_all(analyses.values())
+        for i in order:
+            dreams[i].latest_analysis = analyses[i]
+        await db.run_sync(add_to_rollup, [_rollup_item(dreams[i], analyses[i]) for i in order])
+        await db.run_sync(bump_versions, [dreams[i].user_id for i in order])
+        await db.flush()  # analysis.id + latest_analysis_id
+
+        # commit 뒤에는 객체가 expire 되므로 그 전에 id 를 받아 둠
+        ids = {i: (dreams[i].id, analyses[i].id) for i in order}
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        for i in order:
+            out[i]["error"] = f"save failed: {e}"
+        return _batch_summary(out)
+
+    await run_in_threadpool(_fill_batch_results, req, results, ids, out)
+    return _batch_summary(out)
+
+
+@router.get("/calendar", response_model=List[CalendarDayEmotion])
+async def get_calendar_emotions(
+    user_id: str,
+    month: str,  # "2025-11" 이런 형태
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    month = _parse_month_param(month)
+    not_modified = _conditional(request, response, "calendar", await _get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+
+    rows = (await db.execute(month_stmt(user_id, month))).scalars().all()
+    return _calendar_days(rows)
+
+
+@router.get("/facets/trend", response_model=List[FacetTrendDay])
+async def get_facet_trend(
+    user_id: str,
+    month: str,  # "2025-11"
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    month = _parse_month_param(month)
+    not_modified = _conditional(request, response, "facet-trend", await _get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+
+    rows = (await db.execute(_facet_trend_stmt(user_id, month))).all()
+    return _facet_trend_days(rows)
+
+
+@router.get("/by-date", response_model=List[DreamDetail])
+async def get_dreams_by_date(
+    user_id: str,
+    date: str,  # "YYYY-MM-DD"
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    day = _parse_day_param(date)
+    not_modified = _conditional(request, response, "by-date", await _get_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+
+    # 관계는 전부 eager 로딩 (비동기 세션에서는 lazy load 불가)
+    stmt = _by_date_stmt(user_id, day)
+    dreams = (await db.execute(stmt)).scalars().all()
+    return _dream_details(dreams)
+
+
+@router.get("/history", response_model=DreamHistoryPage)
+async def get_dream_history(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+):
+    limit = _check_limit(limit)
+    stmt = _history_stmt(db.bind.dialect.name, user_id, cursor, limit)
+    return _history_page((await db.execute(stmt)).all(), limit)
@@ -0,0 +1,125 @@
+"""
+/dreams/export, /dreams/import (NDJSON 스트리밍)
+
+DB_ASYNC 설정과 상관없이 항상 등록되는 라우터.
+형식과 배치 처리는 services/dream_transfer.py 참고.
+"""
+
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from fastapi_app.db.database import SessionLocal
+from fastapi_app.db.session import get_db
+from fastapi_app.services.dream_analyzer import DreamAnalyzer
+from fastapi_app.services.dream_transfer import (
+    ANALYZE_MODES,
+    IMPORT_BATCH,
+    RecordError,
+    export_lines,
+    import_batch,
+    needs_analysis,
+    parse_line,
+)
+from fastapi_app.services.inference_executor import get_inference_executor
+
+
+router = APIRouter(tags=["dreams"])
+
+NDJSON = "application/x-ndjson"
+
+# 가져오기 응답에 담을 에러 줄 수 상한
+MAX_REPORTED_ERRORS = 100
+
+
+def _export_stream(user_id: Optional[str]):
+    # 스트리밍이 끝날 때까지 세션을 잡고 있어야 하므로 요청 의존성 대신 직접 생성
+    with SessionLocal() as db:
+        yield from export_lines(db, user_id)
+
+
+@router.get("/export")
+def export_dreams(user_id: Optional[str] = None):
+    """
+    꿈 + 분석 + 이미지 레코드를 NDJSON 으로 스트리밍 (user_id 가 없으면 전체).
+    """
+    return StreamingResponse(
+        _export_stream(user_id),
+        media_type=NDJSON,
+        headers={"Content-Disposition": 'attachment; filename="dreams.ndjson"'},
+    )
+
+
+async def _aiter_lines(request: Request) -> AsyncIterator[str]:
+    """요청 바디를 청크 단위로 받으면서 줄 단위로 잘라서 돌려줌 (전체를 메모리에 올리지 않음)."""
+    buf = b""
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace")
+    if buf:
+        yield buf.decode("utf-8", errors="replace")
+
+
+def _analyze_texts(texts: List[str]) -> List[dict]:
+    return DreamAnalyzer.get().analyze_many(texts)
+
+
+@router.post("/import")
+async def import_dreams(
+    request: Request,
+    analyze: str = "missing",
+    user_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    NDJSON 바디를 스트리밍으로 읽어서 IMPORT_BATCH 개씩 저장.
+    - analyze: missing(분석 없는 꿈만 추론) / all(전부 재추론) / none(추론 안 함)
+    - user_id: 지정하면 모든 꿈을 이 유저로 저장
+    잘못된 줄은 건너뛰고 줄 번호와 함께 errors 에 담아 돌려준다.
+    """
+    if analyze not in ANALYZE_MODES:
+        raise HTTPException(status_code=422, detail=f"invalid analyze: {analyze!r} (expected one of {ANALYZE_MODES})")
+
+    totals: Dict[str, int] = {"dreams": 0, "analyses": 0, "images": 0, "inferred": 0}
+    errors: List[dict] = []
+    error_count = 0
+
+    async def flush(batch: List[dict]):
+        todo = needs_analysis(batch, analyze)
+        inferred = {}
+        if todo:
+            # 추론은 inference executor (포화 시 503 + Retry-After, 이미 저장된 배치는 유지)
+            results = await get_inference_executor().run(
+                _analyze_texts, [batch[i]["dream"]["text"] for i in todo]
+            )
+            inferred = dict(zip(todo, results))
+        saved = await run_in_threadpool(import_batch, db, batch, inferred, analyze, user_id)
+        for k, v in saved.items():
+            totals[k] += v
+
+    batch: List[dict] = []
+    lineno = 0
+    async for line in _aiter_lines(request):
+        lineno += 1
+        try:
+            rec = parse_line(line)
+        except RecordError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": lineno, "error": str(e)})
+            continue
+        if rec is None:
+            continue
+        batch.append(rec)
+        if len(batch) >= IMPORT_BATCH:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    return {**totals, "error_count": error_count, "errors": errors}
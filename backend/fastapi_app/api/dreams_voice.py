@@ -0,0 +1,102 @@
+"""
+/dreams/voice (음성 → 분석 → 저장 한 번에)
+
+지금 앱은 POST /stt → POST /dreams/analyze → POST /images/image/generate 를
+순서대로 왕복한다. 여기서는 음성 하나를 받아서
+  1) STT (stt_pool 워커, 긴 음성은 병렬 조각 전사)
+  2) 분석 (inference executor)
+  3) 저장 (dreams.input_type="voice", stt_text 채움, 롤업 / latest 포인터 / 유저 버전)
+     + counseling_note 는 저장과 동시에
+  4) generate_image=true 면 꿈이 저장된 뒤 이미지 생성을 전용 executor 에 제출하고
+     끝나면 Image 행 저장 + 유저 버전 +1 (응답은 기다리지 않음, /dreams/by-date 로 확인).
+     분석 / 저장이 실패한 요청에는 유료 호출을 하지 않는다 (services/voice_image.py)
+까지 처리하고 분석이 저장되는 대로 바로 응답한다. 단계별 시간은 응답 timings 에.
+
+DB_ASYNC 설정과 상관없이 항상 등록 (저장은 dreams.py 의 동기 헬퍼 그대로 사용).
+"""
+
+import asyncio
+import time
+from typing import Dict, Literal, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from fastapi_app.api.dreams import AnalyzeReq, _analyze_one, _parse_day_param, _stage_analysis
+from fastapi_app.api.stt import TimedRoute, transcribe_upload
+from fastapi_app.db.database import GROUP_COMMIT_ENABLED, SessionLocal
+from fastapi_app.db.group_commit import get_group_commit_writer
+from fastapi_app.services.dream_counselor import counseling_note
+from fastapi_app.services.inference_executor import get_inference_executor
+from fastapi_app.services.voice_image import submit_image
+
+
+router = APIRouter(tags=["dreams"], route_class=TimedRoute)
+
+
+def _save_voice_dream(req: AnalyzeReq, res: dict, stt_text: str):
+    # group commit 을 쓰면 세션이 필요 없으므로 요청 의존성(get_db) 대신 여기서만 연다
+    with SessionLocal() as db:
+        dream_id, analysis_id = _stage_analysis(db, req, res, stt_text)
+        db.commit()
+        return dream_id, analysis_id
+
+
+async def _timed(aw, timings: Dict[str, float], key: str):
+    t = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        timings[key] = (time.perf_counter() - t) * 1000.0
+
+
+@router.post("/voice")
+async def analyze_voice(
+    request: Request,
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    date: Optional[str] = Form(None),  # "YYYY-MM-DD"
+    generate_image: bool = Form(False),
+    mode: Literal["auto", "long", "single"] = "auto",
+):
+    if date is not None:
+        _parse_day_param(date)
+    t0 = request.state.received_at
+    timings: Dict[str, float] = {"receive_ms": (time.perf_counter() - t0) * 1000.0}
+
+    # 1) STT
+    t = time.perf_counter()
+    text, duration, _ = await transcribe_upload(file, timings, mode)
+    timings["stt_ms"] = (time.perf_counter() - t) * 1000.0
+    if not text:
+        raise HTTPException(status_code=422, detail="no speech detected")
+    req = AnalyzeReq(text=text, user_id=user_id, date=date)
+
+    # 2) 분석
+    t = time.perf_counter()
+    res = await get_inference_executor().run(_analyze_one, text)
+    timings["analyze_ms"] = (time.perf_counter() - t) * 1000.0
+
+    # 3) 저장 + counseling_note 동시에
+    if GROUP_COMMIT_ENABLED:
+        save = asyncio.wrap_future(get_group_commit_writer().submit(_stage_analysis, req, res, text))
+    else:
+        save = run_in_threadpool(_save_voice_dream, req, res, text)
+    note = run_in_threadpool(counseling_note, text, res["valence"], res["facets"]["probs"])
+    (dream_id, analysis_id), res["counseling_note"] = await asyncio.gather(
+        _timed(save, timings, "save_ms"), _timed(note, timings, "counseling_ms")
+    )
+
+    # 4) 이미지 생성은 저장이 끝난 뒤에만 (대기열이 꽉 찼으면 "rejected", 나중에 /image 로 다시)
+    image: Optional[str] = None
+    if generate_image:
+        image = "pending" if submit_image(dream_id, user_id or "test_user", text) else "rejected"
+
+    res["dream_id"] = dream_id
+    res["saved_analysis_id"] = analysis_id
+    res["stt_text"] = text
+    res["duration_sec"] = duration
+    res["image"] = image
+    timings["total_ms"] = (time.perf_counter() - t0) * 1000.0
+    res["timings"] = {k: round(v, 1) for k, v in timings.items()}
+    return res
@@ -1,54 +1,236 @@
+import asyncio
+import io
+import json
 import os
-from pathlib import Path
-import tempfile, shutil
+import time
+from contextlib import aclosing
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Dict, Literal, Optional, Tuple
 
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, WebSocket, WebSocketDisconnect, status
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
+from starlette.formparsers import MultiPartException, MultiPartParser
 
-# ---- 환경 변수 (윈도우/저사양 안정화) ----
-os.environ.setdefault("HF_HUB_DISABLE_SYMLINKS", "1")
-HF_HOME_DIR = Path(__file__).resolve().parents[1].parent / ".hf_cache"  # backend/.hf_cache
-os.environ.setdefault("HF_HOME", str(HF_HOME_DIR))
-os.environ.setdefault("CT2_USE_MMAP", "1")
-os.environ.setdefault("CT2_THREADS", "2")
-
-router = APIRouter(prefix="/stt", tags=["stt"])
-
-# 지연 로딩
-_model = None
-def get_model():
-    global _model
-    if _model is None:
-        from faster_whisper import WhisperModel
-        device = os.getenv("STT_DEVICE", "cpu")          # "cpu" | "cuda"
-        ctype  = os.getenv("STT_COMPUTE", "int8")        # cpu:int8, cuda:float16
-        size   = os.getenv("STT_MODEL_SIZE", "tiny")     # tiny/base/small …
-        _model = WhisperModel(size, device=device, compute_type=ctype, cpu_threads=int(os.getenv("CT2_THREADS","2")))
-        print(f">> STT loaded: size={size}, device={device}, compute={ctype}")
-    return _model
+from fastapi_app.services.inference_executor import ExecutorSaturated
+from fastapi_app.services.stt_long import transcribe_long, use_long_mode
+from fastapi_app.services.stt_pool import (
+    STT_SAMPLE_RATE,
+    STT_TIMEOUT_SEC,
+    SttTimeout,
+    decode as decode_in_pool,
+    transcribe as transcribe_in_pool,
+)
+from fastapi_app.services.stt_stream import (
+    STREAM_DECODE_OPTIONS,
+    STT_STREAM_MAX_SEC,
+    Event,
+    EventQueue,
+    StreamSegmenter,
+    pcm16_to_float,
+)
+
+# 음성 업로드는 이 크기까지 메모리에만 두고, 넘으면 디스크로 spool.
+# 업로드마다 이만큼 메모리를 잡을 수 있으므로 짧은 음성 메모(m4a 1~2분)가 들어갈 정도로만.
+# starlette 전역 MultiPartParser.spool_max_size 는 건드리지 않고 TimedRoute 라우트(/stt, /dreams/voice)에만 적용
+STT_SPOOL_MAX_BYTES = int(os.getenv("STT_SPOOL_MAX_BYTES", str(2 * 1024 * 1024)))
+
+
+class _SttMultiPartParser(MultiPartParser):
+    spool_max_size = STT_SPOOL_MAX_BYTES
+
+
+async def _parse_upload_form(request: Request):
+    """request.form() 과 같은 파싱을 spool 한도만 바꿔서 미리 해 둠 (FastAPI 는 캐시된 form 을 사용)"""
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return
+    try:
+        async with aclosing(request.stream()) as stream:
+            request._form = await _SttMultiPartParser(request.headers, stream).parse()
+    except MultiPartException as exc:
+        raise HTTPException(status_code=400, detail=exc.message)
+
+
+class TimedRoute(APIRoute):
+    """
+    음성 업로드 라우트용: 본문(multipart)을 읽기 전에 도착 시각을 기록 → 라우트에서 receive 시간 계산,
+    본문은 STT_SPOOL_MAX_BYTES 한도로 파싱
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request):
+            request.state.received_at = time.perf_counter()
+            await _parse_upload_form(request)
+            return await handler(request)
+
+        return timed_handler
+
+
+router = APIRouter(prefix="/stt", tags=["stt"], route_class=TimedRoute)
 
 class SttResp(BaseModel):
     text: str
     duration_sec: float | None = None
+    segments: int | None = None  # 병렬(long) 모드로 나눈 조각 수
+    # 단계별 시간 (ms): receive / queue / decode / vad / beam / total
+    timings: Dict[str, float] | None = None
+
+STT_OPTIONS = dict(language="ko", vad_filter=True, beam_size=3, temperature=0.0)
+
+async def _detach_upload(file: UploadFile):
+    """
+    워커에 넘길 독립된 파일 객체. 504 / 연결 끊김으로 응답이 먼저 나가서 UploadFile 이
+    닫혀도 워커는 계속 읽을 수 있어야 하므로 요청 객체를 그대로 넘기지 않는다.
+      - 디스크로 spool 된 업로드 → 같은 임시 파일의 fd 복제 (메모리 복사 없음)
+      - 그 외 (메모리에 있는 STT_SPOOL_MAX_BYTES 이하 업로드) → 바이트 복사
+    아직 메모리에 있는 SpooledTemporaryFile 에 fileno() 를 부르면 디스크로 넘어가 버리므로
+    크기가 아니라 실제로 rollover 됐는지(_rolled)로 가른다.
+    """
+    f = file.file
+    if isinstance(f, SpooledTemporaryFile) and f._rolled:
+        return os.fdopen(os.dup(f.fileno()), "rb")
+    await file.seek(0)
+    return io.BytesIO(await file.read())
 
-@router.post("", response_model=SttResp)  # POST /stt
-async def transcribe(file: UploadFile = File(...)):
-    m = get_model()
-    # 업로드 파일 임시 저장
-    with tempfile.NamedTemporaryFile(suffix=".m4a", delete=False) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        path = tmp.name
+async def transcribe_upload(file: UploadFile, timings: Dict[str, float], mode: str = "auto") -> Tuple[str, float, Optional[int]]:
+    """
+    업로드 음성 → (text, 길이 초, 조각 수). /stt 와 /dreams/voice 가 같이 사용.
+    업로드는 임시 파일로 다시 쓰지 않고 (메모리 / spool 된) 내용을 워커가 바로 디코딩.
+    디코딩 + 전사 전체가 STT_TIMEOUT_SEC 마감 하나를 나눠 씀.
+    """
+    segments = None
+    deadline = time.monotonic() + STT_TIMEOUT_SEC
+    try:
+        audio = await decode_in_pool(await _detach_upload(file), timings=timings, close=True, timeout=STT_TIMEOUT_SEC)
+        duration = audio.size / STT_SAMPLE_RATE
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SttTimeout(f"transcription exceeded {STT_TIMEOUT_SEC:.0f}s")
+        # 긴 음성은 무음에서 조각내서 여러 워커로 병렬 전사
+        if use_long_mode(mode, duration):
+            text, segments = await transcribe_long(audio, timings=timings, timeout=remaining, **STT_OPTIONS)
+        else:
+            text, _ = await transcribe_in_pool(audio, timings=timings, timeout=remaining, **STT_OPTIONS)
+    except SttTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    return text, duration, segments
+
+@router.post("", response_model=SttResp)  # POST /stt?mode=auto|long|single
+async def transcribe(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: Literal["auto", "long", "single"] = "auto",
+):
+    timings: Dict[str, float] = {"receive_ms": (time.perf_counter() - request.state.received_at) * 1000.0}
+    text, duration, segments = await transcribe_upload(file, timings, mode)
+    timings["total_ms"] = (time.perf_counter() - request.state.received_at) * 1000.0
+    return SttResp(
+        text=text,
+        duration_sec=duration,
+        segments=segments,
+        timings={k: round(v, 1) for k, v in timings.items()},
+    )
+
+
+# =========================
+# 스트리밍 STT (WebSocket)
+# =========================
 
+def _is_end(text: str) -> bool:
+    text = text.strip()
+    if text == "end":
+        return True
     try:
-        segments, info = m.transcribe(
-            path,
-            language="ko",
-            vad_filter=True,
-            beam_size=3,
-            temperature=0.0,
-        )
-        text = "".join(s.text for s in segments).strip()
-        return SttResp(text=text, duration_sec=getattr(info, "duration", None))
+        return json.loads(text).get("type") == "end"
+    except (ValueError, AttributeError):
+        return False
+
+
+async def _decode_events(ws: WebSocket, seg: StreamSegmenter, queue: EventQueue, finals: list):
+    """구간 이벤트를 순서대로 전사해서 보냄. partial 은 이미 닫힌 구간 것이면 건너뜀."""
+    while True:
+        ev = await queue.get()
+        if ev is None:
+            return
+        kind, idx, audio, start, end = ev
+        if kind == "partial" and idx < seg.segments:
+            continue
+
+        # 직전 final 을 프롬프트로 넘겨서 구간 경계에서 문맥 유지
+        options = dict(STREAM_DECODE_OPTIONS)
+        if finals:
+            options["initial_prompt"] = finals[-1]
+        try:
+            text, _ = await transcribe_in_pool(audio, **options)
+        except (ExecutorSaturated, SttTimeout) as e:
+            if kind == "partial":
+                continue
+            msg = {"type": "error", "segment": idx, "detail": str(e)}
+            if isinstance(e, ExecutorSaturated):
+                msg["retry_after"] = e.retry_after
+            await ws.send_json(msg)
+            continue
+
+        if kind == "partial":
+            await ws.send_json({"type": "partial", "segment": idx, "text": text})
+        else:
+            finals.append(text)
+            await ws.send_json({
+                "type": "final", "segment": idx, "text": text,
+                "start": round(start, 2), "end": round(end, 2),
+            })
+
+
+async def _enqueue(ws: WebSocket, queue: EventQueue, ev: Event):
+    # 전사가 실시간을 못 따라가서 대기열이 꽉 찼으면 그 구간은 버리고 알림 (메모리 무한 증가 방지)
+    if not queue.put(ev):
+        await ws.send_json({"type": "error", "segment": ev[1], "detail": "decoder is falling behind, segment dropped"})
+
+
+@router.websocket("/stream")  # WS /stt/stream?sample_rate=16000
+async def transcribe_stream(ws: WebSocket, sample_rate: int = 16000):
+    """말하는 동안 PCM16 청크를 받아 partial / final 구간을 돌려줌 (프로토콜은 services/stt_stream.py)"""
+    if not 8000 <= sample_rate <= 48000:
+        await ws.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await ws.accept()
+
+    seg = StreamSegmenter()
+    queue = EventQueue()
+    finals: list = []
+    decoder = asyncio.create_task(_decode_events(ws, seg, queue, finals))
+    try:
+        # 전사 태스크가 죽었으면 (전송 실패 등) 더 받아서 쌓지 않고 아래 await decoder 에서 에러로
+        while not decoder.done():
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
+            if msg.get("bytes"):
+                for ev in seg.feed(pcm16_to_float(msg["bytes"], sample_rate)):
+                    await _enqueue(ws, queue, ev)
+                if seg.duration_sec > STT_STREAM_MAX_SEC:
+                    await ws.send_json({"type": "error", "detail": f"stream exceeded {STT_STREAM_MAX_SEC:.0f}s"})
+                    break
+            elif msg.get("text") and _is_end(msg["text"]):
+                break
+
+        # 남은 구간까지 전사가 끝나면 전체 텍스트로 마무리
+        if not decoder.done():
+            for ev in seg.flush():
+                await _enqueue(ws, queue, ev)
+            queue.close()
+        await decoder
+        await ws.send_json({
+            "type": "done",
+            "text": " ".join(t for t in finals if t),
+            "segments": len(finals),
+            "duration_sec": round(seg.duration_sec, 2),
+        })
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
     finally:
-        try: os.unlink(path)
-        except: pass
+        if not decoder.done():
+            decoder.cancel()
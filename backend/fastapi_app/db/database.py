@@ -1,10 +1,14 @@
+from functools import lru_cache
 from pathlib import Path
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from fastapi_app.db.pool import TimedAsyncQueuePool, TimedQueuePool
+
 # -----------------------------
 # 1. 경로 설정
 #    - 이 파일 위치: backend/fastapi_app/db/database.py
@@ -34,15 +38,126 @@ DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_SQLITE)
 # SQLite일 경우만 connect_args 필요
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
+# -----------------------------
+# 커넥션 풀 설정 (동기 / 비동기 엔진 공통)
+#  - DB_POOL_SIZE     : 항상 유지하는 커넥션 수
+#  - DB_MAX_OVERFLOW  : 몰릴 때 추가로 여는 커넥션 수
+#  - DB_POOL_TIMEOUT  : 커넥션을 못 얻을 때 기다리는 최대 시간(초)
+#  - DB_POOL_RECYCLE  : 이 시간(초)보다 오래된 커넥션은 재연결 (-1 이면 안 함)
+# -----------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# DB_ASYNC=1 이면 dreams 라우트를 AsyncSession 버전으로 사용
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+# 비동기 드라이버 URL (없으면 DATABASE_URL 에서 유도: sqlite → aiosqlite, postgresql → asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# -----------------------------
+# SQLite 성능 프로필 (단일 노드 app.db 용, 커넥션마다 connect 시점에 PRAGMA 적용)
+#  - SQLITE_TUNING=0 이면 적용 안 함
+#  - SQLITE_JOURNAL_MODE : WAL → 읽기가 쓰기를 막지 않고, commit 이 WAL 파일 append 로 끝남
+#  - SQLITE_SYNCHRONOUS  : 기본 FULL (commit 마다 fsync → id 를 돌려준 저장은 전원 장애에도 남음).
+#                          NORMAL 은 명시적으로 켜는 선택지: WAL 에서 프로세스 크래시에는 안전하지만
+#                          전원 장애 시 이미 응답한 마지막 commit 들이 사라질 수 있음 (내구성 ↔ 속도).
+#                          fsync 비용이 부담되면 NORMAL 대신 DB_GROUP_COMMIT=1 로 배치 단위로 나누는 쪽을 권장
+#  - SQLITE_CACHE_MB     : 페이지 캐시 크기 (커넥션당)
+#  - SQLITE_BUSY_TIMEOUT_MS : 다른 writer 가 잠금을 잡고 있을 때 바로 실패하지 않고 기다리는 시간
+#  - DB_GROUP_COMMIT=1   : 동시 /dreams/analyze 저장을 한 트랜잭션으로 묶는 writer 사용 (db/group_commit.py)
+# -----------------------------
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") != "0"
+GROUP_COMMIT_ENABLED = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "FULL")
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_MB * 1024}")  # 음수 = KiB 단위
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+def _install_sqlite_pragmas(sync_engine):
+    if sync_engine.dialect.name == "sqlite" and SQLITE_TUNING and not _is_memory_sqlite(str(sync_engine.url)):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:")
+
+
+def _pool_kwargs(url: str, poolclass) -> dict:
+    # 인메모리 SQLite 는 커넥션 하나를 공유해야 하므로 풀 설정을 적용하지 않음
+    if _is_memory_sqlite(url):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
     pool_pre_ping=True,
+    **_pool_kwargs(DATABASE_URL, TimedQueuePool),
 )
 
+_install_sqlite_pragmas(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """동기 URL → 비동기 드라이버 URL"""
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        return u.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    raise ValueError(f"비동기 드라이버를 알 수 없는 DB 입니다: {backend} (ASYNC_DATABASE_URL 로 지정하세요)")
+
+
+@lru_cache(maxsize=1)
+def get_async_engine():
+    """비동기 엔진 (aiosqlite / asyncpg 는 DB_ASYNC 를 쓸 때만 필요하므로 지연 생성)"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url()
+    async_engine = create_async_engine(
+        url,
+        pool_pre_ping=True,
+        **_pool_kwargs(url, TimedAsyncQueuePool),
+    )
+    _install_sqlite_pragmas(async_engine.sync_engine)
+    return async_engine
+
+
+@lru_cache(maxsize=1)
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # expire_on_commit=False: commit 후 속성 접근 때 암묵적 IO(비동기에서 불가)가 일어나지 않게
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
 # -----------------------------
 # 4. FastAPI에서 쓸 의존성 함수
 # -----------------------------
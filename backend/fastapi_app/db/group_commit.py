@@ -0,0 +1,168 @@
+# fastapi_app/db/group_commit.py
+"""
+group commit writer (DB_GROUP_COMMIT=1)
+
+SQLite 는 writer 가 한 번에 하나라서 동시 /dreams/analyze 들이
+각자 BEGIN → INSERT → COMMIT(fsync) 를 하면 잠금 대기 + fsync 가 요청 수만큼 반복된다.
+여기서는 전용 writer 스레드 하나가 짧은 시간 동안 들어온 쓰기 작업들을 모아서
+한 세션 / 한 트랜잭션에서 실행하고 commit 을 한 번만 한다.
+
+- 작업은 job(session, *args) 형태: add / flush 까지만 하고 commit 하지 않음.
+  반환값(보통 id 들)은 commit 이 끝난 "뒤에" 호출자 Future 에 전달된다
+  → 응답에 id 가 나갈 때는 이미 디스크에 반영된 상태.
+- 배치 중 하나라도 실패하면 전체 rollback 후 작업을 하나씩 따로 실행/commit 해서
+  실패한 요청만 에러를 받게 한다 (작업 함수는 다시 실행해도 안전해야 함).
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from fastapi_app.db.database import SessionLocal
+
+
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv("DB_GROUP_COMMIT_MAX_WAIT_MS", "5"))
+
+Job = Tuple[Callable[..., Any], tuple, Future, float]
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_batch_size: int = GROUP_COMMIT_MAX_BATCH,
+        max_wait_ms: float = GROUP_COMMIT_MAX_WAIT_MS,
+        name: str = "group-commit-writer",
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._commits = 0
+        self._jobs = 0
+        self._fallbacks = 0
+        self._errors = 0
+        self._max_seen = 0
+        self._wait_ms_total = 0.0
+        self._commit_ms_total = 0.0
+
+    def submit(self, job: Callable[..., Any], *args) -> Future:
+        """job(session, *args) 를 다음 배치에 넣고, commit 후 결과가 채워질 Future 반환."""
+        fut: Future = Future()
+        self._ensure_worker()
+        self._queue.put((job, args, fut, time.perf_counter()))
+        return fut
+
+    def __call__(self, job: Callable[..., Any], *args) -> Any:
+        return self.submit(job, *args).result()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Job]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit_batch(self, batch: List[Job]) -> List[Any]:
+        with self.session_factory() as db:
+            try:
+                outputs = [job(db, *args) for job, args, _, _ in batch]
+                db.commit()
+                return outputs
+            except BaseException:
+                db.rollback()
+                raise
+
+    def _commit_each(self, batch: List[Job]):
+        """배치가 실패했을 때: 작업마다 따로 트랜잭션 (실패한 작업만 에러)"""
+        for job, args, fut, _ in batch:
+            try:
+                out = self._commit_batch([(job, args, fut, 0.0)])
+            except BaseException as e:
+                with self._lock:
+                    self._errors += 1
+                fut.set_exception(e)
+            else:
+                fut.set_result(out[0])
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            wait_ms = sum((started - t0) * 1000.0 for _, _, _, t0 in batch)
+
+            try:
+                outputs = self._commit_batch(batch)
+            except BaseException:
+                fallback = True
+            else:
+                fallback = False
+
+            with self._lock:
+                n = len(batch)
+                self._commits += 1
+                self._jobs += n
+                self._max_seen = max(self._max_seen, n)
+                self._wait_ms_total += wait_ms
+                self._commit_ms_total += (time.perf_counter() - started) * 1000.0
+                if fallback:
+                    self._fallbacks += 1
+
+            if fallback:
+                self._commit_each(batch)
+                continue
+            for (_, _, fut, _), out in zip(batch, outputs):
+                fut.set_result(out)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            commits, jobs = self._commits, self._jobs
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "queue_depth": self._queue.qsize(),
+                "commits": commits,
+                "jobs": jobs,
+                "avg_jobs_per_commit": (jobs / commits) if commits else 0.0,
+                "max_jobs_per_commit": self._max_seen,
+                "fallbacks": self._fallbacks,
+                "errors": self._errors,
+                "avg_queue_wait_ms": (self._wait_ms_total / jobs) if jobs else 0.0,
+                "avg_commit_ms": (self._commit_ms_total / commits) if commits else 0.0,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_group_commit_writer() -> GroupCommitWriter:
+    return GroupCommitWriter()
@@ -0,0 +1,314 @@
+"""
+스키마 마이그레이션 (create_all 로는 처리 안 되는 기존 테이블 변경)
+
+- 모든 마이그레이션은 idempotent: 이미 적용된 DB 에서 다시 돌려도 아무 일도 안 함
+- 서버 startup 에서 create_all 직후 run_migrations() 가 호출됨
+- 수동 실행:
+    python -m fastapi_app.db.migrations
+- 조회 쿼리가 인덱스를 쓰는지는 backend/tests/test_query_plans.py 에서 확인
+"""
+
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from fastapi_app.models.dream import FACETS, DreamAnalysis
+from fastapi_app.services.daily_rollup import backfill
+from fastapi_app.services.user_version import bump_data_epoch
+
+
+def _has_index(conn: Connection, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def _column_type(conn: Connection, table: str, column: str) -> str:
+    for col in inspect(conn).get_columns(table):
+        if col["name"] == column:
+            return str(col["type"]).upper()
+    return ""
+
+
+# =========================
+# 1) dreams.date: VARCHAR(10) → DATE + (user_id, date) 복합 인덱스
+# =========================
+
+# 옛 문자열 날짜로 허용하는 형식 (ISO 가 아니면 차례로 시도)
+LEGACY_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d")
+
+
+def _parse_legacy_day(value) -> Optional[date]:
+    """옛 dreams.date / rollup day 값 → date (실제로 없는 날짜나 형식 불명이면 None)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    s = str(value).strip()
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(s).date()  # 'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS'
+    except ValueError:
+        pass
+    for fmt in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()  # '2025-3-2' 처럼 0 이 빠진 값도 허용
+        except ValueError:
+            continue
+    return None
+
+
+def _normalize_dream_dates(conn: Connection, only_suspect: bool) -> int:
+    """
+    dreams.date 를 파이썬에서 파싱해서 'YYYY-MM-DD' 로 정규화, 파싱이 안 되는 값만 NULL (로그).
+    only_suspect: SQLite 에서 date() 로 왕복했을 때 그대로인 값(정상)은 건너뜀.
+    반환: 바뀐 행 수
+    """
+    sql = 'SELECT id, "date" FROM dreams WHERE "date" IS NOT NULL'
+    if only_suspect:
+        # date('2025-3-2', '+0 days') 는 NULL, date('2025-02-30', '+0 days') 는 '2025-03-02'
+        # → 둘 다 원래 값과 달라서 걸러짐 (정상 값은 그대로)
+        sql += ' AND (date("date", \'+0 days\') IS NULL OR date("date", \'+0 days\') != "date")'
+    fixed, nulled = [], []
+    for row_id, value in conn.execute(text(sql)).all():
+        day = _parse_legacy_day(value)
+        if day is None:
+            if str(value).strip():  # 빈 문자열은 원래 "날짜 없음"
+                print(f">> dreams.id={row_id}: 날짜로 읽을 수 없어서 NULL 처리: {value!r}")
+            nulled.append({"_id": row_id})
+        elif day.isoformat() != value:
+            fixed.append({"_id": row_id, "_day": day.isoformat()})
+    if fixed:
+        conn.execute(text('UPDATE dreams SET "date" = :_day WHERE id = :_id'), fixed)
+        print(f">> normalized dreams.date: {len(fixed)} rows")
+    if nulled:
+        conn.execute(text('UPDATE dreams SET "date" = NULL WHERE id = :_id'), nulled)
+    return len(fixed) + len(nulled)
+
+
+def _normalize_rollup_days(conn: Connection, only_suspect: bool) -> int:
+    """
+    dream_daily_emotions.day 도 같은 규칙으로 정규화.
+    (user_id, day) 가 PK 라서 정규화한 날짜에 이미 행이 있으면 합치고,
+    파싱이 안 되는 행은 삭제 (해당 꿈들도 date 가 NULL 이 되어 집계 대상이 아님).
+    """
+    sql = "SELECT user_id, day, pos_sum, neg_sum, dream_count FROM dream_daily_emotions"
+    if only_suspect:
+        sql += " WHERE date(day, '+0 days') IS NULL OR date(day, '+0 days') != day"
+    changed = 0
+    for user_id, value, pos_sum, neg_sum, count in conn.execute(text(sql)).all():
+        day = _parse_legacy_day(value)
+        if day is not None and day.isoformat() == value:
+            continue
+        changed += 1
+        key = {"u": user_id, "old": value}
+        if day is None:
+            print(f">> dream_daily_emotions({user_id}, {value!r}): 날짜로 읽을 수 없어서 삭제")
+            conn.execute(text("DELETE FROM dream_daily_emotions WHERE user_id = :u AND day = :old"), key)
+            continue
+        merged = conn.execute(text(
+            "UPDATE dream_daily_emotions SET pos_sum = pos_sum + :p, neg_sum = neg_sum + :n, "
+            "dream_count = dream_count + :c WHERE user_id = :u AND day = :day"
+        ), {"p": pos_sum, "n": neg_sum, "c": count, "u": user_id, "day": day.isoformat()})
+        if merged.rowcount:
+            conn.execute(text("DELETE FROM dream_daily_emotions WHERE user_id = :u AND day = :old"), key)
+        else:
+            conn.execute(text(
+                "UPDATE dream_daily_emotions SET day = :day WHERE user_id = :u AND day = :old"
+            ), {**key, "day": day.isoformat()})
+    return changed
+
+
+def migrate_dream_date(engine: Engine):
+    dialect = engine.dialect.name
+
+    with engine.begin() as conn:
+        changed = 0
+        if dialect == "sqlite":
+            # SQLite 는 DATE 도 'YYYY-MM-DD' 텍스트로 저장하므로 타입 변경은 필요 없고
+            # SQLAlchemy Date 로 읽을 수 없는 값만 정리 (정상 값은 SQL 에서 먼저 걸러냄)
+            changed += _normalize_dream_dates(conn, only_suspect=True)
+            changed += _normalize_rollup_days(conn, only_suspect=True)
+        else:
+            # 아직 문자열 컬럼이면 같은 규칙으로 정리한 뒤 DATE 로 변환 (이미 DATE 면 할 일 없음)
+            if _column_type(conn, "dreams", "date") != "DATE":
+                changed += _normalize_dream_dates(conn, only_suspect=False)
+                conn.execute(text(
+                    'ALTER TABLE dreams ALTER COLUMN "date" TYPE DATE USING "date"::date'
+                ))
+                print(">> migrated dreams.date → DATE")
+            if _column_type(conn, "dream_daily_emotions", "day") != "DATE":
+                changed += _normalize_rollup_days(conn, only_suspect=False)
+                conn.execute(text(
+                    "ALTER TABLE dream_daily_emotions ALTER COLUMN day TYPE DATE USING day::date"
+                ))
+                print(">> migrated dream_daily_emotions.day → DATE")
+        if changed:
+            bump_data_epoch(conn)  # 날짜가 바뀐 꿈이 있으면 캐시된 ETag 무효화
+
+        if not _has_index(conn, "dreams", "ix_dreams_user_id_date"):
+            conn.execute(text("CREATE INDEX ix_dreams_user_id_date ON dreams (user_id, date)"))
+            print(">> created index ix_dreams_user_id_date")
+
+
+# =========================
+# 2) dreams.latest_analysis_id + dream_analyses(dream_id) 인덱스
+# =========================
+
+def migrate_latest_analysis(engine: Engine):
+    with engine.begin() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("dreams")}
+        if "latest_analysis_id" not in columns:
+            conn.execute(text(
+                "ALTER TABLE dreams ADD COLUMN latest_analysis_id INTEGER "
+                "REFERENCES dream_analyses (id) ON DELETE SET NULL"
+            ))
+            print(">> added dreams.latest_analysis_id")
+
+        if not _has_index(conn, "dream_analyses", "ix_dream_analyses_dream_id"):
+            conn.execute(text("CREATE INDEX ix_dream_analyses_dream_id ON dream_analyses (dream_id)"))
+            print(">> created index ix_dream_analyses_dream_id")
+
+        # 포인터가 비어 있는 꿈은 가장 마지막(최신) 분석을 가리키도록 채움
+        res = conn.execute(text(
+            "UPDATE dreams SET latest_analysis_id = "
+            "(SELECT MAX(a.id) FROM dream_analyses a WHERE a.dream_id = dreams.id) "
+            "WHERE latest_analysis_id IS NULL "
+            "AND EXISTS (SELECT 1 FROM dream_analyses a WHERE a.dream_id = dreams.id)"
+        ))
+        if res.rowcount:
+            print(f">> backfilled dreams.latest_analysis_id: {res.rowcount} rows")
+            bump_data_epoch(conn)
+
+
+# =========================
+# 3) 히스토리 keyset 페이지네이션 인덱스 + images(dream_id)
+# =========================
+
+def migrate_history_indexes(engine: Engine):
+    with engine.begin() as conn:
+        if not _has_index(conn, "dreams", "ix_dreams_user_id_created_at_id"):
+            conn.execute(text(
+                "CREATE INDEX ix_dreams_user_id_created_at_id ON dreams (user_id, created_at, id)"
+            ))
+            print(">> created index ix_dreams_user_id_created_at_id")
+
+        # 썸네일(꿈당 첫 이미지) 조회용
+        if not _has_index(conn, "images", "ix_images_dream_id"):
+            conn.execute(text("CREATE INDEX ix_images_dream_id ON images (dream_id)"))
+            print(">> created index ix_images_dream_id")
+
+
+# =========================
+# 4) dream_analyses facet 컬럼 (facets_json → 숫자 컬럼) + 백필
+# =========================
+
+FACET_BACKFILL_BATCH = 1000
+
+
+def _backfill_facet_columns(conn: Connection, cols: List[str]) -> int:
+    # JSON 파싱은 DB 마다 문법이 달라서 파이썬에서 배치 단위로
+    T = DreamAnalysis.__table__
+    pending = T.c[f"{FACETS[0]}_prob"].is_(None)
+    total = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(T.c.id, T.c.facets_json)
+            .where(pending, T.c.id > last_id)
+            .order_by(T.c.id)
+            .limit(FACET_BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return total
+        params = []
+        for row_id, facets in rows:
+            values = DreamAnalysis.facet_columns(facets if isinstance(facets, dict) else {})
+            # facet 확률이 하나도 없는 행(빈 JSON)은 건너뜀
+            if values[f"{FACETS[0]}_prob"] is not None:
+                params.append({"_id": row_id, **values})
+        if params:
+            conn.execute(
+                T.update().where(T.c.id == bindparam("_id")).values({c: bindparam(c) for c in cols}),
+                params,
+            )
+        total += len(params)
+        last_id = rows[-1][0]
+
+
+def migrate_facet_columns(engine: Engine):
+    cols = [f"{name}_prob" for name in FACETS] + [f"{name}_label" for name in FACETS]
+    with engine.begin() as conn:
+        existing = {c["name"] for c in inspect(conn).get_columns("dream_analyses")}
+        missing = [col for col in cols if col not in existing]
+        if not missing:
+            # 이미 추가된 DB: 새 분석은 저장 때 컬럼이 채워지므로 다시 훑지 않음
+            # (빈 facets 행은 NULL 로 남아서 pending 조건으로는 매번 다시 잡히기 때문)
+            return
+        for col in missing:
+            col_type = "FLOAT" if col.endswith("_prob") else "INTEGER"
+            conn.execute(text(f"ALTER TABLE dream_analyses ADD COLUMN {col} {col_type}"))
+            print(f">> added dream_analyses.{col}")
+
+        # 컬럼을 추가한 트랜잭션에서 바로 백필 (PostgreSQL 은 DDL 도 같이 롤백되므로 중간에 죽으면 다음 기동 때 처음부터)
+        total = _backfill_facet_columns(conn, cols)
+        if total:
+            print(f">> backfilled facet columns: {total} rows")
+            bump_data_epoch(conn)  # facet 추이 응답이 바뀜
+
+
+# =========================
+# 5) dream_analyses.model_version
+# =========================
+
+def migrate_model_version(engine: Engine):
+    with engine.begin() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("dream_analyses")}
+        if "model_version" not in columns:
+            # 기존 행은 NULL = "버전 모름" → 재채점 대상
+            conn.execute(text("ALTER TABLE dream_analyses ADD COLUMN model_version VARCHAR(64)"))
+            print(">> added dream_analyses.model_version")
+
+
+# =========================
+# 6) 캘린더 롤업: 기존 DB 에 롤업 테이블이 새로 생겼으면 한 번 채움
+# =========================
+
+def migrate_daily_rollup(engine: Engine):
+    with engine.begin() as conn:
+        has_rollup = conn.execute(text("SELECT 1 FROM dream_daily_emotions LIMIT 1")).first()
+        has_dreams = conn.execute(text(
+            "SELECT 1 FROM dreams WHERE latest_analysis_id IS NOT NULL "
+            "AND user_id IS NOT NULL AND date IS NOT NULL LIMIT 1"
+        )).first()
+    if has_rollup or not has_dreams:
+        return
+    # 비어 있는 캘린더가 v0 ETag 로 캐시되지 않도록 backfill 이 epoch 도 올림
+    with Session(engine) as db:
+        rows = backfill(db)
+    print(f">> backfilled dream_daily_emotions: {rows} rows")
+
+
+MIGRATIONS: List[Callable[[Engine], None]] = [
+    migrate_dream_date,
+    migrate_latest_analysis,
+    migrate_history_indexes,
+    migrate_facet_columns,
+    migrate_model_version,
+    migrate_daily_rollup,  # latest_analysis_id / 날짜 정리가 끝난 뒤
+]
+
+
+def run_migrations(engine: Engine):
+    for migration in MIGRATIONS:
+        migration(engine)
+
+
+if __name__ == "__main__":
+    from fastapi_app.db.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    print("✅ migrations done")
@@ -0,0 +1,102 @@
+# fastapi_app/db/pool.py
+"""
+커넥션 풀 사용률 / 대기 시간 측정
+
+SQLAlchemy 기본 QueuePool 은 지금 몇 개가 빌려 나갔는지는 알려주지만
+"커넥션 하나 얻으려고 얼마나 기다렸는지" 는 남기지 않는다.
+여기 풀 클래스들은 checkout 대기 시간 / 타임아웃 횟수를 누적해서
+/metrics 에서 풀 크기(DB_POOL_SIZE, DB_MAX_OVERFLOW)를 실제 트래픽에 맞춰 조정할 수 있게 한다.
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class _WaitStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.wait_ms_total / n) if n else 0.0,
+                "max_wait_ms": self.wait_ms_max,
+            }
+
+
+class _TimedPoolMixin:
+    """_do_get (풀에서 커넥션을 꺼내는 지점) 앞뒤로 대기 시간을 잰다."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = _WaitStats()
+
+    def recreate(self):
+        # dispose / 재연결 때 새 풀이 만들어져도 누적 통계는 유지
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record((time.perf_counter() - started) * 1000.0, timed_out=True)
+            raise
+        self.wait_stats.record((time.perf_counter() - started) * 1000.0)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(engine: Engine) -> Dict[str, Any]:
+    """엔진(동기 / AsyncEngine.sync_engine) 풀의 현재 사용률 + 누적 대기 시간."""
+    pool = engine.pool
+    out: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if not isinstance(pool, QueuePool):
+        # SQLite :memory: 등 (SingletonThreadPool / StaticPool) 은 사용률 개념이 없음
+        return out
+
+    size = pool.size()
+    capacity = size + max(0, pool._max_overflow)
+    checked_out = pool.checkedout()
+    out.update({
+        "size": size,
+        "max_overflow": pool._max_overflow,
+        "timeout_sec": pool.timeout(),
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "utilization": (checked_out / capacity) if capacity else 0.0,
+    })
+    if isinstance(pool, _TimedPoolMixin):
+        out.update(pool.wait_stats.snapshot())
+    return out
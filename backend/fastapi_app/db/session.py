@@ -1,6 +1,7 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi_app.db.database import SessionLocal
+from fastapi_app.db.database import SessionLocal, get_async_sessionmaker
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -9,3 +10,6 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as db:
+        yield db
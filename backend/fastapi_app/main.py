@@ -1,13 +1,29 @@
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi_app.api import dreams as dreams_api, image as image_api, stt as stt_api
+from fastapi_app.api import dreams_async as dreams_async_api, dreams_transfer as dreams_transfer_api, dreams_voice as dreams_voice_api
 from fastapi_app.models import dream as dream_model, image as image_model
-from fastapi_app.db.database import Base, engine
+from fastapi_app.db.database import DB_ASYNC, GROUP_COMMIT_ENABLED, Base, engine, get_async_engine
+from fastapi_app.db.group_commit import get_group_commit_writer
+from fastapi_app.db.pool import pool_stats
+from fastapi_app.db.migrations import run_migrations
+from fastapi_app.services.dream_analyzer import analyzer_stats
+from fastapi_app.services.embedding_cache import CACHE_ENABLED
+from fastapi_app.services.embedding_e5 import get_embedding_cache, padding_stats
+from fastapi_app.services.inference_executor import ExecutorSaturated, get_inference_executor
+from fastapi_app.services.shared_weights import memory_stats
+from fastapi_app.services.rescoring import RESCORE_ON_STARTUP, rescoring_stats, start_rescoring
+from fastapi_app.services.stt_pool import stt_stats
+from fastapi_app.services.voice_image import image_stats
+from fastapi_app.services.warmup import WARMUP_ON_STARTUP, readiness, start_warmup
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
+
 app = FastAPI(title="Dream App", version="0.1.0")
 
 app.add_middleware(
@@ -15,6 +31,15 @@ app.add_middleware(
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
 )
 
+@app.exception_handler(ExecutorSaturated)
+async def on_executor_saturated(request: Request, exc: ExecutorSaturated):
+    # 추론 대기열이 꽉 찼으면 기다리게 하지 않고 바로 거절
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # backend/ 기준으로 generated 폴더를 가리킴
 BASE_DIR = Path(__file__).resolve().parents[1]  # backend/
 GENERATED_DIR = BASE_DIR / "generated"
@@ -23,13 +48,28 @@ GENERATED_DIR.mkdir(exist_ok=True)
 app.mount("/generated", StaticFiles(directory=GENERATED_DIR), name="generated")
 
 
-app.include_router(dreams_api.router, prefix="/dreams", tags=["dreams"])
+# DB_ASYNC=1 이면 AsyncSession 버전 dreams 라우트 사용
+app.include_router((dreams_async_api if DB_ASYNC else dreams_api).router, prefix="/dreams", tags=["dreams"])
+app.include_router(dreams_transfer_api.router, prefix="/dreams", tags=["dreams"])
+app.include_router(dreams_voice_api.router, prefix="/dreams", tags=["dreams"])
 app.include_router(image_api.router, prefix="/images", tags=["images"])
 app.include_router(stt_api.router, prefix="/stt", tags=["stt"])
 
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    # 모델 eager 로딩 + 워밍업 (백그라운드, 진행 상황은 /ready)
+    if WARMUP_ON_STARTUP:
+        start_warmup()
+    # 모델 버전이 바뀐 옛 분석 재채점 (백그라운드, 대화형 추론에 양보하면서)
+    if RESCORE_ON_STARTUP:
+        start_rescoring()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if DB_ASYNC:
+        await get_async_engine().dispose()
 
 # app.include_router(dreams.router)
 
@@ -39,4 +79,33 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True}
+
+@app.get("/ready")
+def ready(models: Optional[str] = None):
+    # 로드밸런서용: 모든 모델(또는 ?models=e5,heads 로 지정한 모델)이 워밍업 끝나야 200
+    required = [m.strip() for m in models.split(",") if m.strip()] if models else None
+    status = readiness(required)
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+def metrics():
+    # 추론 배칭 통계 (queue 깊이 / 배치 크기 등)
+    return {
+        "analyzer": analyzer_stats(),
+        "inference_executor": get_inference_executor().stats(),
+        "embedding_cache": get_embedding_cache().stats() if CACHE_ENABLED else None,
+        "padding": padding_stats(),
+        "memory": memory_stats(),
+        # 커넥션 풀 사용률 / checkout 대기 시간 (DB_POOL_SIZE, DB_MAX_OVERFLOW 조정용)
+        "db_pool": {
+            "sync": pool_stats(engine),
+            "async": pool_stats(get_async_engine().sync_engine) if DB_ASYNC else None,
+        },
+        "group_commit": get_group_commit_writer().stats() if GROUP_COMMIT_ENABLED else None,
+        "rescoring": rescoring_stats(),
+        # STT 워커 풀: 대기열 깊이 / 대기 시간 / 전사 시간 / 타임아웃
+        "stt": stt_stats(),
+        # /dreams/voice 이미지 생성 (전용 executor, 마지막 실패 사유)
+        "voice_image": image_stats(),
+    }
\ No newline at end of file
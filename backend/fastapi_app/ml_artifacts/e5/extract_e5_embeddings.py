@@ -3,7 +3,7 @@ from pathlib import Path
 import pandas as pd
 import torch
 
-from fastapi_app.services.embedding_e5 import encode_texts
+from fastapi_app.services.embedding_e5 import encode_texts, padding_stats
 
 # --------------------
 # 경로 & 설정
@@ -18,6 +18,7 @@ EMB_PARTIAL_FILE = OUT_DIR / "e5_embeddings_labels_partial.pt"
 
 BATCH_SIZE = 256      # GPU 충분하니까 크게 가져가도 됨
 SAVE_EVERY = 1000     # N개 처리할 때마다 partial 저장
+LONG_TEXT = False     # True면 256 토큰 넘는 꿈도 슬라이딩 윈도우로 전체 반영 (서빙 E5_LONG_TEXT와 맞출 것)
 
 TEXT_COL = "text_dream"
 VALENCE_COL = "NegativeEmotions"
@@ -73,11 +74,14 @@ def main():
 
     for i in range(0, num_texts, BATCH_SIZE):
         batch_texts = texts[i : i + BATCH_SIZE]
-        emb = encode_texts(batch_texts)  # (B, H) CPU 텐서
+        # 길이 버킷 + 동적 패딩 (짧은 꿈/긴 꿈이 섞여도 패딩 낭비 최소화)
+        # 한 번만 훑는 전체 데이터셋이라 서비스용 임베딩 캐시는 거치지 않음 (디스크 캐시가 데이터셋만큼 커짐)
+        emb = encode_texts(batch_texts, use_cache=False, bucketed=True, long_text=LONG_TEXT)  # (B, H) CPU 텐서
         all_embeddings.append(emb)
 
         done = i + len(batch_texts)
-        print(f"{done} / {num_texts} 개 처리 완료")
+        eff = padding_stats()["bucketed"]["efficiency"]
+        print(f"{done} / {num_texts} 개 처리 완료 (패딩 효율 {eff:.1%})")
 
         # N개마다 partial 저장
         if (done % SAVE_EVERY == 0) or (done == num_texts):
@@ -134,6 +138,7 @@ def main():
     torch.save(payload, EMB_FILE)
     print("최종 임베딩 텐서 크기:", embeddings.shape)
     print("최종 저장 완료:", EMB_FILE)
+    print("패딩 효율:", padding_stats()["bucketed"])
 
 
 if __name__ == "__main__":
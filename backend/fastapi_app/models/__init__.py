@@ -1,2 +1,2 @@
-from .dream import Dream
+from .dream import Dream, DreamAnalysis, DreamDailyEmotion, UserDataVersion
 from .image import Image
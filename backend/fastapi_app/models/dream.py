@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Float, func
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, JSON, ForeignKey, Float, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from sqlalchemy.sql import func
@@ -6,6 +6,12 @@ from fastapi_app.db.database import Base
 
 class Dream(Base):
     __tablename__ = "dreams"
+    __table_args__ = (
+        # 캘린더 / 날짜별 조회: user_id 고정 + date 범위 스캔
+        Index("ix_dreams_user_id_date", "user_id", "date"),
+        # 히스토리 화면: user_id 고정 + (created_at, id) keyset 페이지네이션
+        Index("ix_dreams_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     input_type = Column(String(20), nullable=False)  # "voice" or "text"
@@ -16,40 +22,117 @@ class Dream(Base):
     emotion = Column(String(50), nullable=True) # 사용자가 기입한 감정
     interpretation = Column(Text, nullable=True) # 사용자가 기입한 해석
     user_id = Column(String(64), index=True, nullable=True)
-    date = Column(String(10), nullable=True)
+    date = Column(Date, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    # 현재(최신) 분석 결과를 바로 가리키는 포인터 (analyses 전체를 훑지 않도록)
+    latest_analysis_id = Column(
+        Integer,
+        ForeignKey("dream_analyses.id", ondelete="SET NULL", use_alter=True, name="fk_dreams_latest_analysis_id"),
+        nullable=True,
+    )
+
     images = relationship("Image", back_populates="dream", cascade="all, delete")
 
     # 관계
-    analyses = relationship("DreamAnalysis", back_populates="dream", cascade="all, delete-orphan")
+    analyses = relationship(
+        "DreamAnalysis",
+        back_populates="dream",
+        cascade="all, delete-orphan",
+        foreign_keys="DreamAnalysis.dream_id",
+    )
+    latest_analysis = relationship(
+        "DreamAnalysis",
+        foreign_keys=[latest_analysis_id],
+        post_update=True,  # dreams ↔ dream_analyses 순환 참조라서 INSERT 후 UPDATE 로 설정
+    )
+
+# 분류기 facet 헤드 출력 순서 = 컬럼 이름 접두어 (services.dream_analyzer 도 이 정의를 사용)
+FACETS = ("aggression", "friendliness", "sexuality")
 
 class DreamAnalysis(Base):
     __tablename__ = "dream_analyses"
 
     id = Column(Integer, primary_key=True, index=True)
-    dream_id = Column(Integer, ForeignKey("dreams.id", ondelete="CASCADE"), nullable=False)
+    dream_id = Column(Integer, ForeignKey("dreams.id", ondelete="CASCADE"), index=True, nullable=False)
 
     # 긍/부정 확률
     pos_prob = Column(Float, nullable=False)
     neg_prob = Column(Float, nullable=False)
 
     # 세부 요소 및 노트
+    # facets_json 은 기존 응답 / 내보내기 호환용으로만 유지하고,
+    # 집계 / 필터는 아래 facet 컬럼(DB 에서 바로 AVG / WHERE 가능)을 사용
     facets_json = Column(JSON, nullable=False, default=dict)
     notes_json = Column(JSON, nullable=False, default=list)
 
+    # facet 확률 (0~1) / 라벨 (0/1), 옛 행은 migrate_facet_columns 에서 백필
+    aggression_prob = Column(Float, nullable=True)
+    friendliness_prob = Column(Float, nullable=True)
+    sexuality_prob = Column(Float, nullable=True)
+    aggression_label = Column(Integer, nullable=True)
+    friendliness_label = Column(Integer, nullable=True)
+    sexuality_label = Column(Integer, nullable=True)
+
+    # 이 분석을 만든 모델 버전 (dream_analyzer.model_version(), 옛 행은 NULL)
+    model_version = Column(String(64), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # 관계
-    dream = relationship("Dream", back_populates="analyses")
+    dream = relationship("Dream", back_populates="analyses", foreign_keys=[dream_id])
+
+    @staticmethod
+    def facet_columns(facets: dict) -> dict:
+        """
+        {"labels": {...}, "probs": {...}} → facet 컬럼 값 dict (없는 facet 은 None).
+        옛 형식({"aggression": 0.9, ...} 처럼 확률만 평평하게 저장된 JSON)은 확률만 채움.
+        """
+        facets = facets or {}
+        probs = facets.get("probs", facets) or {}
+        labels = facets.get("labels") or {}
+        cols = {}
+        for name in FACETS:
+            p, l = probs.get(name), labels.get(name)
+            cols[f"{name}_prob"] = float(p) if p is not None else None
+            cols[f"{name}_label"] = int(l) if l is not None else None
+        return cols
 
     @classmethod
     def from_result(cls, dream_id: int, result: dict) -> "DreamAnalysis":
+        facets = result.get("facets", {})
         return cls(
             dream_id=dream_id,
             pos_prob=float(result["valence"]["positive"]),
             neg_prob=float(result["valence"]["negative"]),
-            facets_json=result.get("facets", {}),
+            facets_json=facets,
             notes_json=result.get("nlg_notes", []),
-        )
\ No newline at end of file
+            model_version=result.get("model_version"),
+            **cls.facet_columns(facets),
+        )
+
+class DreamDailyEmotion(Base):
+    """
+    캘린더용 (user_id, day) 단위 감정 롤업.
+    /dreams/analyze 에서 분석을 저장할 때 같은 트랜잭션 안에서 합계/개수를 누적해 두고,
+    캘린더 조회는 이 테이블을 PK 범위로 최대 31행만 읽는다.
+    """
+    __tablename__ = "dream_daily_emotions"
+
+    user_id = Column(String(64), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    pos_sum = Column(Float, nullable=False, default=0.0)
+    neg_sum = Column(Float, nullable=False, default=0.0)
+    dream_count = Column(Integer, nullable=False, default=0)
+
+class UserDataVersion(Base):
+    """
+    유저별 데이터 버전. 꿈 / 분석 / 이미지를 쓸 때마다 같은 트랜잭션에서 1씩 증가.
+    캘린더 / 날짜별 조회는 이 값으로 ETag 를 만들어서, 바뀐 게 없으면 집계 쿼리 없이 304.
+    """
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -8,7 +8,7 @@ class Image(Base):
     __tablename__ = "images"
 
     id = Column(Integer, primary_key=True, index=True)
-    dream_id = Column(Integer, ForeignKey("dreams.id", ondelete="CASCADE"))
+    dream_id = Column(Integer, ForeignKey("dreams.id", ondelete="CASCADE"), index=True)
     image_url = Column(String, nullable=False)
     description = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -50,3 +50,21 @@ class DreamDetail(BaseModel):
 
     class Config:
         from_attributes = True
+
+class DreamHistoryItem(BaseModel):
+    id: int
+    date: Optional[str]
+    preview: str                      # 본문 앞부분 (최대 HISTORY_PREVIEW_CHARS 자)
+    positive: Optional[float] = None  # 최신 분석 기준, 분석이 없으면 None
+    negative: Optional[float] = None
+    thumbnail: Optional[str] = None   # 첫 번째 이미지 URL
+
+class DreamHistoryPage(BaseModel):
+    items: List[DreamHistoryItem]
+    next_cursor: Optional[str] = None  # 다음 페이지 요청에 그대로 전달 (없으면 마지막 페이지)
+
+class FacetTrendDay(BaseModel):
+    date: str                         # "YYYY-MM-DD"
+    dream_count: int
+    avg_probs: Dict[str, float]       # facet 별 평균 확률 (최신 분석 기준)
+    high_counts: Dict[str, int]       # facet 라벨이 1 인 꿈 수
@@ -0,0 +1,173 @@
+# fastapi_app/services/daily_rollup.py
+"""
+유저별 일간 감정 롤업 (dream_daily_emotions) 유지
+
+- add_to_rollup      : 분석 저장과 같은 트랜잭션에서 (user_id, day) 합계/개수 누적
+- adjust_rollup      : 재채점으로 꿈의 최신 분석이 바뀌었을 때 합계만 차이만큼 보정 (개수 그대로)
+- read_month         : 캘린더 조회 (PK 범위 스캔, 최대 31행)
+- backfill           : 기존 dreams 의 최신 분석(latest_analysis_id)으로 롤업 전체 재계산
+
+백필 실행:
+    python -m fastapi_app.services.daily_rollup
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from fastapi_app.models.dream import Dream, DreamAnalysis, DreamDailyEmotion
+from fastapi_app.services.user_version import bump_data_epoch
+
+
+# (user_id, day, pos_prob, neg_prob)
+RollupItem = Tuple[str, date, float, float]
+
+
+def _upsert_stmt(dialect_name: str, rows: List[dict]):
+    """
+    SQLite / PostgreSQL 은 INSERT ... ON CONFLICT DO UPDATE 한 문장으로 누적.
+    그 외 DB 는 None 을 돌려주고 호출 쪽에서 select → update/insert 로 처리.
+    """
+    if dialect_name == "sqlite":
+        dialect_insert = sqlite.insert
+    elif dialect_name == "postgresql":
+        dialect_insert = postgresql.insert
+    else:
+        return None
+
+    T = DreamDailyEmotion
+    stmt = dialect_insert(T).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[T.user_id, T.day],
+        set_={
+            "pos_sum": T.pos_sum + stmt.excluded.pos_sum,
+            "neg_sum": T.neg_sum + stmt.excluded.neg_sum,
+            "dream_count": T.dream_count + stmt.excluded.dream_count,
+        },
+    )
+
+
+def _aggregate(items: Iterable[RollupItem], count_each: int = 1) -> List[dict]:
+    acc = defaultdict(lambda: [0.0, 0.0, 0])
+    for user_id, day, pos, neg in items:
+        if not user_id or not day:
+            continue
+        a = acc[(user_id, day)]
+        a[0] += float(pos)
+        a[1] += float(neg)
+        a[2] += count_each
+    return [
+        {"user_id": u, "day": d, "pos_sum": p, "neg_sum": n, "dream_count": c}
+        for (u, d), (p, n, c) in acc.items()
+    ]
+
+
+def add_to_rollup(db: Session, items: Iterable[RollupItem]):
+    """
+    분석 결과들을 롤업에 누적. commit 은 호출하는 쪽 트랜잭션에 맡긴다.
+    """
+    _apply(db, _aggregate(items))
+
+
+def adjust_rollup(db: Session, deltas: Iterable[RollupItem]):
+    """
+    (user_id, day, pos 차이, neg 차이) 만큼 합계만 보정 (dream_count 는 그대로).
+    꿈의 최신 분석을 새 분석으로 교체할 때 사용.
+    """
+    _apply(db, _aggregate(deltas, count_each=0))
+
+
+def _apply(db: Session, rows: List[dict]):
+    if not rows:
+        return
+
+    stmt = _upsert_stmt(db.get_bind().dialect.name, rows)
+    if stmt is not None:
+        db.execute(stmt)
+        return
+
+    # 범용 경로 (행 잠금 후 갱신)
+    T = DreamDailyEmotion
+    for r in rows:
+        cur = db.execute(
+            select(T).where(T.user_id == r["user_id"], T.day == r["day"]).with_for_update()
+        ).scalar_one_or_none()
+        if cur is None:
+            db.execute(insert(T).values(**r))
+        else:
+            db.execute(
+                update(T)
+                .where(T.user_id == r["user_id"], T.day == r["day"])
+                .values(
+                    pos_sum=T.pos_sum + r["pos_sum"],
+                    neg_sum=T.neg_sum + r["neg_sum"],
+                    dream_count=T.dream_count + r["dream_count"],
+                )
+            )
+
+
+def month_range(month: str) -> Tuple[date, date]:
+    """"2025-11" → (2025-11-01, 2025-12-01) (시작 포함, 끝 미포함)"""
+    year, mon = (int(x) for x in month.split("-"))
+    start = date(year, mon, 1)  # 잘못된 월이면 ValueError
+    end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+    return start, end
+
+
+def month_stmt(user_id: str, month: str):
+    """캘린더 조회 SELECT (동기 / 비동기 세션 공용)"""
+    start, end = month_range(month)
+    T = DreamDailyEmotion
+    return (
+        select(T)
+        .where(T.user_id == user_id, T.day >= start, T.day < end)
+        .order_by(T.day)
+    )
+
+
+def read_month(db: Session, user_id: str, month: str) -> List[DreamDailyEmotion]:
+    return list(db.execute(month_stmt(user_id, month)).scalars())
+
+
+def backfill(db: Session) -> int:
+    """
+    롤업 테이블을 비우고 dreams + 최신 분석에서 다시 계산 (한 트랜잭션).
+    꿈 하나는 최신 분석 하나로만 집계 (재채점으로 분석이 여러 개여도 중복 집계 안 함).
+    반환: 생성된 롤업 행 수
+    """
+    T = DreamDailyEmotion
+    db.execute(delete(T))
+
+    src = (
+        select(
+            Dream.user_id,
+            Dream.date,
+            func.sum(DreamAnalysis.pos_prob),
+            func.sum(DreamAnalysis.neg_prob),
+            func.count(DreamAnalysis.id),
+        )
+        .join(DreamAnalysis, DreamAnalysis.id == Dream.latest_analysis_id)
+        .where(Dream.user_id.is_not(None), Dream.date.is_not(None))
+        .group_by(Dream.user_id, Dream.date)
+    )
+    db.execute(
+        insert(T).from_select(["user_id", "day", "pos_sum", "neg_sum", "dream_count"], src)
+    )
+    n = db.execute(select(func.count()).select_from(T)).scalar_one()
+    # 유저별 버전을 거치지 않은 일괄 변경이므로 전역 epoch 를 올려서 캐시된 ETag 를 무효화
+    bump_data_epoch(db)
+    db.commit()
+    return n
+
+
+if __name__ == "__main__":
+    from fastapi_app.db.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        rows = backfill(session)
+    print(f"✅ dream_daily_emotions 백필 완료: {rows} rows")
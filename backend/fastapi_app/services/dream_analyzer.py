@@ -1,13 +1,21 @@
 # fastapi_app/services/dream_analyzer.py
 
+import hashlib
+import os
+import queue
+import threading
+import time
 from pathlib import Path
 from functools import lru_cache
-from typing import Dict, Any
+from concurrent.futures import Future
+from typing import Dict, Any, List, Callable, Optional
 
 import torch
 import torch.nn as nn
 
-from fastapi_app.services.embedding_e5 import encode_texts
+from fastapi_app.models.dream import FACETS
+from fastapi_app.services.embedding_e5 import MODEL_NAME as E5_MODEL_NAME, encode_texts
+from fastapi_app.services.shared_weights import SHARED_ENABLED, file_fingerprint, load_shared
 
 
 # =========================
@@ -24,6 +32,16 @@ FACETS_MODEL_PATH = ML_DIR / "facets_e5_classifier.pt"
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+# 마이크로 배칭 설정 (동시 요청을 모아서 한 번에 E5 forward)
+# - ANALYZE_BATCHING=0 이면 배칭 없이 요청마다 바로 실행
+# - ANALYZE_MAX_BATCH: 한 번에 묶을 최대 요청 수
+# - ANALYZE_MAX_WAIT_MS: 첫 요청 도착 후 배치를 채우려고 기다리는 최대 시간(ms)
+BATCHING_ENABLED = os.getenv("ANALYZE_BATCHING", "1") != "0"
+MAX_BATCH_SIZE = int(os.getenv("ANALYZE_MAX_BATCH", "16"))
+MAX_WAIT_MS = float(os.getenv("ANALYZE_MAX_WAIT_MS", "10"))
+# 배치 API(analyze_many)에서 encode_texts 한 번에 넣을 최대 텍스트 수
+BULK_CHUNK_SIZE = int(os.getenv("ANALYZE_BULK_CHUNK", "64"))
+
 
 # =========================
 # MLP 구조 (훈련 때와 동일)
@@ -43,20 +61,71 @@ class MLP(nn.Module):
 
 
 # =========================
-# 분류기 로딩 (1번만)
+# Fused 멀티헤드 (valence + facets 한 번에)
 # =========================
 
-@lru_cache(maxsize=1)
-def _load_e5_classifiers():
+class FusedE5Heads(nn.Module):
     """
-    E5 임베딩 위에서 동작하는
-    - valence 이진 분류기 (1차원 출력)
-    - facets 멀티라벨 분류기 (3차원 출력: aggression / friendliness / sexuality)
-    를 로딩해서 반환.
+    훈련 때의 MLP 헤드 여러 개(valence 1차원, facets 3차원)를 하나로 합친 모듈.
+
+    - 1층: 각 헤드의 Linear(768, 256) 가중치를 세로로 쌓아서 Linear(768, 256*H) 한 번
+    - 2층: 각 헤드의 Linear(256, out) 가중치를 block-diagonal 로 배치해서 한 번
+    → 헤드 개수와 상관없이 matmul 2번으로 (N, 1+3) 로짓을 계산.
+    sigmoid / threshold 도 배치 전체에 대해 벡터 연산으로 처리.
     """
-    val_model = MLP(768, 1)
-    fac_model = MLP(768, 3)
 
+    def __init__(self, in_dim: int = 768, hidden: int = 256, head_dims=(1, 3), threshold: float = 0.5):
+        super().__init__()
+        self.head_dims = tuple(int(d) for d in head_dims)
+        self.fc1 = nn.Linear(in_dim, hidden * len(self.head_dims))
+        self.fc2 = nn.Linear(hidden * len(self.head_dims), sum(self.head_dims))
+        self.register_buffer("threshold", torch.full((sum(self.head_dims),), float(threshold)))
+
+    @classmethod
+    def from_mlps(cls, mlps: List[MLP], threshold: float = 0.5) -> "FusedE5Heads":
+        firsts = [m.net[0] for m in mlps]
+        seconds = [m.net[2] for m in mlps]
+        fused = cls(
+            in_dim=firsts[0].in_features,
+            hidden=firsts[0].out_features,
+            head_dims=[l.out_features for l in seconds],
+            threshold=threshold,
+        )
+        with torch.no_grad():
+            fused.fc1.weight.copy_(torch.cat([l.weight for l in firsts], dim=0))
+            fused.fc1.bias.copy_(torch.cat([l.bias for l in firsts], dim=0))
+            fused.fc2.weight.copy_(torch.block_diag(*[l.weight for l in seconds]))
+            fused.fc2.bias.copy_(torch.cat([l.bias for l in seconds], dim=0))
+        return fused
+
+    @classmethod
+    def from_state_dicts(cls, state_val: dict, state_fac: dict) -> "FusedE5Heads":
+        # 기존 MLP에 먼저 로딩해서 키/shape 검증을 그대로 재사용
+        val_model = MLP(768, 1)
+        fac_model = MLP(768, 3)
+        val_model.load_state_dict(state_val)
+        fac_model.load_state_dict(state_fac)
+        return cls.from_mlps([val_model, fac_model])
+
+    def forward(self, x):
+        return self.fc2(torch.relu(self.fc1(x)))  # (N, 1+3) 로짓
+
+    def predict(self, x):
+        """
+        반환: (probs, labels)
+          probs : (N, 4) float  [P(negative), P(aggression), P(friendliness), P(sexuality)]
+          labels: (N, 4) int    threshold 초과 여부
+        """
+        probs = torch.sigmoid(self.forward(x))
+        labels = (probs > self.threshold).to(torch.int64)
+        return probs, labels
+
+
+# =========================
+# 분류기 로딩 (1번만)
+# =========================
+
+def _build_e5_heads() -> FusedE5Heads:
     # torch.load 기본값이 weights_only=True라서 False 명시
     state_val = torch.load(
         VALENCE_MODEL_PATH,
@@ -69,14 +138,47 @@ def _load_e5_classifiers():
         weights_only=False,
     )
 
-    val_model.load_state_dict(state_val)
-    fac_model.load_state_dict(state_fac)
+    return FusedE5Heads.from_state_dicts(state_val, state_fac)
+
 
-    val_model.eval()
-    fac_model.eval()
+@lru_cache(maxsize=1)
+def _load_e5_classifiers() -> FusedE5Heads:
+    """
+    E5 임베딩 위에서 동작하는
+    - valence 이진 분류기 (1차원 출력)
+    - facets 멀티라벨 분류기 (3차원 출력: aggression / friendliness / sexuality)
+    를 기존 state dict에서 로딩해서 하나의 FusedE5Heads 로 합쳐 반환.
+    MODEL_SHARED_DIR 가 있으면 워커 간에 mmap 으로 공유.
+    """
+    if SHARED_ENABLED:
+        heads = load_shared(
+            "e5-heads",
+            build=_build_e5_heads,
+            make_empty=FusedE5Heads,
+            fingerprint=file_fingerprint(VALENCE_MODEL_PATH, FACETS_MODEL_PATH),
+        )
+    else:
+        heads = _build_e5_heads()
+    heads.eval()
 
     # 원하면 여기서 .to(DEVICE) 해서 GPU로 옮겨도 됨
-    return val_model, fac_model
+    return heads
+
+
+@lru_cache(maxsize=1)
+def model_version() -> str:
+    """
+    분석 결과를 만든 모델 버전 (DreamAnalysis.model_version 에 저장).
+    E5 모델 이름 + 두 분류기 가중치 파일 내용의 sha256 앞 16자리.
+    → 분류기를 재학습해서 파일이 바뀌면 값이 달라지고, 재채점 워커가 옛 분석을 찾을 수 있다.
+    (헤드와 마찬가지로 프로세스당 한 번 계산, 파일 교체 후에는 재시작 필요)
+    """
+    h = hashlib.sha256(E5_MODEL_NAME.encode())
+    for path in (VALENCE_MODEL_PATH, FACETS_MODEL_PATH):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
 
 
 # =========================
@@ -84,71 +186,217 @@ def _load_e5_classifiers():
 # =========================
 
 @torch.no_grad()
-def analyze_dream_with_e5(text: str) -> Dict[str, Any]:
+def analyze_dreams_with_e5(texts: List[str], long_text: Optional[bool] = None) -> List[Dict[str, Any]]:
     """
-    입력: 한국어 꿈 텍스트 1개
-    출력: valence + facets 예측 결과(dic 형식)
+    입력: 한국어 꿈 텍스트 리스트 (N개)
+    출력: 텍스트별 valence + facets 예측 결과 리스트 (입력 순서 유지)
 
     - valence: 0=non_negative(비부정), 1=negative(부정)
     - facets:
         aggression: 0/1
         friendliness: 0/1
         sexuality: 0/1
+    long_text=True 면 256 토큰을 넘는 꿈도 슬라이딩 윈도우로 전체를 반영
+    (None 이면 E5_LONG_TEXT 설정을 따름)
     """
-    # 1) E5 임베딩 추출 (1, 768)
-    emb = encode_texts([text])   # (1, 768), CPU 텐서
-    emb = emb.float()            # 분류기는 float32로 학습됨
+    if not texts:
+        return []
+
+    # 1) E5 임베딩 추출 (N, 768) - 배치 전체를 한 번에
+    emb = encode_texts(list(texts), long_text=long_text)   # (N, 768), CPU 텐서
+    emb = emb.float()                 # 분류기는 float32로 학습됨
 
     # 2) 분류기 로딩
-    val_model, fac_model = _load_e5_classifiers()
-
-    # 3) Valence 예측
-    val_logit = val_model(emb).squeeze(1)          # (1,)
-    val_prob_neg = torch.sigmoid(val_logit).item() # 부정일 확률 P(negative)
-    val_label = 1 if val_prob_neg > 0.5 else 0     # 1: negative, 0: non_negative
-
-    # 4) Facets 예측 (aggression / friendliness / sexuality)
-    fac_logits = fac_model(emb)                    # (1, 3)
-    fac_probs = torch.sigmoid(fac_logits).squeeze(0)  # (3,)
-    p_aggr, p_friend, p_sex = [float(x) for x in fac_probs.tolist()]
-
-    l_aggr = 1 if p_aggr > 0.5 else 0
-    l_friend = 1 if p_friend > 0.5 else 0
-    l_sex = 1 if p_sex > 0.5 else 0
-
-    # 5) 결과 포맷 (valence / facets 키 구조 유지)
-    val_prob_pos = float(1.0 - val_prob_neg)  # 비부정(positive)에 해당
-    result: Dict[str, Any] = {
-        "valence": {
-            # 0: non_negative, 1: negative
-            "label": int(val_label),
-            "label_str": "negative" if val_label == 1 else "non_negative",
-
-            # 새 형식
-            "prob_negative": float(val_prob_neg),
-            "prob_non_negative": val_prob_pos,
-
-            # 옛날 DreamAnalysis.from_result가 기대하는 키 (호환용)
-            "negative": float(val_prob_neg),
-            "positive": val_prob_pos,
-        },
-        "facets": {
-            # labels: 0/1
-            "labels": {
-                "aggression": int(l_aggr),
-                "friendliness": int(l_friend),
-                "sexuality": int(l_sex),
+    heads = _load_e5_classifiers()
+
+    # 3) valence + facets 를 한 번에 예측 (N, 4)
+    probs, labels = heads.predict(emb)
+
+    return _format_results(probs, labels, model_version())
+
+
+def _format_results(probs: torch.Tensor, labels: torch.Tensor, version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    (N, 4) 확률/라벨 텐서를 API 응답용 dict 리스트로 변환.
+    텐서 → 파이썬 변환은 배치 전체에 대해 한 번씩만 수행.
+    """
+    prob_rows = probs.tolist()
+    label_rows = labels.tolist()
+
+    results: List[Dict[str, Any]] = []
+    for (val_prob_neg, *fac_probs), (val_label, *fac_labels) in zip(prob_rows, label_rows):
+        # 결과 포맷 (valence / facets 키 구조 유지)
+        val_prob_pos = 1.0 - val_prob_neg  # 비부정(positive)에 해당
+        results.append({
+            "valence": {
+                # 0: non_negative, 1: negative
+                "label": val_label,
+                "label_str": "negative" if val_label == 1 else "non_negative",
+
+                # 새 형식
+                "prob_negative": val_prob_neg,
+                "prob_non_negative": val_prob_pos,
+
+                # 옛날 DreamAnalysis.from_result가 기대하는 키 (호환용)
+                "negative": val_prob_neg,
+                "positive": val_prob_pos,
             },
-            # 확률 값
-            "probs": {
-                "aggression": p_aggr,
-                "friendliness": p_friend,
-                "sexuality": p_sex,
+            "facets": {
+                # labels: 0/1
+                "labels": dict(zip(FACETS, fac_labels)),
+                # 확률 값
+                "probs": dict(zip(FACETS, fac_probs)),
             },
-        },
-    }
+            "model_version": version,
+        })
 
-    return result
+    return results
+
+
+def analyze_dream_with_e5(text: str, long_text: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    입력: 한국어 꿈 텍스트 1개
+    출력: valence + facets 예측 결과(dic 형식)
+    (analyze_dreams_with_e5의 단건 버전)
+    """
+    return analyze_dreams_with_e5([text], long_text=long_text)[0]
+
+
+# =========================
+# 마이크로 배칭 스케줄러
+# =========================
+
+class MicroBatcher:
+    """
+    여러 스레드에서 동시에 들어오는 단건 요청을 큐에 모아
+    batch_fn(items) 한 번으로 처리한 뒤 결과를 각 호출자에게 돌려준다.
+
+    - 첫 요청이 도착하면 최대 max_wait_ms 동안 (또는 max_batch_size 개가 찰 때까지)
+      뒤따르는 요청을 모아서 하나의 배치로 실행
+    - batch_fn은 입력과 같은 길이/순서의 결과 리스트를 반환해야 함
+    - 워커 스레드는 첫 submit 때 시작 (daemon)
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        name: str = "micro-batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._queue: "queue.Queue[tuple[Any, Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # 통계 (latency ↔ throughput 튜닝용)
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._last_batch_size = 0
+        self._wait_ms_total = 0.0
+        self._run_ms_total = 0.0
+        self._errors = 0
+        self._size_hist: Dict[int, int] = {}
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._ensure_worker()
+        self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def __call__(self, item: Any) -> Any:
+        """단건 호출: 배치에 합류해서 결과가 나올 때까지 블로킹"""
+        return self.submit(item).result()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list:
+        # 첫 요청은 무기한 대기
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            # 이미 쌓여 있는 요청은 기다리지 않고 바로 가져감
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [it for it, _, _ in batch]
+            futures = [f for _, f, _ in batch]
+
+            started = time.perf_counter()
+            wait_ms = sum((started - t0) * 1000.0 for _, _, t0 in batch)
+
+            try:
+                outputs = self.batch_fn(items)
+                if len(outputs) != len(items):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(outputs)} results for {len(items)} items"
+                    )
+            except BaseException as e:  # 배치 전체 실패 → 모든 호출자에게 전달
+                with self._lock:
+                    self._errors += 1
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            finally:
+                run_ms = (time.perf_counter() - started) * 1000.0
+                with self._lock:
+                    n = len(batch)
+                    self._batches += 1
+                    self._items += n
+                    self._last_batch_size = n
+                    self._max_seen = max(self._max_seen, n)
+                    self._wait_ms_total += wait_ms
+                    self._run_ms_total += run_ms
+                    self._size_hist[n] = self._size_hist.get(n, 0) + 1
+
+            for f, out in zip(futures, outputs):
+                f.set_result(out)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "avg_batch_size": (items / batches) if batches else 0.0,
+                "max_batch_size_seen": self._max_seen,
+                "last_batch_size": self._last_batch_size,
+                "avg_queue_wait_ms": (self._wait_ms_total / items) if items else 0.0,
+                "avg_batch_run_ms": (self._run_ms_total / batches) if batches else 0.0,
+                "batch_size_hist": dict(sorted(self._size_hist.items())),
+            }
 
 
 # =========================
@@ -165,22 +413,58 @@ class DreamAnalyzer:
     """
 
     _instance: "DreamAnalyzer | None" = None
+    _instance_lock = threading.Lock()
 
     @classmethod
     def get(cls) -> "DreamAnalyzer":
+        # 동시 첫 요청에서 배처가 두 개 생기지 않도록 잠금
         if cls._instance is None:
-            cls._instance = cls()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
         return cls._instance
 
     def __init__(self):
         # 미리 로딩해 두면 매 호출마다 load 안 해도 됨
-        self.val_model, self.fac_model = _load_e5_classifiers()
+        self.heads = _load_e5_classifiers()
+
+        # 동시 요청을 모아서 한 번의 encode_texts + 분류기 패스로 처리
+        self.batcher: Optional[MicroBatcher] = (
+            MicroBatcher(analyze_dreams_with_e5, name="dream-analyzer-batcher")
+            if BATCHING_ENABLED else None
+        )
 
-    @torch.no_grad()
     def analyze(self, text: str) -> Dict[str, Any]:
         """
         API에서 사용하는 메인 진입점.
-        내부적으로 analyze_dream_with_e5를 호출.
+        배칭이 켜져 있으면 다른 동시 요청들과 묶여서 실행되고,
+        꺼져 있으면 analyze_dream_with_e5를 바로 호출.
         """
-        # 여기서는 위의 공통 함수 재사용
-        return analyze_dream_with_e5(text)
+        if self.batcher is None:
+            return analyze_dream_with_e5(text)
+        return self.batcher(text)
+
+    def analyze_many(self, texts: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """
+        이미 묶여서 들어온 여러 텍스트를 처리 (배치 API / 임포트용).
+        마이크로 배처를 거치지 않고 chunk_size 단위로 바로 encode_texts + 분류기 실행.
+        """
+        results: List[Dict[str, Any]] = []
+        for i in range(0, len(texts), chunk_size):
+            results.extend(analyze_dreams_with_e5(texts[i : i + chunk_size]))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        if self.batcher is None:
+            return {"batching": False}
+        return {"batching": True, **self.batcher.stats()}
+
+
+def analyzer_stats() -> Dict[str, Any]:
+    """
+    /metrics 용: 분석기가 아직 로딩되지 않았으면 모델을 올리지 않고 빈 상태를 반환.
+    """
+    inst = DreamAnalyzer._instance
+    if inst is None:
+        return {"loaded": False}
+    return {"loaded": True, **inst.stats()}
@@ -0,0 +1,387 @@
+# fastapi_app/services/dream_transfer.py
+"""
+Dream / DreamAnalysis / Image 레코드 NDJSON 내보내기 / 가져오기
+
+환경 간 유저 이전, 백업 복원용. POST /dreams/analyze 를 꿈마다 다시 부르는 대신
+레코드를 그대로 옮기고, 분석이 없는 꿈만(또는 옵션에 따라 전부) 다시 추론한다.
+
+형식 (한 줄에 JSON 하나):
+    {"type": "header", "format": "dreams-ndjson", "version": 1, "exported_at": "..."}
+    {"type": "dream", "dream": {...}, "analyses": [{..., "latest": true}], "images": [{...}]}
+
+- export: dreams 를 서버 사이드 커서(stream_results + yield_per)로 읽고,
+          EXPORT_BATCH 개씩 analyses / images 를 IN 조회해서 바로 한 줄씩 내보냄
+- import: IMPORT_BATCH 개씩 모아서 dreams / dream_analyses / images 를
+          multi-row INSERT ... RETURNING 으로 넣고 배치마다 commit
+→ 옮기는 행 수와 상관없이 메모리에는 배치 하나만 올라간다.
+(이미지 파일 자체는 옮기지 않음: image_url 경로만 이전)
+
+CLI:
+    python -m fastapi_app.services.dream_transfer export backup.ndjson [--user-id U]
+    python -m fastapi_app.services.dream_transfer import backup.ndjson [--user-id U] [--analyze missing|all|none]
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from fastapi_app.models.dream import Dream, DreamAnalysis
+from fastapi_app.models.image import Image
+from fastapi_app.services.daily_rollup import add_to_rollup
+from fastapi_app.services.user_version import bump_versions
+
+
+EXPORT_BATCH = int(os.getenv("TRANSFER_EXPORT_BATCH", "500"))
+IMPORT_BATCH = int(os.getenv("TRANSFER_IMPORT_BATCH", "200"))
+
+FORMAT = "dreams-ndjson"
+VERSION = 1
+
+# 가져올 때 재추론 모드
+#  - missing: 분석 기록이 없는 꿈만 추론 (기본)
+#  - all    : 내보낸 분석은 버리고 전부 다시 추론
+#  - none   : 추론 안 함 (분석 없는 꿈은 분석 없이 저장)
+ANALYZE_MODES = ("missing", "all", "none")
+
+DREAM_FIELDS = ("input_type", "input_text", "stt_text", "text", "emotion", "interpretation", "user_id", "date", "created_at")
+ANALYSIS_FIELDS = ("pos_prob", "neg_prob", "facets_json", "notes_json", "model_version", "created_at")
+IMAGE_FIELDS = ("image_url", "description", "created_at")
+
+
+class RecordError(ValueError):
+    """가져올 레코드 한 줄이 잘못됐을 때"""
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _pick(row, fields) -> Dict[str, Any]:
+    return {f: _jsonable(getattr(row, f)) for f in fields}
+
+
+def _dumps(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+# =========================
+# 내보내기
+# =========================
+
+def export_lines(db: Session, user_id: Optional[str] = None, batch_size: int = EXPORT_BATCH) -> Iterator[str]:
+    """NDJSON 줄들을 차례로 생성 (헤더 1줄 + 꿈마다 1줄)."""
+    yield _dumps({
+        "type": "header",
+        "format": FORMAT,
+        "version": VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "user_id": user_id,
+    })
+
+    stmt = select(Dream.id, Dream.latest_analysis_id, *(getattr(Dream, f) for f in DREAM_FIELDS)).order_by(Dream.id)
+    if user_id is not None:
+        stmt = stmt.where(Dream.user_id == user_id)
+
+    # 서버 사이드 커서: 전체 결과를 한 번에 받아오지 않고 batch_size 씩
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for part in result.partitions():
+        ids = [r.id for r in part]
+
+        analyses = defaultdict(list)
+        for a in db.execute(
+            select(DreamAnalysis.id, DreamAnalysis.dream_id, *(getattr(DreamAnalysis, f) for f in ANALYSIS_FIELDS))
+            .where(DreamAnalysis.dream_id.in_(ids))
+            .order_by(DreamAnalysis.dream_id, DreamAnalysis.id)
+        ):
+            analyses[a.dream_id].append(a)
+
+        images = defaultdict(list)
+        for img in db.execute(
+            select(Image.dream_id, *(getattr(Image, f) for f in IMAGE_FIELDS))
+            .where(Image.dream_id.in_(ids))
+            .order_by(Image.dream_id, Image.id)
+        ):
+            images[img.dream_id].append(img)
+
+        for d in part:
+            yield _dumps({
+                "type": "dream",
+                "dream": _pick(d, DREAM_FIELDS),
+                "analyses": [
+                    {**_pick(a, ANALYSIS_FIELDS), "latest": a.id == d.latest_analysis_id}
+                    for a in analyses[d.id]
+                ],
+                "images": [_pick(img, IMAGE_FIELDS) for img in images[d.id]],
+            })
+
+
+# =========================
+# 가져오기
+# =========================
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    NDJSON 한 줄 → 꿈 레코드 dict (헤더 / 빈 줄은 None).
+    형식이 틀리면 RecordError.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise RecordError(f"invalid json: {e}")
+    if not isinstance(obj, dict):
+        raise RecordError("record must be a json object")
+
+    kind = obj.get("type")
+    if kind == "header":
+        if obj.get("format") != FORMAT or obj.get("version") != VERSION:
+            raise RecordError(f"unsupported format: {obj.get('format')} v{obj.get('version')}")
+        return None
+    if kind != "dream":
+        raise RecordError(f"unknown record type: {kind!r}")
+
+    dream = obj.get("dream") or {}
+    if not isinstance(dream.get("text"), str) or not dream["text"].strip():
+        raise RecordError("dream.text is empty")
+    try:
+        dream_row = {f: dream.get(f) for f in DREAM_FIELDS}
+        dream_row["input_type"] = dream_row["input_type"] or "text"
+        dream_row["date"] = _parse_date(dream_row["date"])
+        dream_row["created_at"] = _parse_datetime(dream_row["created_at"]) or datetime.now(timezone.utc)
+
+        analyses = []
+        for a in obj.get("analyses") or []:
+            row = {f: a.get(f) for f in ANALYSIS_FIELDS}
+            row["pos_prob"] = float(row["pos_prob"])
+            row["neg_prob"] = float(row["neg_prob"])
+            row["facets_json"] = row["facets_json"] or {}
+            row["notes_json"] = row["notes_json"] or []
+            row["created_at"] = _parse_datetime(row["created_at"]) or datetime.now(timezone.utc)
+            analyses.append((row, bool(a.get("latest"))))
+
+        images = []
+        for img in obj.get("images") or []:
+            row = {f: img.get(f) for f in IMAGE_FIELDS}
+            if not row["image_url"]:
+                raise RecordError("image.image_url is empty")
+            row["created_at"] = _parse_datetime(row["created_at"]) or datetime.utcnow()
+            images.append(row)
+    except RecordError:
+        raise
+    except (TypeError, ValueError, AttributeError) as e:
+        raise RecordError(f"invalid field: {e}")
+
+    return {"dream": dream_row, "analyses": analyses, "images": images}
+
+
+def needs_analysis(records: List[Dict[str, Any]], mode: str = "missing") -> List[int]:
+    """재추론이 필요한 레코드 인덱스들"""
+    if mode == "none":
+        return []
+    if mode == "all":
+        return list(range(len(records)))
+    return [i for i, r in enumerate(records) if not r["analyses"]]
+
+
+def import_batch(
+    db: Session,
+    records: List[Dict[str, Any]],
+    inferred: Optional[Dict[int, dict]] = None,
+    mode: str = "missing",
+    user_id: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    레코드 배치 하나를 한 트랜잭션으로 저장.
+    - inferred : {레코드 인덱스: analyze 결과} (needs_analysis 로 고른 것들을 추론한 결과)
+    - user_id  : 지정하면 모든 꿈의 user_id 를 이 값으로 바꿔서 저장 (유저 이전용)
+    """
+    inferred = inferred or {}
+    if not records:
+        return {"dreams": 0, "analyses": 0, "images": 0, "inferred": 0}
+
+    dream_rows = []
+    for r in records:
+        row = dict(r["dream"])
+        if user_id is not None:
+            row["user_id"] = user_id
+        dream_rows.append(row)
+
+    try:
+        # 1) dreams: multi-row INSERT ... RETURNING id (입력 순서 보장)
+        dream_ids = list(db.scalars(
+            insert(Dream).returning(Dream.id, sort_by_parameter_order=True),
+            dream_rows,
+        ))
+
+        # 2) dream_analyses: 내보낸 분석 (mode=all 이면 버림) + 새로 추론한 분석
+        analysis_rows = []
+        rollup = []
+        latest_pos = {}  # 레코드 인덱스 → analysis_rows 안에서 최신 분석 위치
+        for i, r in enumerate(records):
+            rows = [] if mode == "all" else [row for row, _ in r["analyses"]]
+            # latest 표시가 없으면 마지막 분석을 최신으로
+            flagged = [k for k, (_, latest) in enumerate(r["analyses"]) if latest]
+            latest_k = flagged[-1] if flagged and rows else len(rows) - 1
+
+            if i in inferred:
+                new = DreamAnalysis.from_result(dream_id=dream_ids[i], result=inferred[i])
+                rows.append({
+                    "pos_prob": new.pos_prob,
+                    "neg_prob": new.neg_prob,
+                    "facets_json": new.facets_json,
+                    "notes_json": new.notes_json,
+                    "model_version": new.model_version,
+                    "created_at": datetime.now(timezone.utc),
+                })
+                latest_k = len(rows) - 1  # 새로 추론한 결과가 최신
+
+            if rows:
+                latest_pos[i] = len(analysis_rows) + latest_k
+                # 롤업은 꿈마다 최신 분석 하나만 반영 (daily_rollup.backfill 과 같은 기준)
+                latest = rows[latest_k]
+                rollup.append((dream_rows[i]["user_id"], dream_rows[i]["date"], latest["pos_prob"], latest["neg_prob"]))
+            for row in rows:
+                analysis_rows.append({"dream_id": dream_ids[i], **row, **DreamAnalysis.facet_columns(row["facets_json"])})
+
+        analysis_ids: List[int] = []
+        if analysis_rows:
+            analysis_ids = list(db.scalars(
+                insert(DreamAnalysis).returning(DreamAnalysis.id, sort_by_parameter_order=True),
+                analysis_rows,
+            ))
+            # 최신 분석 포인터 (PK 기준 bulk UPDATE)
+            db.execute(update(Dream), [
+                {"id": dream_ids[i], "latest_analysis_id": analysis_ids[pos]}
+                for i, pos in latest_pos.items()
+            ])
+
+        # 3) images
+        image_rows = [
+            {"dream_id": dream_ids[i], **row}
+            for i, r in enumerate(records)
+            for row in r["images"]
+        ]
+        if image_rows:
+            db.execute(insert(Image), image_rows)
+
+        # 4) 캘린더 롤업 + 유저 데이터 버전
+        add_to_rollup(db, rollup)
+        bump_versions(db, [row["user_id"] for row in dream_rows])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {
+        "dreams": len(dream_ids),
+        "analyses": len(analysis_ids),
+        "images": len(image_rows),
+        "inferred": len(inferred),
+    }
+
+
+def iter_batches(lines: Iterable[str], batch_size: int = IMPORT_BATCH, errors: Optional[list] = None) -> Iterator[List[Dict[str, Any]]]:
+    """줄 단위 입력을 파싱해서 batch_size 개씩 묶음 (잘못된 줄은 errors 에 기록하고 건너뜀)."""
+    batch: List[Dict[str, Any]] = []
+    for lineno, line in enumerate(lines, start=1):
+        try:
+            rec = parse_line(line)
+        except RecordError as e:
+            if errors is not None:
+                errors.append({"line": lineno, "error": str(e)})
+            continue
+        if rec is None:
+            continue
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_lines(
+    db: Session,
+    lines: Iterable[str],
+    mode: str = "missing",
+    user_id: Optional[str] = None,
+    analyze_many: Optional[Callable[[List[str]], List[dict]]] = None,
+    batch_size: int = IMPORT_BATCH,
+) -> Dict[str, Any]:
+    """CLI 용: 줄 단위 입력 전체를 배치로 가져오기."""
+    if mode not in ANALYZE_MODES:
+        raise ValueError(f"unknown analyze mode: {mode!r} (expected one of {ANALYZE_MODES})")
+    if analyze_many is None and mode != "none":
+        from fastapi_app.services.dream_analyzer import DreamAnalyzer
+        analyze_many = DreamAnalyzer.get().analyze_many
+
+    totals = {"dreams": 0, "analyses": 0, "images": 0, "inferred": 0}
+    errors: List[dict] = []
+    for batch in iter_batches(lines, batch_size, errors):
+        todo = needs_analysis(batch, mode)
+        inferred = dict(zip(todo, analyze_many([batch[i]["dream"]["text"] for i in todo]))) if todo else {}
+        for k, v in import_batch(db, batch, inferred, mode, user_id).items():
+            totals[k] += v
+    return {**totals, "errors": errors}
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from fastapi_app.db.database import Base, SessionLocal, engine
+    from fastapi_app.db.migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="dreams NDJSON export / import")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="NDJSON 파일 경로 ('-' 이면 stdout / stdin)")
+    parser.add_argument("--user-id", default=None, help="export: 이 유저만 / import: 이 유저로 저장")
+    parser.add_argument("--analyze", default="missing", choices=ANALYZE_MODES)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    with SessionLocal() as session:
+        if args.command == "export":
+            out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8")
+            n = 0
+            try:
+                for line in export_lines(session, args.user_id):
+                    out.write(line)
+                    n += 1
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"✅ exported {max(0, n - 1)} dreams", file=sys.stderr)
+        else:
+            src = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+            try:
+                summary = import_lines(session, src, mode=args.analyze, user_id=args.user_id)
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+            for e in summary["errors"]:
+                print(f"line {e['line']}: {e['error']}", file=sys.stderr)
+            print(
+                f"✅ imported {summary['dreams']} dreams, {summary['analyses']} analyses, "
+                f"{summary['images']} images (inferred {summary['inferred']}, errors {len(summary['errors'])})",
+                file=sys.stderr,
+            )
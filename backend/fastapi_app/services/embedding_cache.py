@@ -0,0 +1,337 @@
+# fastapi_app/services/embedding_cache.py
+"""
+E5 임베딩용 2단 캐시 (content-addressed)
+
+- key  : sha256(모델 이름 + 정규화된 텍스트)
+- 1단계: 프로세스 메모리 안의 LRU (개수 제한)
+- 2단계: 디스크에 저장되는 memory-mapped 벡터 파일 (재시작해도 유지)
+
+디스크 포맷 (네임스페이스 = 모델 이름 해시):
+    <ns>.f32   float32 벡터를 행 단위로 이어붙인 raw 파일 (rows x dim)
+    <ns>.keys  "<key> <row>" 한 줄씩 append 되는 인덱스 로그
+    <ns>.lock  프로세스 간 락 (append / 초기화는 LOCK_EX, 다시 읽기는 LOCK_SH)
+
+벡터를 먼저 쓰고 키를 나중에 쓰기 때문에, 중간에 죽어도
+키가 존재하지 않는 행을 가리키는 일은 없음 (고아 행은 무시됨).
+여러 워커 프로세스가 같은 디렉터리를 써도 되도록 append 는 flock 으로 직렬화.
+
+디스크 계층은 append 만 하므로 E5_CACHE_DISK_MAX 개를 넘기면 두 파일을 통째로 비운다
+(content-addressed 라 지워진 항목은 다시 인코딩하면 그만). 파일은 새 파일로 교체하므로
+다른 프로세스는 inode 가 바뀐 것을 보고 인덱스 / mmap 을 처음부터 다시 만든다.
+"""
+
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+try:  # 윈도우에는 fcntl 이 없음 → 단일 프로세스 기준으로만 동작
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+# =========================
+# 설정
+# =========================
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]  # backend/
+
+# - E5_CACHE=0 이면 캐시 전체 비활성화
+# - E5_CACHE_SIZE: 메모리 LRU 최대 개수
+# - E5_CACHE_DISK=0 이면 디스크 계층 비활성화 (메모리만 사용)
+# - E5_CACHE_DIR: 디스크 계층 위치 (기본 backend/.e5_cache)
+# - E5_CACHE_DISK_MAX: 디스크 계층 최대 개수, 넘으면 비우고 다시 채움 (0 = 제한 없음, 768차원 기준 10만 개 ≈ 300MB)
+CACHE_ENABLED = os.getenv("E5_CACHE", "1") != "0"
+MEMORY_CAPACITY = int(os.getenv("E5_CACHE_SIZE", "4096"))
+DISK_ENABLED = os.getenv("E5_CACHE_DISK", "1") != "0"
+CACHE_DIR = Path(os.getenv("E5_CACHE_DIR", str(BACKEND_DIR / ".e5_cache")))
+DISK_MAX_ENTRIES = int(os.getenv("E5_CACHE_DISK_MAX", "100000"))
+
+
+# =========================
+# 키 생성
+# =========================
+
+def normalize_text(text: str) -> str:
+    """
+    재전송/사소한 편집(앞뒤 공백, 줄바꿈 개수, 유니코드 조합형 차이)이
+    같은 키가 되도록 정규화.
+    """
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def cache_key(text: str, model_name: str) -> str:
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+# =========================
+# 1단계: 메모리 LRU
+# =========================
+
+class LRUStore:
+    def __init__(self, capacity: int):
+        self.capacity = max(0, int(capacity))
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+            return vec
+
+    def put(self, key: str, vec: np.ndarray):
+        if self.capacity == 0:
+            return
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# =========================
+# 2단계: 디스크 (mmap)
+# =========================
+
+class DiskStore:
+    def __init__(self, directory: Path, namespace: str, dim: int, max_entries: int = DISK_MAX_ENTRIES):
+        self.dim = int(dim)
+        self.row_bytes = self.dim * 4  # float32
+        self.max_entries = max(0, int(max_entries))
+        directory.mkdir(parents=True, exist_ok=True)
+        self.vec_path = directory / f"{namespace}.f32"
+        self.key_path = directory / f"{namespace}.keys"
+        self.lock_path = directory / f"{namespace}.lock"
+        self.vec_path.touch(exist_ok=True)
+        self.key_path.touch(exist_ok=True)
+        self.lock_path.touch(exist_ok=True)
+
+        self._index: Dict[str, int] = {}
+        self._key_offset = 0      # keys 파일에서 어디까지 읽었는지
+        self._key_ino = None      # 읽고 있는 keys 파일 (초기화되면 바뀜)
+        self._vec_ino = None
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.resets = 0
+        with self._locked(shared=True):
+            self._refresh()
+
+    # ---- 내부 ----
+
+    @contextmanager
+    def _locked(self, shared: bool):
+        """프로세스 간 락 (같은 프로세스 안은 self._lock 으로 직렬화)"""
+        with open(self.lock_path, "rb") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """다른 프로세스가 append 한 키/벡터를 반영 (락을 잡은 상태에서 호출)."""
+        with open(self.key_path, "rb") as f:
+            ino = os.fstat(f.fileno()).st_ino
+            if ino != self._key_ino:
+                # 처음 열었거나 크기 한도로 초기화됨 → 처음부터 다시 읽음
+                self._index.clear()
+                self._key_offset = 0
+                self._key_ino = ino
+            f.seek(self._key_offset)
+            chunk = f.read()
+        # 마지막 줄이 아직 다 안 써졌으면 다음 번에 읽음
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                self._index[parts[0].decode("ascii")] = int(parts[1])
+        self._key_offset += end
+
+        with open(self.vec_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            rows = st.st_size // self.row_bytes
+            if rows == 0:
+                self._mmap = None
+            elif self._mmap is None or self._mmap.shape[0] != rows or st.st_ino != self._vec_ino:
+                self._mmap = np.memmap(f, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._vec_ino = st.st_ino
+
+    def _reset(self):
+        """두 파일을 빈 새 파일로 교체 (LOCK_EX 안에서만). 다른 프로세스는 inode 로 알아챔."""
+        for path in (self.key_path, self.vec_path):
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(b"")
+            os.replace(tmp, path)
+        self.resets += 1
+        self._refresh()
+
+    def _row(self, key: str) -> Optional[np.ndarray]:
+        row = self._index.get(key)
+        if row is None or self._mmap is None or row >= self._mmap.shape[0]:
+            return None
+        return np.array(self._mmap[row])  # mmap 에서 복사 (파일 재매핑에 안전)
+
+    # ---- 공개 API ----
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if any(k not in self._index for k in keys):
+                with self._locked(shared=True):
+                    self._refresh()
+            out = {}
+            for k in keys:
+                vec = self._row(k)
+                if vec is not None:
+                    out[k] = vec
+            return out
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        with self._lock, self._locked(shared=False):
+            self._refresh()
+            todo = {k: v for k, v in items.items() if k not in self._index}
+            if not todo:
+                return
+            if self.max_entries and len(self._index) + len(todo) > self.max_entries:
+                print(f">> E5 disk cache reached {len(self._index)} entries, resetting")
+                self._reset()
+
+            # 초기화로 파일이 바뀌었을 수 있으므로 락을 잡은 뒤에 연다
+            with open(self.key_path, "ab") as kf, open(self.vec_path, "ab") as vf:
+                # 1) 벡터 먼저 append (행 번호는 현재 파일 크기 기준)
+                start = os.path.getsize(self.vec_path) // self.row_bytes
+                if os.path.getsize(self.vec_path) % self.row_bytes:
+                    # 이전에 중간까지만 써진 행이 있으면 행 경계로 맞춤
+                    vf.truncate(start * self.row_bytes)
+                mat = np.stack([np.asarray(v, dtype=np.float32) for v in todo.values()])
+                vf.write(mat.tobytes())
+                vf.flush()
+                os.fsync(vf.fileno())
+
+                # 2) 그 다음 키 append
+                lines = "".join(f"{k} {start + i}\n" for i, k in enumerate(todo))
+                kf.write(lines.encode("ascii"))
+                kf.flush()
+            self._refresh()
+
+    def __len__(self):
+        return len(self._index)
+
+
+# =========================
+# 2단 캐시 파사드
+# =========================
+
+class EmbeddingCache:
+    """
+    get_or_compute(texts, compute_fn):
+      메모리 → 디스크 순서로 찾고, 둘 다 없는 텍스트만 모아서
+      compute_fn(miss_texts) 한 번으로 인코딩한 뒤 양쪽 계층에 저장.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int = 768,
+        capacity: int = MEMORY_CAPACITY,
+        disk_dir: Optional[Path] = CACHE_DIR if DISK_ENABLED else None,
+    ):
+        self.model_name = model_name
+        self.dim = dim
+        self.memory = LRUStore(capacity)
+        namespace = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        self.disk = DiskStore(disk_dir, namespace, dim) if disk_dir is not None else None
+
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_or_compute(
+        self,
+        texts: List[str],
+        compute_fn: Callable[[List[str]], torch.Tensor],
+    ) -> torch.Tensor:
+        keys = [cache_key(t, self.model_name) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        mem_hits = disk_hits = 0
+
+        # 1) 메모리
+        for k in keys:
+            if k in found:
+                continue
+            vec = self.memory.get(k)
+            if vec is not None:
+                found[k] = vec
+                mem_hits += 1
+
+        # 2) 디스크
+        pending = list(dict.fromkeys(k for k in keys if k not in found))
+        if pending and self.disk is not None:
+            for k, vec in self.disk.get_many(pending).items():
+                found[k] = vec
+                self.memory.put(k, vec)
+                disk_hits += 1
+
+        # 3) 둘 다 없는 것만 인코딩 (같은 배치 안 중복도 한 번만)
+        miss_first: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in miss_first:
+                miss_first[k] = t
+
+        if miss_first:
+            computed = compute_fn(list(miss_first.values()))
+            computed = computed.detach().float().cpu().numpy()
+            new_items = dict(zip(miss_first.keys(), computed))
+            for k, vec in new_items.items():
+                found[k] = vec
+                self.memory.put(k, vec)
+            if self.disk is not None:
+                self.disk.put_many(new_items)
+
+        with self._lock:
+            self.memory_hits += mem_hits
+            self.disk_hits += disk_hits
+            self.misses += len(miss_first)
+
+        if not keys:
+            return torch.empty((0, self.dim), dtype=torch.float32)
+        return torch.from_numpy(np.stack([found[k] for k in keys]))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / total) if total else 0.0,
+                "memory_size": len(self.memory),
+                "memory_capacity": self.memory.capacity,
+                "disk_size": len(self.disk) if self.disk is not None else None,
+                "disk_capacity": self.disk.max_entries if self.disk is not None else None,
+                "disk_resets": self.disk.resets if self.disk is not None else None,
+            }
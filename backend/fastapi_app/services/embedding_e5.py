@@ -1,9 +1,15 @@
 import os
+import threading
 from functools import lru_cache
-from typing import List
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
 
 import torch
-from transformers import AutoTokenizer, AutoModel
+from transformers import AutoConfig, AutoTokenizer, AutoModel
+
+from fastapi_app.services.embedding_cache import CACHE_DIR, CACHE_ENABLED, EmbeddingCache
+from fastapi_app.services.shared_weights import SHARED_ENABLED, file_fingerprint, load_shared
 
 MODEL_NAME = "intfloat/multilingual-e5-base"
 
@@ -12,29 +18,176 @@ os.environ["TOKENIZERS_PARALLELISM"] = "true"
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+MAX_LENGTH = 256
+
+# 인코딩 모드
+# - "padded"  : 배치 전체를 가장 긴 텍스트 길이에 맞춰 패딩 (기존 방식)
+# - "bucketed": 토큰 길이로 정렬 → 패딩 낭비가 작은 버킷으로 나눠서 실행 → 원래 순서 복원
+ENCODE_MODE = os.getenv("E5_ENCODE_MODE", "padded")
+# 버킷 하나에서 허용하는 패딩 토큰 비율 (0.2 = 패딩이 전체의 20% 이하)
+BUCKET_MAX_WASTE = float(os.getenv("E5_BUCKET_MAX_WASTE", "0.2"))
+# 버킷 하나의 최대 (패딩 포함) 토큰 수 = 배치 크기 x 최대 길이
+BUCKET_MAX_TOKENS = int(os.getenv("E5_BUCKET_MAX_TOKENS", str(64 * MAX_LENGTH)))
+
+# 긴 꿈 텍스트용 슬라이딩 윈도우 모드
+# - E5_LONG_TEXT=1 이면 256 토큰에서 자르지 않고 겹치는 윈도우로 나눠서 전체를 인코딩
+# - E5_WINDOW_STRIDE: 윈도우 시작 간격 (토큰). 윈도우 본문 길이보다 작으면 겹침
+# - E5_LONG_POOLING: "mean" (윈도우 단순 평균) | "weighted" (윈도우 토큰 수 가중 평균)
+# - E5_MAX_WINDOWS: 텍스트 하나당 최대 윈도우 수 (비정상적으로 긴 입력 방어)
+LONG_TEXT = os.getenv("E5_LONG_TEXT", "0") == "1"
+WINDOW_STRIDE = int(os.getenv("E5_WINDOW_STRIDE", "192"))
+LONG_POOLING = os.getenv("E5_LONG_POOLING", "weighted")
+MAX_WINDOWS = int(os.getenv("E5_MAX_WINDOWS", "32"))
+
+# 추론 백엔드 (E5_BACKEND)
+# - "auto": GPU 있으면 fp16, 없으면 fp32
+# - "fp16": FP16 + device_map="auto" (GPU용, 기존 방식)
+# - "fp32": FP32 (CPU 서빙 노드 기본값으로 적당)
+# - "int8": FP32 로딩 후 Linear 레이어만 동적 int8 양자화 (CPU 전용)
+# - "onnx": ONNX 로 export 한 그래프를 onnxruntime 으로 실행 (CPU 전용, onnxruntime 필요)
+BACKENDS = ("fp16", "fp32", "int8", "onnx")
+BACKEND = os.getenv("E5_BACKEND", "auto")
+ONNX_PATH = Path(os.getenv("E5_ONNX_PATH", str(CACHE_DIR / "onnx" / "multilingual-e5-base.onnx")))
+CPU_THREADS = int(os.getenv("E5_CPU_THREADS", "0"))  # 0 이면 torch/onnxruntime 기본값
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    name = (backend or BACKEND).lower()
+    if name == "auto":
+        return "fp16" if torch.cuda.is_available() else "fp32"
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 E5_BACKEND: {name!r} (가능: auto, {', '.join(BACKENDS)})")
+    return name
+
 
-@lru_cache(maxsize=1)
-def get_model_and_tokenizer():
+class OnnxEncoder:
     """
-    E5 임베딩 모델과 토크나이저를 한 번만 로딩해서 캐시.
-    - FP16 + device_map="auto" 로 GPU 활용
-    - Fast tokenizer 사용
+    onnxruntime 세션을 HF 모델처럼 호출할 수 있게 감싼 래퍼.
+    model(**encoded).last_hidden_state 형태를 그대로 맞춰서 mean_pooling 을 재사용.
+    """
+
+    def __init__(self, path: Path, config):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("E5_BACKEND=onnx 를 쓰려면 onnxruntime 설치가 필요합니다.") from e
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if CPU_THREADS:
+            opts.intra_op_num_threads = CPU_THREADS
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.config = config
+        self.device = torch.device("cpu")
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        feeds = {k: v.cpu().numpy() for k, v in inputs.items() if k in self.input_names}
+        (hidden,) = self.session.run(["last_hidden_state"], feeds)
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(hidden))
+
+
+def _export_onnx(model, tokenizer, path: Path):
+    """FP32 모델을 동적 batch/seq 축을 가진 ONNX 그래프로 export (최초 1회)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sample = tokenizer(["꿈 이야기"], return_tensors="pt")
+    names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+    dynamic = {k: {0: "batch", 1: "seq"} for k in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, m):
+            super().__init__()
+            self.m = m
+
+        def forward(self, *args):
+            return self.m(**dict(zip(names, args))).last_hidden_state
+
+    torch.onnx.export(
+        _Wrapper(model),
+        tuple(sample[k] for k in names),
+        str(path),
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic,
+        opset_version=17,
+        dynamo=False,  # dynamic_axes 를 쓰는 TorchScript 기반 exporter
+    )
+
+
+def _shared_fingerprint() -> str:
     """
+    공유 FP32 가중치 파일 이름에 붙일 지문: HF 스냅샷 revision + 가중치 파일 크기 / 수정 시각.
+    허브에서 모델이 업데이트돼서 새 스냅샷을 받으면 옛 export 파일을 재사용하지 않음.
+    """
+    from transformers.utils import cached_file
+
+    # from_pretrained 와 같은 우선순위 (safetensors → bin), 캐시에 없으면 여기서 받음
+    path = cached_file(MODEL_NAME, "model.safetensors", _raise_exceptions_for_missing_entries=False)
+    if path is None:
+        path = cached_file(MODEL_NAME, "pytorch_model.bin")
+    path = Path(path)
+    # HF 캐시 구조: .../snapshots/<commit hash>/<파일>
+    return f"{MODEL_NAME.replace('/', '--')}-{path.parent.name[:12]}-{file_fingerprint(path)}"
+
+
+@lru_cache(maxsize=4)
+def _load_backend(backend: str):
     tokenizer = AutoTokenizer.from_pretrained(
         MODEL_NAME,
         use_fast=True,
     )
 
-    model = AutoModel.from_pretrained(
-        MODEL_NAME,
-        dtype=torch.float16,   # FP16 (PyTorch 2.6에서는 dtype 사용)
-        device_map="auto",
-    )
+    if CPU_THREADS and backend != "fp16":
+        torch.set_num_threads(CPU_THREADS)
+
+    if backend == "fp16":
+        model = AutoModel.from_pretrained(
+            MODEL_NAME,
+            dtype=torch.float16,   # FP16 (PyTorch 2.6에서는 dtype 사용)
+            device_map="auto",
+        )
+    elif backend == "fp32" and SHARED_ENABLED and DEVICE == "cpu":
+        # 워커 간 공유: 한 번 export 한 FP32 가중치를 mmap 으로 붙여 씀 (MODEL_SHARED_DIR)
+        model = load_shared(
+            "e5-fp32",
+            build=lambda: AutoModel.from_pretrained(MODEL_NAME, dtype=torch.float32),
+            make_empty=lambda: AutoModel.from_config(AutoConfig.from_pretrained(MODEL_NAME)),
+            fingerprint=_shared_fingerprint(),
+        )
+    else:
+        model = AutoModel.from_pretrained(MODEL_NAME, dtype=torch.float32)
+        model.eval()
+
+        if backend == "fp32":
+            model = model.to(DEVICE)
+        elif backend == "int8":
+            # Linear 가중치만 int8 로, 활성값은 실행 시점에 동적 양자화
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif backend == "onnx":
+            if not ONNX_PATH.exists():
+                _export_onnx(model, tokenizer, ONNX_PATH)
+            model = OnnxEncoder(ONNX_PATH, model.config)
 
     model.eval()
+    print(f">> E5 loaded: backend={backend}")
     return tokenizer, model
 
 
+def get_model_and_tokenizer(backend: Optional[str] = None):
+    """
+    E5 임베딩 모델과 토크나이저를 백엔드별로 한 번만 로딩해서 캐시.
+    - backend=None 이면 E5_BACKEND 설정 사용 (기본 auto: GPU면 FP16, 아니면 FP32)
+    - Fast tokenizer 사용
+    """
+    return _load_backend(resolve_backend(backend))
+
+
 def mean_pooling(model_output, attention_mask):
     """
     Mean Pooling: 토큰 히든스테이트를 마스크 기준으로 평균내서 문장 벡터로 변환
@@ -46,25 +199,322 @@ def mean_pooling(model_output, attention_mask):
     return sum_embeddings / sum_mask  # (B, H)
 
 
-def encode_texts(texts: List[str]) -> torch.Tensor:
+# =========================
+# 패딩 효율 통계
+# =========================
+
+class PaddingStats:
+    """실제 토큰 수 vs 패딩 포함 토큰 수 누적 (efficiency = real / padded)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+    def record(self, attention_mask: torch.Tensor):
+        with self._lock:
+            self.batches += 1
+            self.texts += int(attention_mask.size(0))
+            self.real_tokens += int(attention_mask.sum())
+            self.padded_tokens += int(attention_mask.numel())
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "texts": self.texts,
+                "real_tokens": self.real_tokens,
+                "padded_tokens": self.padded_tokens,
+                "efficiency": (self.real_tokens / self.padded_tokens) if self.padded_tokens else 1.0,
+            }
+
+
+_padding_stats = {"padded": PaddingStats(), "bucketed": PaddingStats()}
+
+
+def padding_stats() -> Dict[str, Dict[str, float]]:
+    """모드별 누적 패딩 효율"""
+    return {mode: st.as_dict() for mode, st in _padding_stats.items()}
+
+
+# =========================
+# 인코딩
+# =========================
+
+@lru_cache(maxsize=4)
+def get_embedding_cache(variant: str = "") -> EmbeddingCache:
+    # 백엔드마다 미세하게 다른 벡터가 나오므로 캐시 네임스페이스를 분리
+    # (긴 텍스트 모드처럼 결과가 달라지는 인코딩 방식도 variant 로 분리)
+    name = f"{MODEL_NAME}@{resolve_backend()}"
+    if variant:
+        name += f"#{variant}"
+    return EmbeddingCache(name, dim=768)
+
+
+def encode_texts(
+    texts: List[str],
+    use_cache: bool = True,
+    bucketed: Optional[bool] = None,
+    long_text: Optional[bool] = None,
+) -> torch.Tensor:
     """
     입력: 문자열 리스트 (batch)
     출력: torch.Tensor (batch_size, hidden_dim=768)
+
+    캐시가 켜져 있으면 (E5_CACHE, 기본 on) 이미 인코딩한 텍스트는
+    메모리/디스크 캐시에서 가져오고, 캐시에 없는 텍스트만 모아서 인코딩.
+    bucketed=None 이면 E5_ENCODE_MODE, long_text=None 이면 E5_LONG_TEXT 설정을 따름.
+    long_text=True 면 256 토큰을 넘는 부분도 슬라이딩 윈도우로 반영 (항상 버킷 방식).
     """
-    tokenizer, model = get_model_and_tokenizer()
+    if long_text is None:
+        long_text = LONG_TEXT
+    if bucketed is None:
+        bucketed = ENCODE_MODE == "bucketed"
 
-    # 바로 GPU로 올리기
-    encoded = tokenizer(
-        texts,
-        padding=True,
-        truncation=True,
-        max_length=256,
-        return_tensors="pt",
-    ).to(DEVICE)
+    if long_text:
+        compute = _encode_long
+        variant = f"long-{WINDOW_STRIDE}-{LONG_POOLING}"
+    else:
+        compute = _encode_bucketed if bucketed else _encode_uncached
+        variant = ""
 
+    if use_cache and CACHE_ENABLED:
+        return get_embedding_cache(variant).get_or_compute(list(texts), compute)
+    return compute(texts)
+
+
+def _forward(model, encoded) -> torch.Tensor:
+    encoded = encoded.to(model.device)  # 모델이 올라가 있는 장치로 바로 올리기
     with torch.no_grad():
         outputs = model(**encoded)
         embeddings = mean_pooling(outputs, encoded["attention_mask"])
 
     # 나중에 CPU에서 concat / 학습할 수 있도록 CPU로 돌려보냄
     return embeddings.cpu()  # (B, H)
+
+
+def _encode_uncached(texts: List[str], backend: Optional[str] = None) -> torch.Tensor:
+    """캐시 없이 E5 forward 를 실제로 수행 (배치 전체를 최장 길이로 패딩)."""
+    tokenizer, model = get_model_and_tokenizer(backend)
+
+    encoded = tokenizer(
+        texts,
+        padding=True,
+        truncation=True,
+        max_length=MAX_LENGTH,
+        return_tensors="pt",
+    )
+    _padding_stats["padded"].record(encoded["attention_mask"])
+
+    return _forward(model, encoded)
+
+
+def make_length_buckets(
+    lengths: List[int],
+    max_waste: float = BUCKET_MAX_WASTE,
+    max_tokens: int = BUCKET_MAX_TOKENS,
+) -> List[List[int]]:
+    """
+    토큰 길이 오름차순으로 인덱스를 훑으면서 버킷을 만든다.
+    다음 원소를 넣었을 때
+      - 패딩 비율(1 - 실제토큰/패딩포함토큰)이 max_waste 를 넘거나
+      - 패딩 포함 토큰 수가 max_tokens 를 넘으면
+    현재 버킷을 닫고 새 버킷을 시작.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets: List[List[int]] = []
+    cur: List[int] = []
+    cur_real = 0
+
+    for i in order:
+        L = lengths[i]
+        if cur:
+            n = len(cur) + 1
+            padded = n * L  # 정렬돼 있으므로 L 이 버킷의 최장 길이
+            waste = 1.0 - (cur_real + L) / padded
+            if waste > max_waste or padded > max_tokens:
+                buckets.append(cur)
+                cur, cur_real = [], 0
+        cur.append(i)
+        cur_real += L
+
+    if cur:
+        buckets.append(cur)
+    return buckets
+
+
+def _encode_ids_bucketed(tokenizer, model, input_ids: List[List[int]]) -> torch.Tensor:
+    """
+    이미 토크나이즈된 input_ids 리스트를 길이 버킷 단위로 동적 패딩해서
+    인코딩한 뒤 원래 순서로 되돌림.
+    """
+    lengths = [len(ids) for ids in input_ids]
+
+    out: Optional[torch.Tensor] = None
+    for bucket in make_length_buckets(lengths):
+        # 버킷 안에서만 최장 길이에 맞춰 패딩
+        encoded = tokenizer.pad(
+            {"input_ids": [input_ids[i] for i in bucket]},
+            padding=True,
+            return_tensors="pt",
+        )
+        _padding_stats["bucketed"].record(encoded["attention_mask"])
+        emb = _forward(model, encoded)
+
+        # 원래 위치에 채워 넣기
+        if out is None:
+            out = emb.new_empty((len(input_ids), emb.size(1)))
+        out[torch.tensor(bucket)] = emb
+
+    return out
+
+
+def _encode_bucketed(texts: List[str], backend: Optional[str] = None) -> torch.Tensor:
+    """
+    길이 버킷 단위로 동적 패딩해서 인코딩한 뒤 원래 순서로 되돌림.
+    """
+    tokenizer, model = get_model_and_tokenizer(backend)
+    if not texts:
+        return torch.empty((0, model.config.hidden_size))
+
+    # 패딩 없이 토크나이즈 → 길이 기준 버킷
+    tokenized = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    return _encode_ids_bucketed(tokenizer, model, tokenized["input_ids"])
+
+
+def split_windows(n_tokens: int, body: int, stride: int, max_windows: int = MAX_WINDOWS) -> List[tuple]:
+    """
+    길이 n_tokens 인 토큰열을 본문 길이 body, 간격 stride 인 윈도우 (start, end) 들로 나눔.
+    마지막 윈도우는 항상 끝까지 포함하도록 맞춘다.
+    """
+    if n_tokens <= body:
+        return [(0, n_tokens)]
+    stride = max(1, min(stride, body))
+    starts = list(range(0, n_tokens - body, stride))
+    starts.append(n_tokens - body)  # 꼬리 부분
+    if len(starts) > max_windows:
+        # 균등 간격으로 줄여서 전체 범위를 대표하게 함
+        step = (len(starts) - 1) / (max_windows - 1) if max_windows > 1 else 0
+        starts = [starts[round(k * step)] for k in range(max_windows)]
+    return [(s, s + body) for s in starts]
+
+
+def _encode_long(
+    texts: List[str],
+    backend: Optional[str] = None,
+    pooling: str = LONG_POOLING,
+) -> torch.Tensor:
+    """
+    긴 텍스트를 겹치는 토큰 윈도우로 나누고,
+    모든 입력의 모든 윈도우를 한 번의 버킷 배치 작업으로 인코딩한 뒤
+    텍스트별로 다시 모아서 pooling (mean | weighted).
+    윈도우 길이가 고정이라 비용은 텍스트 길이에 선형.
+    """
+    tokenizer, model = get_model_and_tokenizer(backend)
+    if not texts:
+        return torch.empty((0, model.config.hidden_size))
+
+    # 빈 문자열을 토크나이즈하면 특수 토큰만 남음 → [<s>] + 본문 + [</s>] 형태로 조립
+    specials = tokenizer("")["input_ids"]
+    prefix, suffix = specials[:1], specials[1:]
+    body = MAX_LENGTH - len(specials)  # 특수 토큰을 뺀 윈도우 본문 길이
+    raw_ids = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+
+    windows: List[List[int]] = []
+    owners: List[int] = []
+    weights: List[float] = []
+    for t, ids in enumerate(raw_ids):
+        for start, end in split_windows(len(ids), body, WINDOW_STRIDE):
+            chunk = ids[start:end]
+            windows.append(prefix + chunk + suffix)
+            owners.append(t)
+            weights.append(float(max(1, len(chunk))) if pooling == "weighted" else 1.0)
+
+    win_emb = _encode_ids_bucketed(tokenizer, model, windows).float()  # (W, H)
+
+    # 텍스트별 가중 합 / 가중치 합
+    owner_idx = torch.tensor(owners)
+    w = torch.tensor(weights).unsqueeze(1)
+    summed = torch.zeros((len(texts), win_emb.size(1))).index_add_(0, owner_idx, win_emb * w)
+    total = torch.zeros((len(texts), 1)).index_add_(0, owner_idx, w)
+    return summed / total
+
+
+# =========================
+# 백엔드 동등성 검사
+# =========================
+
+SAMPLE_TEXTS = [
+    "누군가에게 쫓기다가 낭떠러지에서 떨어지는 꿈을 꿨다.",
+    "오랜 친구와 바닷가를 걸으며 웃고 이야기했다.",
+    "시험장에 늦어서 문이 잠겨 있었고 너무 불안했다.",
+    "하늘을 날아다니며 도시를 내려다보았다.",
+    "I was lost in a dark forest and could not find my way home.",
+]
+
+
+@torch.no_grad()
+def check_backend_equivalence(
+    backend: str,
+    reference: str = "fp32",
+    texts: Optional[List[str]] = None,
+    min_cosine: float = 0.99,
+) -> Dict[str, Any]:
+    """
+    backend 로 만든 임베딩이 reference(기본 fp32)와 얼마나 같은지 확인.
+    - 임베딩 코사인 유사도 (min / mean)
+    - 분류기 헤드 출력 차이 (확률 최대 차이 / 라벨 일치율) — 헤드 파일이 있을 때만
+    passed 가 False 면 백엔드를 바꾸면 분류 결과가 달라질 수 있다는 뜻.
+    """
+    texts = texts or SAMPLE_TEXTS
+    emb = _encode_uncached(texts, backend=backend).float()
+    ref = _encode_uncached(texts, backend=reference).float()
+    cos = torch.nn.functional.cosine_similarity(emb, ref, dim=1)
+
+    report: Dict[str, Any] = {
+        "backend": resolve_backend(backend),
+        "reference": resolve_backend(reference),
+        "n_texts": len(texts),
+        "min_cosine": float(cos.min()),
+        "mean_cosine": float(cos.mean()),
+        "threshold": min_cosine,
+        "heads": None,
+    }
+
+    try:
+        # 순환 import 방지를 위해 함수 안에서 import
+        from fastapi_app.services.dream_analyzer import _load_e5_classifiers
+        heads = _load_e5_classifiers()
+    except FileNotFoundError:
+        heads = None
+
+    if heads is not None:
+        p, l = heads.predict(emb)
+        p_ref, l_ref = heads.predict(ref)
+        report["heads"] = {
+            "max_prob_diff": float((p - p_ref).abs().max()),
+            "label_agreement": float((l == l_ref).float().mean()),
+        }
+
+    report["passed"] = report["min_cosine"] >= min_cosine and (
+        report["heads"] is None or report["heads"]["label_agreement"] == 1.0
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # 예: python -m fastapi_app.services.embedding_e5 int8
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="E5 백엔드 동등성 검사")
+    parser.add_argument("backend", choices=BACKENDS)
+    parser.add_argument("--reference", default="fp32", choices=BACKENDS)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    result = check_backend_equivalence(args.backend, args.reference, min_cosine=args.min_cosine)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    raise SystemExit(0 if result["passed"] else 1)
@@ -0,0 +1,134 @@
+# fastapi_app/services/inference_executor.py
+"""
+모델 추론 전용 bounded executor
+
+FastAPI 기본 스레드풀은 DB 위주 요청(/calendar 등)과 공유되기 때문에
+torch forward 가 몰리면 가벼운 요청까지 같이 밀린다.
+여기서는 추론만 별도 스레드풀에서 돌리고,
+  - 동시에 실행되는 추론 수 (max_workers)
+  - 그 뒤에서 기다릴 수 있는 요청 수 (max_queue)
+를 넘으면 바로 ExecutorSaturated 를 던져서 503 + Retry-After 로 빠르게 거절한다.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+from fastapi_app.services.dream_analyzer import MAX_BATCH_SIZE
+
+
+# =========================
+# 설정
+# =========================
+
+# 기본값은 마이크로 배처의 최대 배치 크기와 같게 둬서 배치 하나가 꽉 찰 수 있게 함
+INFER_MAX_CONCURRENCY = int(os.getenv("INFER_MAX_CONCURRENCY", str(MAX_BATCH_SIZE)))
+INFER_MAX_QUEUE = int(os.getenv("INFER_MAX_QUEUE", "64"))
+INFER_RETRY_AFTER_SEC = int(os.getenv("INFER_RETRY_AFTER_SEC", "1"))
+
+
+class ExecutorSaturated(Exception):
+    """실행 슬롯 + 대기열이 모두 찼을 때"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is saturated, retry after {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after = retry_after
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        # 실행 중 + 대기 중 요청 수의 상한
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0   # 슬롯을 잡은 요청 수 (실행 + 대기)
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._run_ms_total = 0.0
+
+    def _release(self, _fut=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs):
+        """슬롯이 없으면 ExecutorSaturated, 있으면 concurrent Future 반환."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturated(self.name, self.retry_after)
+
+        with self._lock:
+            self._in_flight += 1
+        enqueued = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_ms_total += (started - enqueued) * 1000.0
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_ms_total += (time.perf_counter() - started) * 1000.0
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        try:
+            fut = self._pool.submit(job)
+        except BaseException:
+            self._release()
+            raise
+        # 호출자가 취소돼도 작업이 끝날 때 슬롯을 반환
+        fut.add_done_callback(self._release)
+        return fut
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """async 라우트에서 await 로 사용."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": max(0, self._in_flight - self._running),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": (self._wait_ms_total / finished) if finished else 0.0,
+                "avg_run_ms": (self._run_ms_total / finished) if finished else 0.0,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_inference_executor() -> BoundedExecutor:
+    return BoundedExecutor(
+        "inference",
+        max_workers=INFER_MAX_CONCURRENCY,
+        max_queue=INFER_MAX_QUEUE,
+        retry_after=INFER_RETRY_AFTER_SEC,
+    )
@@ -0,0 +1,260 @@
+# fastapi_app/services/rescoring.py
+"""
+모델 버전이 바뀐 뒤 옛 분석을 다시 채점하는 백그라운드 워커
+
+분류기(valence_e5_classifier.pt / facets_e5_classifier.pt)를 재학습하면
+dream_analyzer.model_version() 이 바뀐다. 최신 분석의 model_version 이 현재 값과 다르거나
+(NULL 포함) 분석이 아예 없는 꿈을 dreams.id 순서로 RESCORE_BATCH 개씩 찾아서
+  1) RESCORE_CHUNK 개씩 analyze_dreams_with_e5 (임베딩은 E5 캐시에 있으면 재사용)
+  2) 새 DreamAnalysis 추가 + latest_analysis_id 교체
+  3) 캘린더 롤업은 옛 분석과의 차이만큼 보정, 유저 데이터 버전 +1
+을 배치마다 한 트랜잭션으로 저장한다.
+추론하는 동안 /dreams/analyze 가 같은 꿈의 최신 분석을 바꿨으면 (포인터가 달라짐)
+그 꿈은 건너뛴다 → 저장 트랜잭션 안에서 행을 잠그고 다시 읽어서 확인.
+
+- 스로틀: 청크마다 inference executor / 마이크로 배처에 대화형 요청이 있으면
+  RESCORE_BUSY_WAIT_SEC 만큼 양보하고, 청크 사이에도 RESCORE_PAUSE_MS 쉰다.
+  추론 자체도 inference executor 슬롯 하나를 잡고 돌려서 동시 추론 수 상한 / 통계에 포함되고,
+  executor 가 꽉 차 있으면 (ExecutorSaturated) 기다렸다가 다시 넣는다.
+- 재시작 가능: 진행 상태를 따로 저장하지 않아도 "아직 옛 버전인 꿈" 만 고르므로
+  중단된 뒤 다시 돌리면 남은 것부터 이어서 처리된다.
+
+실행:
+    RESCORE_ON_STARTUP=1 이면 서버 시작 시 백그라운드 스레드로
+    python -m fastapi_app.services.rescoring [--no-throttle]
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from fastapi_app.db.database import SessionLocal
+from fastapi_app.models.dream import Dream, DreamAnalysis
+from fastapi_app.services.daily_rollup import add_to_rollup, adjust_rollup
+from fastapi_app.services.dream_analyzer import DreamAnalyzer, analyze_dreams_with_e5, model_version
+from fastapi_app.services.inference_executor import ExecutorSaturated, get_inference_executor
+from fastapi_app.services.user_version import bump_versions
+
+
+RESCORE_ON_STARTUP = os.getenv("RESCORE_ON_STARTUP", "0") == "1"
+RESCORE_BATCH = int(os.getenv("RESCORE_BATCH", "256"))          # 트랜잭션 하나에 넣을 꿈 수
+RESCORE_CHUNK = int(os.getenv("RESCORE_CHUNK", "32"))           # 추론 한 번 크기 (작을수록 자주 양보)
+RESCORE_PAUSE_MS = float(os.getenv("RESCORE_PAUSE_MS", "50"))   # 청크 사이 쉬는 시간
+RESCORE_BUSY_WAIT_SEC = float(os.getenv("RESCORE_BUSY_WAIT_SEC", "0.5"))
+
+
+def outdated_stmt(version: str, after_id: int, limit: int):
+    """최신 분석이 현재 모델 버전이 아닌(또는 분석이 없는) 꿈들, dreams.id keyset 순서"""
+    A = DreamAnalysis
+    return (
+        select(Dream.id, Dream.latest_analysis_id, Dream.text)
+        .outerjoin(A, A.id == Dream.latest_analysis_id)
+        .where(
+            Dream.id > after_id,
+            or_(A.id.is_(None), A.model_version.is_(None), A.model_version != version),
+        )
+        .order_by(Dream.id)
+        .limit(limit)
+    )
+
+
+def _current_rows(db: Session, ids: List[int]) -> Dict[int, Any]:
+    """저장 트랜잭션 안에서 꿈 행을 잠그고 지금의 최신 분석 (pos/neg) 을 다시 읽음"""
+    A = DreamAnalysis
+    stmt = (
+        select(Dream.id, Dream.latest_analysis_id, Dream.user_id, Dream.date, A.pos_prob, A.neg_prob)
+        .outerjoin(A, A.id == Dream.latest_analysis_id)
+        .where(Dream.id.in_(ids))
+        .with_for_update(of=Dream)
+    )
+    return {r.id: r for r in db.execute(stmt)}
+
+
+def save_rescored(db: Session, rows: List[Any], results: List[dict]) -> int:
+    """
+    재채점 결과 저장 (한 트랜잭션). rows 는 outdated_stmt 의 행들. 저장한 꿈 수 반환.
+
+    새 분석 INSERT 로 먼저 쓰기를 시작한 뒤 꿈 행을 잠그고 다시 읽는다
+    (PostgreSQL: FOR UPDATE, SQLite: FOR UPDATE 는 무시되지만 첫 쓰기에서 DB 쓰기 락을 잡은 상태).
+    그 사이 최신 분석 포인터가 바뀌었거나 꿈이 지워졌으면 그 꿈은 건너뛰고 새 분석도 지운다.
+    롤업 차이는 다시 읽은 (잠근) 최신 분석 기준.
+    """
+    analyses = [DreamAnalysis.from_result(dream_id=r.id, result=res) for r, res in zip(rows, results)]
+    try:
+        db.add_all(analyses)
+        db.flush()  # analysis.id 확보
+        current = _current_rows(db, [r.id for r in rows])
+
+        keep, stale = [], []
+        for r, a in zip(rows, analyses):
+            cur = current.get(r.id)
+            if cur is not None and cur.latest_analysis_id == r.latest_analysis_id:
+                keep.append((cur, a))
+            else:
+                stale.append(a.id)
+        if stale:
+            db.execute(delete(DreamAnalysis).where(DreamAnalysis.id.in_(stale)))
+        if keep:
+            db.execute(update(Dream), [{"id": c.id, "latest_analysis_id": a.id} for c, a in keep])
+
+        # 롤업: 옛 최신 분석이 있던 꿈은 차이만, 분석이 없던 꿈은 새로 누적
+        adjust_rollup(db, [
+            (c.user_id, c.date, a.pos_prob - c.pos_prob, a.neg_prob - c.neg_prob)
+            for c, a in keep if c.pos_prob is not None
+        ])
+        add_to_rollup(db, [
+            (c.user_id, c.date, a.pos_prob, a.neg_prob)
+            for c, a in keep if c.pos_prob is None
+        ])
+        bump_versions(db, [c.user_id for c, _ in keep])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(keep)
+
+
+def _interactive_busy() -> bool:
+    """대화형 추론(요청 처리 중 / 대기 중)이 있으면 True"""
+    ex = get_inference_executor().stats()
+    if ex["running"] or ex["queued"]:
+        return True
+    inst = DreamAnalyzer._instance
+    return bool(inst is not None and inst.batcher is not None and inst.batcher.stats()["queue_depth"])
+
+
+class Rescorer:
+    def __init__(
+        self,
+        batch_size: int = RESCORE_BATCH,
+        chunk_size: int = RESCORE_CHUNK,
+        pause_ms: float = RESCORE_PAUSE_MS,
+        busy_wait_sec: float = RESCORE_BUSY_WAIT_SEC,
+        throttle: bool = True,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.chunk_size = max(1, int(chunk_size))
+        self.pause_ms = max(0.0, float(pause_ms))
+        self.busy_wait_sec = max(0.0, float(busy_wait_sec))
+        self.throttle = throttle
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._status: Dict[str, Any] = {
+            "state": "idle",
+            "model_version": None,
+            "rescored": 0,
+            "skipped": 0,   # 추론 중에 최신 분석이 바뀐 꿈
+            "failed_batches": 0,
+            "yields": 0,
+            "last_dream_id": 0,
+            "error": None,
+        }
+
+    def _set(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _add(self, key: str, n: int = 1):
+        with self._lock:
+            self._status[key] += n
+
+    def stop(self):
+        self._stop.set()
+
+    def _yield_to_interactive(self):
+        if not self.throttle:
+            return
+        while _interactive_busy() and not self._stop.is_set():
+            self._add("yields")
+            time.sleep(self.busy_wait_sec)
+        if self.pause_ms:
+            time.sleep(self.pause_ms / 1000.0)
+
+    def _infer(self, texts: List[str]) -> List[dict]:
+        # 대화형 요청과 같은 inference executor 에서 실행 (꽉 차 있으면 잠깐 기다렸다 다시)
+        executor = get_inference_executor()
+        while True:
+            try:
+                return executor.submit(analyze_dreams_with_e5, texts).result()
+            except ExecutorSaturated:
+                self._add("yields")
+                time.sleep(max(self.busy_wait_sec, 0.05))
+
+    def _score(self, texts: List[str]) -> List[dict]:
+        results: List[dict] = []
+        for i in range(0, len(texts), self.chunk_size):
+            self._yield_to_interactive()
+            results.extend(self._infer(texts[i : i + self.chunk_size]))
+        return results
+
+    def run(self) -> Dict[str, Any]:
+        """옛 버전 분석이 남지 않을 때까지 (또는 stop() 까지) 처리. 끝나면 상태 dict 반환."""
+        version = model_version()
+        self._set(state="running", model_version=version, error=None)
+        after_id = 0
+        try:
+            while not self._stop.is_set():
+                with SessionLocal() as db:
+                    rows = db.execute(outdated_stmt(version, after_id, self.batch_size)).all()
+                    if not rows:
+                        break
+                    after_id = rows[-1].id
+                    try:
+                        results = self._score([r.text for r in rows])
+                        n = save_rescored(db, rows, results)
+                    except Exception as e:
+                        # 이 배치만 건너뛰고 계속 (다음 실행 때 다시 대상이 됨)
+                        self._add("failed_batches")
+                        self._set(error=f"{type(e).__name__}: {e}")
+                        print(f">> rescoring batch up to dream {after_id} failed: {e}")
+                        continue
+                self._add("rescored", n)
+                self._add("skipped", len(rows) - n)
+                self._set(last_dream_id=after_id)
+        except Exception as e:
+            self._set(state="failed", error=f"{type(e).__name__}: {e}")
+            raise
+        self._set(state="stopped" if self._stop.is_set() else "done")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+
+_rescorer: Optional[Rescorer] = None
+_thread: Optional[threading.Thread] = None
+
+
+def start_rescoring() -> threading.Thread:
+    """백그라운드 스레드에서 재채점 시작 (이미 돌고 있으면 그 스레드 반환)."""
+    global _rescorer, _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _rescorer = Rescorer()
+    _thread = threading.Thread(target=_rescorer.run, name="rescoring", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def rescoring_stats() -> Optional[Dict[str, Any]]:
+    return _rescorer.stats() if _rescorer is not None else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    from fastapi_app.db.database import Base, engine
+    from fastapi_app.db.migrations import run_migrations
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    status = Rescorer(throttle="--no-throttle" not in sys.argv).run()
+    print(f"✅ rescoring {status['state']}: {status['rescored']} dreams → {status['model_version']} "
+          f"(failed batches: {status['failed_batches']})")
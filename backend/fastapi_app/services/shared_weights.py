@@ -0,0 +1,126 @@
+# fastapi_app/services/shared_weights.py
+"""
+uvicorn 워커 간 모델 가중치 공유 (memory-mapped)
+
+워커마다 E5 / 분류기 헤드를 따로 로딩하면 워커 수만큼 메모리를 먹는다.
+MODEL_SHARED_DIR 를 지정하면:
+  1) 처음 로딩하는 워커가 가중치를 torch.save 파일로 한 번 export (flock 으로 한 워커만)
+  2) 모든 워커는 그 파일을 torch.load(mmap=True) 로 read-only 매핑
+  3) 빈(meta) 모델에 매핑된 텐서를 복사 없이 그대로 꽂아 넣음
+→ 가중치 페이지는 OS 페이지 캐시 하나를 모든 워커가 공유하고,
+  워커 기동 시간도 파일 매핑 수준으로 줄어든다.
+
+uvicorn --workers 는 fork 가 아니라 spawn 이라 "부모에서 미리 로딩 후 fork" 로는
+공유가 안 되기 때문에 파일 mmap 방식을 사용.
+(Whisper 는 CTranslate2 가 CT2_USE_MMAP=1 로 이미 mmap 로딩)
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+SHARED_DIR: Optional[Path] = Path(os.environ["MODEL_SHARED_DIR"]) if os.getenv("MODEL_SHARED_DIR") else None
+SHARED_ENABLED = SHARED_DIR is not None
+
+
+def _set_tensor(model: nn.Module, name: str, tensor: torch.Tensor):
+    """'encoder.layer.0.attention.self.query.weight' 같은 이름으로 텐서를 교체 (복사 없음)."""
+    *path, attr = name.split(".")
+    mod = model
+    for p in path:
+        mod = getattr(mod, p)
+    if attr in mod._parameters:
+        mod._parameters[attr] = nn.Parameter(tensor, requires_grad=False)
+    else:
+        mod._buffers[attr] = tensor
+
+
+def _export(path: Path, build: Callable[[], nn.Module]):
+    """build() 로 만든 모델의 파라미터 + 버퍼(non-persistent 포함)를 파일로 저장."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_suffix(path.suffix + ".lock")
+    with open(lock_path, "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            if path.exists():  # 다른 워커가 먼저 만들었음
+                return
+            model = build()
+            tensors: Dict[str, torch.Tensor] = {}
+            for name, p in model.named_parameters():
+                tensors[name] = p.detach().cpu().contiguous()
+            for name, b in model.named_buffers():
+                tensors[name] = b.detach().cpu().contiguous()
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            torch.save(tensors, tmp)
+            os.replace(tmp, path)  # 원자적으로 교체 → 반쯤 써진 파일을 읽는 일 없음
+            print(f">> shared weights exported: {path}")
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def load_shared(
+    name: str,
+    build: Callable[[], nn.Module],
+    make_empty: Callable[[], nn.Module],
+    fingerprint: str = "",
+) -> nn.Module:
+    """
+    name/fingerprint 에 해당하는 공유 가중치 파일을 mmap 으로 붙여서 모델을 만든다.
+    - build      : 파일이 없을 때 한 번만 호출되는 실제 로딩 함수
+    - make_empty : 가중치 없이 구조만 만드는 함수 (meta 디바이스에서 호출됨)
+    - fingerprint: 원본 가중치가 바뀌면 달라지는 값 (다르면 새 파일로 export)
+    """
+    if SHARED_DIR is None:
+        raise RuntimeError("MODEL_SHARED_DIR 가 설정되지 않았습니다.")
+
+    fname = f"{name}-{fingerprint}.pt" if fingerprint else f"{name}.pt"
+    path = SHARED_DIR / fname
+    if not path.exists():
+        _export(path, build)
+
+    tensors = torch.load(path, mmap=True, map_location="cpu", weights_only=True)
+    with torch.device("meta"):
+        model = make_empty()
+    for tname, tensor in tensors.items():
+        _set_tensor(model, tname, tensor)
+
+    leftover = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if leftover:
+        raise RuntimeError(f"공유 가중치 파일에 없는 텐서: {leftover[:5]}")
+
+    model.eval()
+    return model
+
+
+def file_fingerprint(*paths: Path) -> str:
+    """원본 파일 크기 + 수정 시각으로 만든 짧은 지문."""
+    parts = []
+    for p in paths:
+        st = os.stat(p)
+        parts.append(f"{st.st_size:x}{int(st.st_mtime):x}")
+    return "-".join(parts)
+
+
+def memory_stats() -> Dict[str, Optional[float]]:
+    """현재 워커의 RSS / 공유 페이지 크기 (MB, 리눅스 /proc 기준)."""
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared, *_ = (int(x) for x in f.read().split())
+    except OSError:
+        return {"rss_mb": None, "shared_mb": None}
+    page = os.sysconf("SC_PAGE_SIZE")
+    return {
+        "rss_mb": round(resident * page / 2**20, 1),
+        "shared_mb": round(shared * page / 2**20, 1),
+    }
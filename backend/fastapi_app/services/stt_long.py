@@ -0,0 +1,196 @@
+# fastapi_app/services/stt_long.py
+"""
+긴 음성(수 분짜리 아침 음성 메모)용 병렬 전사
+
+WhisperModel 하나로 처음부터 끝까지 순차 디코딩하면 코어가 많아도 워커 하나만 일한다.
+여기서는
+  1) Silero VAD(faster-whisper 내장)로 발화 구간을 찾고
+  2) 무음에서만 끊어서 STT_LONG_SEGMENT_SEC 이하 조각으로 묶은 뒤
+  3) 조각들을 stt_pool 워커들에 동시에 던지고 (요청 하나당 최대 STT_WORKERS 개)
+  4) 순서대로 이어 붙인다.
+마감은 조각마다가 아니라 요청 전체에 하나 (STT_TIMEOUT_SEC, single 모드와 같은 예산).
+조각 하나라도 실패하면(포화 / 마감 초과 등) 아직 안 끝난 조각은 취소한다
+(대기열에 있던 작업은 실행되지 않고, 실행 중인 작업은 같은 마감에서 멈춤).
+무음이 없어서 강제로 자른 경계는 STT_LONG_OVERLAP_SEC 만큼 겹쳐서 디코딩하고,
+이어 붙일 때 앞 조각 끝과 뒤 조각 앞에 똑같이 나온 단어들을 한 번만 남긴다.
+
+순차 디코딩과 결과 비교:
+    python -m fastapi_app.services.stt_long clip1.m4a [clip2.m4a ...]
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fastapi_app.services.stt_pool import (
+    STT_SAMPLE_RATE,
+    STT_TIMEOUT_SEC,
+    STT_WORKERS,
+    SttTimeout,
+    get_stt_executor,
+    transcribe as transcribe_in_pool,
+)
+
+
+# =========================
+# 설정
+# =========================
+
+STT_LONG_MIN_SEC = float(os.getenv("STT_LONG_MIN_SEC", "60"))          # auto 모드에서 이보다 길면 병렬
+STT_LONG_SEGMENT_SEC = float(os.getenv("STT_LONG_SEGMENT_SEC", "30"))  # 조각 최대 길이 (Whisper 창 하나)
+STT_LONG_MIN_SILENCE_MS = int(os.getenv("STT_LONG_MIN_SILENCE_MS", "500"))
+STT_LONG_PAD_MS = int(os.getenv("STT_LONG_PAD_MS", "200"))             # 발화 구간 앞뒤 여유
+STT_LONG_OVERLAP_SEC = float(os.getenv("STT_LONG_OVERLAP_SEC", "1.0")) # 강제로 자른 경계의 겹침
+DEDUPE_MAX_WORDS = 8
+
+
+def use_long_mode(mode: str, duration_sec: float) -> bool:
+    """mode: "long" 이면 항상, "single" 이면 안 함, "auto" 면 길이 + 워커 수로 판단"""
+    if mode == "long":
+        return True
+    if mode == "single":
+        return False
+    return duration_sec >= STT_LONG_MIN_SEC and STT_WORKERS > 1
+
+
+def split_segments(audio: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    발화 구간을 STT_LONG_SEGMENT_SEC 이하 조각 (start, end) 샘플 범위로 묶는다.
+    경계는 무음 위주, 무음 없이 긴 발화는 VAD 가 잘라 준 곳에서 겹침을 두고 자름.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    sr = STT_SAMPLE_RATE
+    chunks = get_speech_timestamps(audio, VadOptions(
+        min_silence_duration_ms=STT_LONG_MIN_SILENCE_MS,
+        max_speech_duration_s=STT_LONG_SEGMENT_SEC,
+        speech_pad_ms=STT_LONG_PAD_MS,
+    ))
+    if not chunks:
+        return []
+
+    max_len = int(STT_LONG_SEGMENT_SEC * sr)
+    overlap = int(STT_LONG_OVERLAP_SEC * sr)
+    segments: List[Tuple[int, int]] = []
+    start, end = chunks[0]["start"], chunks[0]["end"]
+    for c in chunks[1:]:
+        if c["end"] - start <= max_len:
+            end = c["end"]
+            continue
+        segments.append((start, end))
+        start, end = c["start"], c["end"]
+        # 무음 없이 이어지는 경계(VAD 강제 분할)면 앞쪽을 겹쳐서 단어가 잘리지 않게
+        if start - segments[-1][1] < sr // 10:
+            start = max(segments[-1][0], start - overlap)
+    segments.append((start, end))
+    return segments
+
+
+def _words(text: str) -> List[str]:
+    return text.split()
+
+
+def _norm(word: str) -> str:
+    return re.sub(r"[^\w]", "", word).lower()
+
+
+def join_texts(texts: List[str], overlapped: Optional[List[bool]] = None) -> str:
+    """
+    조각 텍스트를 순서대로 잇는다. overlapped[i] 가 True 인 경계(앞 조각과 겹쳐서 디코딩)에서는
+    앞 끝 == 뒤 앞 으로 겹친 단어를 한 번만 남김 (무음 경계는 실제 반복일 수 있어서 그대로).
+    """
+    out: List[str] = []
+    for i, text in enumerate(texts):
+        words = _words(text)
+        if not words:
+            continue
+        k = min(DEDUPE_MAX_WORDS, len(out), len(words)) if overlapped is None or overlapped[i] else 0
+        while k > 0:
+            if [_norm(w) for w in out[-k:]] == [_norm(w) for w in words[:k]]:
+                break
+            k -= 1
+        out.extend(words[k:])
+    return " ".join(out)
+
+
+async def transcribe_long(
+    audio: np.ndarray,
+    timings: Optional[Dict[str, float]] = None,
+    timeout: float = STT_TIMEOUT_SEC,
+    **options,
+) -> Tuple[str, int]:
+    """
+    16kHz float32 배열을 조각내서 병렬 전사 → (text, 조각 수).
+    timeout 은 분할 + 모든 조각을 합친 요청 전체 마감 (넘기면 SttTimeout).
+    timings 에 vad_ms(분할) / queue_ms(조각 최대 대기) / beam_ms(병렬 구간 wall time) 기록.
+    """
+    timings = timings if timings is not None else {}
+    deadline = time.monotonic() + timeout
+
+    t0 = time.perf_counter()
+    segments = await get_stt_executor().run(split_segments, audio)
+    t1 = time.perf_counter()
+    timings["vad_ms"] = (t1 - t0) * 1000.0
+    if not segments:
+        timings["beam_ms"] = 0.0
+        return "", 0
+
+    # 요청 하나가 대기열을 다 차지하지 않도록 동시에 STT_WORKERS 개까지만
+    limit = asyncio.Semaphore(max(1, STT_WORKERS))
+    seg_timings: List[Dict[str, float]] = [{} for _ in segments]
+
+    async def one(i: int, start: int, end: int) -> str:
+        async with limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SttTimeout(f"transcription exceeded {timeout:.0f}s")
+            text, _ = await transcribe_in_pool(
+                audio[start:end], timeout=remaining, timings=seg_timings[i], **options
+            )
+            return text
+
+    tasks = [asyncio.ensure_future(one(i, s, e)) for i, (s, e) in enumerate(segments)]
+    try:
+        texts = await asyncio.gather(*tasks)
+    except BaseException as e:
+        # 첫 실패에서 나머지 조각 취소 (대기열 슬롯도 바로 반환됨)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if isinstance(e, SttTimeout):
+            # 조각 작업의 메시지는 조각 기준이라 요청 전체 마감으로 바꿔서
+            raise SttTimeout(f"transcription exceeded {timeout:.0f}s") from e
+        raise
+    timings["beam_ms"] = (time.perf_counter() - t1) * 1000.0
+    timings["queue_ms"] = timings.get("queue_ms", 0.0) + max(t.get("queue_ms", 0.0) for t in seg_timings)
+    overlapped = [False] + [segments[i][0] < segments[i - 1][1] for i in range(1, len(segments))]
+    return join_texts(list(texts), overlapped), len(segments)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from fastapi_app.services.stt_pool import decode
+
+    # /stt 와 같은 옵션으로 순차(single) vs 병렬(long) 비교
+    OPTIONS = dict(language="ko", vad_filter=True, beam_size=3, temperature=0.0)
+
+    async def compare(path: str):
+        audio = await decode(path)
+        t0 = time.perf_counter()
+        seq, _ = await transcribe_in_pool(audio, **OPTIONS)
+        t1 = time.perf_counter()
+        par, n = await transcribe_long(audio, **OPTIONS)
+        t2 = time.perf_counter()
+        same = _words(seq) == _words(par)
+        print(f"{path}: {audio.size / STT_SAMPLE_RATE:.1f}s, {n} segments, workers={STT_WORKERS}")
+        print(f"  sequential {t1 - t0:.2f}s / parallel {t2 - t1:.2f}s / {'same' if same else 'DIFF'}")
+        if not same:
+            print(f"  seq: {seq}\n  par: {par}")
+
+    for p in sys.argv[1:]:
+        asyncio.run(compare(p))
@@ -0,0 +1,263 @@
+# fastapi_app/services/stt_pool.py
+"""
+Whisper STT 전용 워커 풀
+
+WhisperModel.transcribe 는 블로킹이고 세그먼트 제너레이터를 소비하는 동안 계속 CPU 를 쓴다.
+async 라우트에서 바로 부르면 60초짜리 음성 하나가 이벤트 루프 전체를 멈추게 하므로
+  - 모델은 WhisperModel(num_workers=STT_WORKERS) 하나만 로딩
+    (CTranslate2 가 가중치를 공유하는 replica 를 워커 수만큼 만들어서 스레드별로 병렬 실행)
+  - inference_executor.BoundedExecutor 로 STT_WORKERS 개 스레드 + STT_MAX_QUEUE 대기열
+    → 꽉 차면 ExecutorSaturated (main.py 에서 503 + Retry-After)
+  - 작업마다 STT_TIMEOUT_SEC 마감: 세그먼트 사이마다 확인해서 넘으면 SttTimeout 으로 중단
+    (대기열에서 마감을 넘긴 작업은 시작도 안 함, decode() 만 따로 부를 때도 같은 마감)
+로 처리한다. 대기 시간 / 전사 시간은 executor stats 로 /metrics 에 노출.
+
+오디오 디코딩(decode_audio → 16kHz mono float32)도 워커에서 직접 해서
+단계별 시간(queue / decode / vad / beam)을 재고, 입력은 경로뿐 아니라
+업로드 파일 객체(메모리 / spool)를 그대로 받아서 임시 파일을 다시 쓰고 읽지 않는다.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from fastapi_app.services.inference_executor import BoundedExecutor
+
+# ---- 환경 변수 (윈도우/저사양 안정화) ----
+os.environ.setdefault("HF_HUB_DISABLE_SYMLINKS", "1")
+HF_HOME_DIR = Path(__file__).resolve().parents[2] / ".hf_cache"  # backend/.hf_cache
+os.environ.setdefault("HF_HOME", str(HF_HOME_DIR))
+os.environ.setdefault("CT2_USE_MMAP", "1")
+os.environ.setdefault("CT2_THREADS", "2")
+
+# 워커 수 기본값: 코어 수 / 워커당 CT2 스레드 수 (최소 1)
+CT2_THREADS = int(os.getenv("CT2_THREADS", "2"))
+STT_WORKERS = int(os.getenv("STT_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, CT2_THREADS)))))
+STT_MAX_QUEUE = int(os.getenv("STT_MAX_QUEUE", "8"))
+STT_TIMEOUT_SEC = float(os.getenv("STT_TIMEOUT_SEC", "120"))
+STT_RETRY_AFTER_SEC = int(os.getenv("STT_RETRY_AFTER_SEC", "2"))
+
+STT_SAMPLE_RATE = 16000
+STAGES = ("queue_ms", "decode_ms", "vad_ms", "beam_ms")
+
+
+class SttTimeout(Exception):
+    """작업 마감(STT_TIMEOUT_SEC)을 넘겼을 때"""
+
+
+# 지연 로딩
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from faster_whisper import WhisperModel
+                device = os.getenv("STT_DEVICE", "cpu")          # "cpu" | "cuda"
+                ctype  = os.getenv("STT_COMPUTE", "int8")        # cpu:int8, cuda:float16
+                size   = os.getenv("STT_MODEL_SIZE", "tiny")     # tiny/base/small …
+                _model = WhisperModel(
+                    size,
+                    device=device,
+                    compute_type=ctype,
+                    cpu_threads=CT2_THREADS,
+                    num_workers=STT_WORKERS,  # 스레드별 병렬 transcribe
+                )
+                print(f">> STT loaded: size={size}, device={device}, compute={ctype}, workers={STT_WORKERS}")
+    return _model
+
+
+@lru_cache(maxsize=1)
+def get_stt_executor() -> BoundedExecutor:
+    return BoundedExecutor(
+        "stt",
+        max_workers=STT_WORKERS,
+        max_queue=STT_MAX_QUEUE,
+        retry_after=STT_RETRY_AFTER_SEC,
+    )
+
+
+_lock = threading.Lock()
+_timeouts = 0
+_stage_ms_total = {k: 0.0 for k in STAGES}
+_stage_jobs = 0
+
+def _count_timeout():
+    global _timeouts
+    with _lock:
+        _timeouts += 1
+
+
+def _record_stages(timings: Dict[str, float]):
+    global _stage_jobs
+    with _lock:
+        _stage_jobs += 1
+        for k in STAGES:
+            _stage_ms_total[k] += timings.get(k, 0.0)
+
+
+def _decode(audio: Any) -> np.ndarray:
+    """경로 / 파일 객체 → 16kHz mono float32 (faster-whisper 내부와 같은 디코더)"""
+    from faster_whisper import decode_audio
+    if hasattr(audio, "seek"):
+        audio.seek(0)
+    return decode_audio(audio, sampling_rate=STT_SAMPLE_RATE)
+
+
+def _decode_job(audio: Any, enqueued: float, deadline: float, timings: Dict[str, float], close: bool) -> np.ndarray:
+    try:
+        t0 = time.perf_counter()
+        timings["queue_ms"] = (t0 - enqueued) * 1000.0
+        if time.monotonic() > deadline:
+            raise SttTimeout("timed out while queued")
+        out = _decode(audio)
+        timings["decode_ms"] = (time.perf_counter() - t0) * 1000.0
+        # 디코딩은 중간에 멈출 수 없으므로 끝난 뒤 확인 (마감을 넘긴 결과는 버림)
+        if time.monotonic() > deadline:
+            raise SttTimeout(f"decoding exceeded {STT_TIMEOUT_SEC:.0f}s")
+        return out
+    except SttTimeout:
+        _count_timeout()
+        raise
+    finally:
+        if close:
+            audio.close()
+
+
+async def decode(
+    audio: Any,
+    timings: Optional[Dict[str, float]] = None,
+    close: bool = False,
+    timeout: float = STT_TIMEOUT_SEC,
+) -> np.ndarray:
+    """
+    디코딩만 워커 풀에서 (길이를 보고 처리 방식을 고를 때). 포화 시 ExecutorSaturated,
+    transcribe() 와 같은 마감을 넘기면 SttTimeout.
+    close=True 면 파일 객체를 워커가 다 읽은 뒤 닫음 (호출자가 먼저 끝나도 워커 소유).
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        fut = get_stt_executor().submit(
+            _decode_job, audio, time.perf_counter(), deadline, timings if timings is not None else {}, close
+        )
+    except BaseException:
+        if close:
+            audio.close()
+        raise
+
+    if close:
+        # 대기열에서 취소된 작업 (타임아웃 / 연결 끊김) 은 실행되지 않으므로 여기서 닫음
+        fut.add_done_callback(lambda f: audio.close() if f.cancelled() else None)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), timeout + 5.0)
+    except asyncio.TimeoutError:
+        # 실행 중이던 작업은 끝나면서 스스로 타임아웃으로 집계함, 아직 대기열이면 여기서 집계
+        if fut.cancel() or fut.cancelled():
+            _count_timeout()
+        raise SttTimeout(f"decoding exceeded {timeout:.0f}s")
+
+
+def _transcribe_job(
+    audio: Any,
+    options: Dict[str, Any],
+    enqueued: float,
+    deadline: float,
+    cleanup: Optional[str],
+    timings: Dict[str, float],
+) -> Tuple[str, Any]:
+    """워커 스레드에서 실행: 디코딩 + 전사 + 세그먼트 소비 (마감 확인), 끝나면 임시 파일 삭제"""
+    try:
+        t0 = time.perf_counter()
+        # decode() 를 먼저 거쳤으면 두 번의 대기 시간을 합산
+        timings["queue_ms"] = timings.get("queue_ms", 0.0) + (t0 - enqueued) * 1000.0
+        if time.monotonic() > deadline:
+            raise SttTimeout("timed out while queued")
+
+        # 경로 / 파일 객체는 여기서 디코딩 (decode() 로 미리 디코딩한 배열이면 그 시간 유지)
+        if not isinstance(audio, np.ndarray):
+            audio = _decode(audio)
+            timings["decode_ms"] = (time.perf_counter() - t0) * 1000.0
+        t1 = time.perf_counter()
+
+        # transcribe() 호출 자체는 VAD + 특징 추출 (+ 언어 감지), 빔 서치는 세그먼트를 꺼낼 때
+        segments, info = get_model().transcribe(audio, **options)
+        t2 = time.perf_counter()
+        timings["vad_ms"] = (t2 - t1) * 1000.0
+
+        parts = []
+        for seg in segments:
+            parts.append(seg.text)
+            if time.monotonic() > deadline:
+                raise SttTimeout(f"transcription exceeded {STT_TIMEOUT_SEC:.0f}s")
+        timings["beam_ms"] = (time.perf_counter() - t2) * 1000.0
+        _record_stages(timings)
+        return "".join(parts).strip(), info
+    except SttTimeout:
+        _count_timeout()
+        raise
+    finally:
+        if cleanup:
+            try:
+                os.unlink(cleanup)
+            except OSError:
+                pass
+
+
+async def transcribe(
+    audio: Any,
+    cleanup: Optional[str] = None,
+    timeout: float = STT_TIMEOUT_SEC,
+    timings: Optional[Dict[str, float]] = None,
+    **options,
+) -> Tuple[str, Any]:
+    """
+    STT 워커 풀에서 전사 → (text, info).
+    - audio   : 파일 경로 / 파일 객체 / 16kHz float32 배열
+    - cleanup : 작업이 끝나면 지울 임시 파일 경로 (타임아웃 후에도 워커가 정리)
+    - timings : 넘기면 단계별 시간(queue_ms / decode_ms / vad_ms / beam_ms)을 채워 줌
+    풀이 가득 차면 ExecutorSaturated, 마감을 넘기면 SttTimeout.
+    """
+    deadline = time.monotonic() + timeout
+    fut = get_stt_executor().submit(
+        _transcribe_job, audio, options, time.perf_counter(), deadline, cleanup,
+        timings if timings is not None else {},
+    )
+    try:
+        # 세그먼트 하나가 오래 걸려도 응답은 마감 + 여유 시간 안에 돌려줌
+        return await asyncio.wait_for(asyncio.wrap_future(fut), timeout + 5.0)
+    except asyncio.TimeoutError:
+        # 실행 중이던 작업은 다음 세그먼트에서 스스로 멈추고 정리함 (타임아웃 집계도 거기서).
+        # 대기열에서 취소된 작업은 실행되지 않으므로 여기서 정리
+        if fut.cancelled():
+            _count_timeout()
+            if cleanup:
+                try:
+                    os.unlink(cleanup)
+                except OSError:
+                    pass
+        raise SttTimeout(f"transcription exceeded {timeout:.0f}s")
+
+
+def stt_stats() -> Dict[str, Any]:
+    with _lock:
+        timeouts = _timeouts
+        stages = {
+            f"avg_{k}": (_stage_ms_total[k] / _stage_jobs) if _stage_jobs else 0.0 for k in STAGES
+        }
+    return {
+        "loaded": _model is not None,
+        "timeout_sec": STT_TIMEOUT_SEC,
+        "timeouts": timeouts,
+        # 단계별 평균 (queue / decode / vad / beam)
+        "stages": stages,
+        # avg_wait_ms = 대기열 대기 시간, avg_run_ms = 전사 시간
+        **get_stt_executor().stats(),
+    }
@@ -0,0 +1,223 @@
+# fastapi_app/services/stt_stream.py
+"""
+/stt/stream (WebSocket) 용 스트리밍 STT
+
+녹음이 끝난 뒤 .m4a 전체를 올리고 전체 디코딩을 기다리는 대신,
+말하는 동안 PCM16 청크를 받아서
+  - 에너지(RMS) 기반 VAD 로 발화 구간을 나누고
+  - 발화가 이어지는 동안 STT_STREAM_PARTIAL_MS 마다 열린 구간을 다시 전사해서 partial 로,
+  - 무음이 STT_STREAM_SILENCE_MS 이어지면(또는 STT_STREAM_MAX_SEGMENT_SEC 를 넘으면)
+    구간을 닫고 final 로
+돌려준다. 전사는 전부 stt_pool 워커 풀에서 실행 (같은 faster-whisper 모델).
+체감 지연 ≈ 발화 끝 + 구간 하나 디코딩.
+
+프로토콜:
+  클라이언트 → 서버 : binary = PCM16 little-endian mono (sample_rate 쿼리, 기본 16000)
+                      text   = "end" 또는 {"type": "end"} → 남은 구간 처리 후 done
+  서버 → 클라이언트 : {"type": "partial", "segment": i, "text": ...}
+                      {"type": "final", "segment": i, "text": ..., "start": 초, "end": 초}
+                      {"type": "error", "segment": i, "detail": ..., "retry_after": 초?}
+                        (전사가 밀려서 대기 구간이 STT_STREAM_MAX_PENDING 을 넘으면 그 구간은 버리고 error)
+                      {"type": "done", "text": 전체 텍스트, "segments": n, "duration_sec": 초}
+"""
+
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# =========================
+# 설정
+# =========================
+
+STT_SAMPLE_RATE = 16000                                                      # Whisper 입력
+STT_STREAM_FRAME_MS = int(os.getenv("STT_STREAM_FRAME_MS", "30"))            # VAD 판정 단위
+STT_STREAM_VAD_RMS = float(os.getenv("STT_STREAM_VAD_RMS", "0.015"))         # 발화로 볼 RMS (-1~1 스케일)
+STT_STREAM_SILENCE_MS = int(os.getenv("STT_STREAM_SILENCE_MS", "600"))       # 이만큼 조용하면 구간 종료
+STT_STREAM_MIN_SPEECH_MS = int(os.getenv("STT_STREAM_MIN_SPEECH_MS", "250")) # 이보다 짧은 구간은 버림 (잡음)
+STT_STREAM_PADDING_MS = int(os.getenv("STT_STREAM_PADDING_MS", "200"))       # 발화 앞 여유
+STT_STREAM_MAX_SEGMENT_SEC = float(os.getenv("STT_STREAM_MAX_SEGMENT_SEC", "15"))
+STT_STREAM_PARTIAL_MS = int(os.getenv("STT_STREAM_PARTIAL_MS", "1000"))      # partial 전사 간격 (0 = 끔)
+STT_STREAM_MAX_SEC = float(os.getenv("STT_STREAM_MAX_SEC", "600"))           # 연결 하나의 최대 음성 길이
+STT_STREAM_MAX_PENDING = int(os.getenv("STT_STREAM_MAX_PENDING", "4"))       # 전사 대기 final 구간 수 (연결당)
+
+# 구간은 이미 VAD 로 잘랐으므로 Whisper 쪽 VAD 는 끄고, 짧은 구간이라 빔도 작게
+STREAM_DECODE_OPTIONS = dict(
+    language="ko",
+    beam_size=1,
+    temperature=0.0,
+    vad_filter=False,
+    condition_on_previous_text=False,
+    without_timestamps=True,
+)
+
+# 이벤트: ("partial" | "final", 구간 번호, 오디오(float32), 시작 초, 끝 초)
+Event = Tuple[str, int, np.ndarray, float, float]
+
+
+def pcm16_to_float(data: bytes, sample_rate: int = STT_SAMPLE_RATE) -> np.ndarray:
+    """PCM16 LE mono → float32 (-1~1), 16kHz 가 아니면 선형 보간으로 리샘플"""
+    if len(data) % 2:
+        data = data[:-1]
+    audio = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if sample_rate != STT_SAMPLE_RATE and audio.size:
+        n = int(round(audio.size * STT_SAMPLE_RATE / sample_rate))
+        audio = np.interp(
+            np.linspace(0, audio.size - 1, n, dtype=np.float64),
+            np.arange(audio.size),
+            audio,
+        ).astype(np.float32)
+    return audio
+
+
+class StreamSegmenter:
+    """
+    16kHz float32 오디오를 받아서 발화 구간 이벤트를 만든다 (모델 호출 없음).
+    feed() / flush() 가 돌려주는 이벤트를 호출자가 순서대로 전사하면 된다.
+    """
+
+    def __init__(
+        self,
+        vad_rms: float = STT_STREAM_VAD_RMS,
+        frame_ms: int = STT_STREAM_FRAME_MS,
+        silence_ms: int = STT_STREAM_SILENCE_MS,
+        min_speech_ms: int = STT_STREAM_MIN_SPEECH_MS,
+        padding_ms: int = STT_STREAM_PADDING_MS,
+        max_segment_sec: float = STT_STREAM_MAX_SEGMENT_SEC,
+        partial_ms: int = STT_STREAM_PARTIAL_MS,
+    ):
+        sr = STT_SAMPLE_RATE
+        self.vad_rms = vad_rms
+        self.frame = max(1, sr * frame_ms // 1000)
+        self.silence_frames = max(1, silence_ms // max(1, frame_ms))
+        self.min_speech = sr * min_speech_ms // 1000
+        self.padding = sr * padding_ms // 1000
+        self.max_segment = int(sr * max_segment_sec)
+        self.partial_every = sr * partial_ms // 1000 if partial_ms > 0 else 0
+
+        self._pending = np.zeros(0, dtype=np.float32)   # 프레임 단위로 아직 못 자른 꼬리
+        self._preroll = np.zeros(0, dtype=np.float32)   # 발화 전 최근 padding 만큼
+        self._segment: List[np.ndarray] = []            # 열린 구간의 프레임들
+        self._segment_len = 0
+        self._segment_start = 0                         # 샘플 위치
+        self._speech_len = 0                            # 구간 안 발화 프레임 길이
+        self._silent_run = 0                            # 연속 무음 프레임 수
+        self._last_partial = 0
+        self._consumed = 0                              # 지금까지 처리한 샘플 수
+        self.segments = 0                               # 닫힌(final) 구간 수
+
+    @property
+    def duration_sec(self) -> float:
+        return (self._consumed + self._pending.size) / STT_SAMPLE_RATE
+
+    def _close(self) -> Optional[Event]:
+        audio = np.concatenate(self._segment) if self._segment else np.zeros(0, dtype=np.float32)
+        start = self._segment_start / STT_SAMPLE_RATE
+        speech = self._speech_len
+        self._segment, self._segment_len = [], 0
+        self._speech_len = self._silent_run = self._last_partial = 0
+        if speech < self.min_speech:
+            return None
+        idx = self.segments
+        self.segments += 1
+        return ("final", idx, audio, start, start + audio.size / STT_SAMPLE_RATE)
+
+    def _frame(self, frame: np.ndarray) -> Optional[Event]:
+        voiced = float(np.sqrt(np.mean(frame * frame))) >= self.vad_rms
+        pos = self._consumed
+        self._consumed += frame.size
+
+        if not self._segment:
+            if not voiced:
+                self._preroll = np.concatenate([self._preroll, frame])[-self.padding:] if self.padding else self._preroll
+                return None
+            # 발화 시작: 앞 여유분부터 구간을 연다
+            self._segment = [self._preroll] if self._preroll.size else []
+            self._segment_len = self._preroll.size
+            self._segment_start = pos - self._preroll.size
+            self._preroll = np.zeros(0, dtype=np.float32)
+
+        self._segment.append(frame)
+        self._segment_len += frame.size
+        if voiced:
+            self._speech_len += frame.size
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+
+        if self._silent_run >= self.silence_frames or self._segment_len >= self.max_segment:
+            return self._close()
+        if self.partial_every and self._segment_len - self._last_partial >= self.partial_every:
+            self._last_partial = self._segment_len
+            if self._speech_len >= self.min_speech:
+                start = self._segment_start / STT_SAMPLE_RATE
+                return ("partial", self.segments, np.concatenate(self._segment), start,
+                        start + self._segment_len / STT_SAMPLE_RATE)
+        return None
+
+    def feed(self, audio: np.ndarray) -> List[Event]:
+        buf = np.concatenate([self._pending, audio]) if self._pending.size else audio
+        n = buf.size // self.frame * self.frame
+        self._pending = buf[n:]
+        events = []
+        for i in range(0, n, self.frame):
+            ev = self._frame(buf[i : i + self.frame])
+            if ev is not None:
+                events.append(ev)
+        return events
+
+    def flush(self) -> List[Event]:
+        """스트림 끝: 남은 꼬리까지 넣고 열린 구간을 닫는다"""
+        if self._pending.size and self._segment:
+            self._segment.append(self._pending)
+            self._segment_len += self._pending.size
+        self._consumed += self._pending.size
+        self._pending = np.zeros(0, dtype=np.float32)
+        if not self._segment:
+            return []
+        ev = self._close()
+        return [ev] if ev is not None else []
+
+
+class EventQueue:
+    """
+    연결 하나의 전사 대기열. final 은 순서대로 최대 max_pending 개, partial 은 가장 최근 것 하나만
+    (더 새 partial 이 오면 덮어씀). final 이 밀려 있으면 final 먼저.
+    """
+
+    def __init__(self, max_pending: int = STT_STREAM_MAX_PENDING):
+        self.max_pending = max(1, max_pending)
+        self._finals: List[Event] = []
+        self._partial: Optional[Event] = None
+        self._closed = False
+        self._wake = asyncio.Event()
+
+    def put(self, ev: Event) -> bool:
+        """넣었으면 True, final 대기열이 꽉 찼으면 False (호출자가 버리고 알림)"""
+        if ev[0] == "partial":
+            self._partial = ev
+        elif len(self._finals) >= self.max_pending:
+            return False
+        else:
+            self._finals.append(ev)
+        self._wake.set()
+        return True
+
+    def close(self):
+        """남은 이벤트를 다 꺼내면 get() 이 None 을 돌려줌"""
+        self._closed = True
+        self._wake.set()
+
+    async def get(self) -> Optional[Event]:
+        while True:
+            if self._finals:
+                return self._finals.pop(0)
+            if self._partial is not None:
+                ev, self._partial = self._partial, None
+                return ev
+            if self._closed:
+                return None
+            self._wake.clear()
+            await self._wake.wait()
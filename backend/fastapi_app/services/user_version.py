@@ -0,0 +1,110 @@
+# fastapi_app/services/user_version.py
+"""
+유저별 데이터 버전 (user_data_versions) + ETag
+
+- bump_versions   : 쓰기 트랜잭션 안에서 해당 유저들의 버전을 +1 (commit 은 호출 쪽)
+- bump_data_epoch : 유저를 가리지 않는 일괄 작업(롤업 백필 / 데이터를 바꾸는 마이그레이션)용 전역 epoch +1
+- get_version     : PK 조회 1번 (유저 버전 + 전역 epoch, 행이 없으면 0) → "e{epoch}v{version}"
+- etag_for / is_not_modified : 조회 라우트의 ETag / If-None-Match 처리
+
+bump_versions 를 거치지 않는 일괄 쓰기도 epoch 만 올리면 모든 유저의 ETag 가 바뀌어서
+예전 응답을 캐시한 클라이언트가 304 를 계속 받는 일이 없다.
+"""
+
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from fastapi_app.models.dream import UserDataVersion
+
+
+# 전역 epoch 를 담는 예약 키 (user_data_versions 의 한 행)
+EPOCH_KEY = "__data_epoch__"
+
+
+def _upsert_stmt(dialect_name: str, rows: list):
+    """daily_rollup 과 같은 방식: SQLite / PostgreSQL 은 ON CONFLICT 한 문장"""
+    if dialect_name == "sqlite":
+        dialect_insert = sqlite.insert
+    elif dialect_name == "postgresql":
+        dialect_insert = postgresql.insert
+    else:
+        return None
+
+    T = UserDataVersion
+    stmt = dialect_insert(T).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[T.user_id],
+        set_={"version": T.version + 1},
+    )
+
+
+def _dialect_name(db: Union[Session, Connection]) -> str:
+    return (db.dialect if isinstance(db, Connection) else db.get_bind().dialect).name
+
+
+def _bump(db: Union[Session, Connection], keys: list):
+    stmt = _upsert_stmt(_dialect_name(db), [{"user_id": k, "version": 1} for k in keys])
+    if stmt is not None:
+        db.execute(stmt)
+        return
+
+    # 범용 경로 (행 잠금 후 갱신)
+    T = UserDataVersion
+    for k in keys:
+        cur = db.execute(select(T).where(T.user_id == k).with_for_update()).scalar_one_or_none()
+        if cur is None:
+            db.execute(insert(T).values(user_id=k, version=1))
+        else:
+            db.execute(update(T).where(T.user_id == k).values(version=T.version + 1))
+
+
+def bump_versions(db: Session, user_ids: Iterable[Optional[str]]):
+    """유저들의 버전을 1씩 올림 (같은 유저가 여러 번 있어도 한 번만)."""
+    ids = sorted({u for u in user_ids if u and u != EPOCH_KEY})
+    if ids:
+        _bump(db, ids)
+
+
+def bump_data_epoch(db: Union[Session, Connection]):
+    """전역 epoch +1 → 모든 유저의 ETag 가 바뀜 (commit 은 호출 쪽)"""
+    _bump(db, [EPOCH_KEY])
+
+
+def version_stmt(user_id: str):
+    """버전 조회 SELECT (동기 / 비동기 세션 공용): 유저 행 + epoch 행, PK 조회"""
+    T = UserDataVersion
+    return select(T.user_id, T.version).where(T.user_id.in_([user_id, EPOCH_KEY]))
+
+
+def version_token(rows, user_id: str) -> str:
+    """version_stmt 결과 → "e{epoch}v{version}" (행이 없으면 0)"""
+    versions = dict(rows)
+    return f"e{versions.get(EPOCH_KEY, 0)}v{versions.get(user_id, 0)}"
+
+
+def get_version(db: Session, user_id: str) -> str:
+    return version_token(db.execute(version_stmt(user_id)).all(), user_id)
+
+
+def etag_for(kind: str, version: str) -> str:
+    # 같은 URL(= 같은 user_id / month / date) 안에서만 비교되므로 버전 + 응답 종류면 충분
+    return f'"{kind}-{version}"'
+
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더(쉼표 구분, W/ 약한 비교 허용)에 etag 가 있으면 True"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
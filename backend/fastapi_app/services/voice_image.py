@@ -0,0 +1,93 @@
+# fastapi_app/services/voice_image.py
+"""
+/dreams/voice 의 generate_image=true 후처리 (유료 이미지 생성 API 호출)
+
+- 전용 bounded executor 에서만 실행: 기본 스레드풀 / 추론 풀을 몇십 초씩 잡지 않고,
+  몰리면 (IMAGE_MAX_CONCURRENCY + IMAGE_MAX_QUEUE 초과) 바로 거절
+- 꿈이 저장된 뒤에만 제출 → 분석 / 저장이 실패한 요청에는 호출 비용이 들지 않음
+- Image 행 저장이 실패하면 만들어진 파일은 지움 (어디에도 연결되지 않는 파일을 남기지 않음)
+- 실행 / 실패 / 거절 수와 마지막 에러는 /metrics 의 voice_image 에
+"""
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi_app.db.database import SessionLocal
+from fastapi_app.image_gen.openai_dalle import generate_image_from_prompt
+from fastapi_app.models.image import Image
+from fastapi_app.services.inference_executor import BoundedExecutor, ExecutorSaturated
+from fastapi_app.services.user_version import bump_versions
+
+
+# =========================
+# 설정
+# =========================
+
+IMAGE_MAX_CONCURRENCY = int(os.getenv("IMAGE_MAX_CONCURRENCY", "2"))
+IMAGE_MAX_QUEUE = int(os.getenv("IMAGE_MAX_QUEUE", "8"))
+IMAGE_RETRY_AFTER_SEC = int(os.getenv("IMAGE_RETRY_AFTER_SEC", "10"))
+
+
+@lru_cache(maxsize=1)
+def get_image_executor() -> BoundedExecutor:
+    return BoundedExecutor(
+        "image",
+        max_workers=IMAGE_MAX_CONCURRENCY,
+        max_queue=IMAGE_MAX_QUEUE,
+        retry_after=IMAGE_RETRY_AFTER_SEC,
+    )
+
+
+_lock = threading.Lock()
+_last_error: Optional[str] = None
+
+
+def _remove(path: str):
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
+        print(f">> failed to remove orphan image {path}: {e}")
+
+
+def _generate_and_save(dream_id: int, user_id: str, prompt: str) -> str:
+    path = generate_image_from_prompt(prompt)
+    try:
+        with SessionLocal() as db:
+            db.add(Image(dream_id=dream_id, image_url=path, description=prompt))
+            bump_versions(db, [user_id])  # by-date 응답에 이미지가 추가됨
+            db.commit()
+    except BaseException:
+        # 행이 없으면 파일을 찾을 방법도 없음
+        _remove(path)
+        raise
+    return path
+
+
+def _on_done(dream_id: int, fut):
+    global _last_error
+    e = fut.exception()
+    if e is None:
+        return
+    with _lock:
+        _last_error = f"dream {dream_id}: {type(e).__name__}: {e}"
+    print(f">> voice image for dream {dream_id} failed: {type(e).__name__}: {e}")
+
+
+def submit_image(dream_id: int, user_id: str, prompt: str) -> bool:
+    """저장된 꿈의 이미지 생성을 백그라운드로 제출. 대기열이 꽉 찼으면 False (건너뜀)."""
+    try:
+        fut = get_image_executor().submit(_generate_and_save, dream_id, user_id, prompt)
+    except ExecutorSaturated:
+        print(f">> voice image for dream {dream_id} skipped: image executor is saturated")
+        return False
+    fut.add_done_callback(lambda f: _on_done(dream_id, f))
+    return True
+
+
+def image_stats() -> Dict[str, Any]:
+    with _lock:
+        last_error = _last_error
+    return {**get_image_executor().stats(), "last_error": last_error}
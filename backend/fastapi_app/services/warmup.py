@@ -0,0 +1,145 @@
+# fastapi_app/services/warmup.py
+"""
+서버 시작 시 모델 eager 로딩 + 워밍업
+
+E5 / 분류기 헤드 / Whisper 는 전부 지연 로딩이라 배포 직후 첫 요청이 수 초씩 걸린다.
+startup 에서 백그라운드로 각 모델을 병렬 로딩하고 더미 입력으로 한 번씩 돌려 두고,
+모델별 상태와 로딩/워밍업 시간을 기록해서 /ready 에서 보여준다.
+(/health 는 프로세스 생존 여부, /ready 는 트래픽 받을 준비 여부)
+
+로딩이 실패하면(모델 다운로드 일시 오류 등) WARMUP_RETRIES 번까지 간격을 두 배씩 늘려 가며 다시 시도.
+/ready?models=e5,heads 처럼 라우트 그룹에 필요한 모델만 물어볼 수도 있다
+(예: 분석 전용 인스턴스는 stt 가 실패해도 트래픽을 받음).
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from fastapi_app.services.stt_pool import get_model as get_stt_model
+from fastapi_app.services.dream_analyzer import DreamAnalyzer, _load_e5_classifiers
+from fastapi_app.services.embedding_e5 import encode_texts, get_model_and_tokenizer
+
+
+# - WARMUP_ON_STARTUP=0 이면 워밍업 없이 기존처럼 지연 로딩
+# - WARMUP_MODELS: 워밍업할 모델 목록 (쉼표 구분)
+# - WARMUP_RETRIES / WARMUP_RETRY_BACKOFF_SEC: 실패 시 재시도 횟수 / 첫 대기 (매번 두 배)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "e5,heads,stt").split(",") if m.strip()]
+WARMUP_RETRIES = int(os.getenv("WARMUP_RETRIES", "3"))
+WARMUP_RETRY_BACKOFF_SEC = float(os.getenv("WARMUP_RETRY_BACKOFF_SEC", "2"))
+
+
+# =========================
+# 모델별 로딩 / 워밍업 함수
+# =========================
+
+def _load_e5():
+    get_model_and_tokenizer()
+
+def _warm_e5():
+    # 캐시를 거치면 실제 forward 가 안 돌 수 있으므로 캐시 우회
+    encode_texts(["어젯밤 꿈에서 바닷가를 걸었다."], use_cache=False)
+
+def _load_heads():
+    DreamAnalyzer.get()  # 분류기 헤드 로딩 + 배처 생성
+
+def _warm_heads():
+    with torch.no_grad():
+        _load_e5_classifiers().predict(torch.zeros(2, 768))
+
+def _load_stt():
+    get_stt_model()
+
+def _warm_stt():
+    # 1초 무음 (16kHz mono float32)
+    segments, _ = get_stt_model().transcribe(np.zeros(16000, dtype=np.float32), language="ko", beam_size=1)
+    list(segments)
+
+
+WARMERS: Dict[str, Tuple[Callable[[], Any], Callable[[], Any]]] = {
+    "e5": (_load_e5, _warm_e5),
+    "heads": (_load_heads, _warm_heads),
+    "stt": (_load_stt, _warm_stt),
+}
+
+
+# =========================
+# 상태 기록
+# =========================
+
+_lock = threading.Lock()
+_status: Dict[str, Dict[str, Any]] = {}
+_thread: Optional[threading.Thread] = None
+
+
+def _set(name: str, **fields):
+    with _lock:
+        _status.setdefault(name, {}).update(fields)
+
+
+def _warm_one(name: str):
+    load_fn, warm_fn = WARMERS[name]
+    delay = WARMUP_RETRY_BACKOFF_SEC
+    for attempt in range(1, WARMUP_RETRIES + 2):
+        _set(name, state="loading", attempts=attempt)
+        try:
+            t0 = time.perf_counter()
+            load_fn()
+            t1 = time.perf_counter()
+            _set(name, state="warming", load_sec=round(t1 - t0, 3))
+            warm_fn()
+            t2 = time.perf_counter()
+            _set(name, state="ready", warmup_sec=round(t2 - t1, 3), error=None)
+            print(f">> warm-up {name}: load {t1 - t0:.2f}s, warm {t2 - t1:.2f}s")
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt > WARMUP_RETRIES:
+                _set(name, state="failed", error=error)
+                print(f">> warm-up {name} failed after {attempt} attempts: {e}")
+                return
+            _set(name, state="retrying", error=error)
+            print(f">> warm-up {name} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            delay *= 2
+
+
+def run_warmup(models: Optional[List[str]] = None):
+    """모든 모델을 병렬로 로딩/워밍업 (끝날 때까지 블로킹)."""
+    models = [m for m in (models or WARMUP_MODELS) if m in WARMERS]
+    for name in models:
+        _set(name, state="pending")
+    if not models:
+        return
+    with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="warmup") as pool:
+        list(pool.map(_warm_one, models))
+
+
+def start_warmup(models: Optional[List[str]] = None) -> threading.Thread:
+    """백그라운드 스레드에서 run_warmup 시작 (서버 기동은 막지 않음)."""
+    global _thread
+    models = [m for m in (models or WARMUP_MODELS) if m in WARMERS]
+    # 스레드가 뜨기 전에 /ready 가 호출돼도 not ready 로 보이도록 먼저 등록
+    for name in models:
+        _set(name, state="pending")
+    _thread = threading.Thread(target=run_warmup, args=(models,), name="warmup", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def readiness(required: Optional[List[str]] = None) -> Dict[str, Any]:
+    """required 를 주면 그 모델들만 보고 판단 (워밍업 대상이 아니었던 모델은 not ready)."""
+    with _lock:
+        models = {name: dict(st) for name, st in _status.items()}
+    if required is not None:
+        models = {name: models.get(name, {"state": "not_started"}) for name in required}
+    return {
+        "ready": all(st.get("state") == "ready" for st in models.values()),
+        "models": models,
+    }
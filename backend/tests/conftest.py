@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# backend/ 를 import 경로에 (fastapi_app 패키지)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi_app.db.database import Base  # noqa: E402
+from fastapi_app.db.migrations import run_migrations  # noqa: E402
+import fastapi_app.models.image  # noqa: E402,F401  (images 테이블도 create_all 대상)
+
+
+def _sqlite_engine(tmp_path):
+    return create_engine(f"sqlite:///{(tmp_path / 'test.db').as_posix()}")
+
+
+def _postgres_engine(tmp_path):
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    return create_engine(url)
+
+
+@pytest.fixture(params=[_sqlite_engine, _postgres_engine], ids=["sqlite", "postgresql"])
+def session(request, tmp_path):
+    """create_all + run_migrations 를 거친 DB 세션 (SQLite 임시 파일 / TEST_POSTGRES_URL)"""
+    engine = request.param(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    with Session(engine) as s:
+        yield s
+        s.rollback()
+    engine.dispose()
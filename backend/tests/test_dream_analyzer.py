@@ -0,0 +1,135 @@
+"""
+dream_analyzer: fused 헤드 / 배치 분석 / 마이크로 배처
+
+.pt 분류기와 E5 모델 없이 돌도록 _load_e5_classifiers / encode_texts / model_version 을 stub 으로 바꿈
+"""
+
+import threading
+
+import pytest
+import torch
+
+import fastapi_app.services.dream_analyzer as da
+from fastapi_app.services.dream_analyzer import MLP, FusedE5Heads, MicroBatcher
+
+
+def _mlps(seed: int = 0):
+    torch.manual_seed(seed)
+    return MLP(768, 1).eval(), MLP(768, 3).eval()
+
+
+def _fake_encode(texts, **kwargs):
+    # 텍스트마다 고정된 (배치 구성과 무관한) 임베딩
+    return torch.stack([torch.randn(768, generator=torch.Generator().manual_seed(len(t) * 7919 + sum(map(ord, t)))) for t in texts])
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    val, fac = _mlps()
+    heads = FusedE5Heads.from_mlps([val, fac]).eval()
+    monkeypatch.setattr(da, "_load_e5_classifiers", lambda: heads)
+    monkeypatch.setattr(da, "encode_texts", _fake_encode)
+    monkeypatch.setattr(da, "model_version", lambda: "test-version")
+    return val, fac
+
+
+@torch.no_grad()
+def test_fused_heads_match_separate_mlps():
+    val, fac = _mlps()
+    fused = FusedE5Heads.from_mlps([val, fac]).eval()
+    x = torch.randn(5, 768)
+
+    probs, labels = fused.predict(x)
+    expected = torch.sigmoid(torch.cat([val(x), fac(x)], dim=1))
+    torch.testing.assert_close(probs, expected)
+    assert torch.equal(labels, (expected > 0.5).to(torch.int64))
+
+
+@torch.no_grad()
+def test_fused_heads_from_state_dicts():
+    val, fac = _mlps(seed=1)
+    fused = FusedE5Heads.from_state_dicts(val.state_dict(), fac.state_dict()).eval()
+    x = torch.randn(3, 768)
+    torch.testing.assert_close(fused(x), torch.cat([val(x), fac(x)], dim=1))
+
+
+def test_batch_analysis_matches_single(stub_models):
+    texts = ["쫓기는 꿈", "친구와 바다", "시험에 늦음"]
+    batch = da.analyze_dreams_with_e5(texts)
+    single = [da.analyze_dream_with_e5(t) for t in texts]
+
+    assert len(batch) == len(texts)
+    for b, s in zip(batch, single):
+        assert b["model_version"] == "test-version"
+        assert b["facets"]["labels"] == s["facets"]["labels"]
+        assert b["valence"]["label"] == s["valence"]["label"]
+        assert b["valence"]["positive"] == pytest.approx(s["valence"]["positive"], abs=1e-6)
+        for name in da.FACETS:
+            assert b["facets"]["probs"][name] == pytest.approx(s["facets"]["probs"][name], abs=1e-6)
+
+
+def test_batch_analysis_probabilities(stub_models):
+    val, fac = stub_models
+    (res,) = da.analyze_dreams_with_e5(["하늘을 나는 꿈"])
+    x = _fake_encode(["하늘을 나는 꿈"])
+    with torch.no_grad():
+        p_neg = torch.sigmoid(val(x)).item()
+        p_fac = torch.sigmoid(fac(x))[0].tolist()
+
+    assert res["valence"]["negative"] == pytest.approx(p_neg, abs=1e-6)
+    assert res["valence"]["positive"] == pytest.approx(1.0 - p_neg, abs=1e-6)
+    assert [res["facets"]["probs"][n] for n in da.FACETS] == pytest.approx(p_fac, abs=1e-6)
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def batch_fn(items):
+        calls.append(list(items))
+        started.set()
+        release.wait(5)
+        return [x * 10 for x in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50, name="test-batcher")
+    # 첫 배치가 도는 동안 쌓인 요청들은 다음 배치 하나로 묶여야 함
+    first = batcher.submit(0)
+    assert started.wait(5)
+    rest = [batcher.submit(i) for i in range(1, 6)]
+    release.set()
+
+    assert first.result(5) == 0
+    assert [f.result(5) for f in rest] == [10, 20, 30, 40, 50]
+    assert calls == [[0], [1, 2, 3, 4, 5]]
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["items"] == 6 and stats["max_batch_size_seen"] == 5
+
+
+def test_micro_batcher_respects_max_batch_size():
+    sizes = []
+    gate = threading.Event()
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        gate.wait(5)
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_ms=50, name="test-batcher")
+    futures = [batcher.submit(i) for i in range(7)]
+    gate.set()
+    assert [f.result(5) for f in futures] == list(range(7))
+    assert max(sizes) <= 3 and sum(sizes) == 7
+
+
+def test_micro_batcher_propagates_errors():
+    def batch_fn(items):
+        if "bad" in items:
+            raise ValueError("boom")
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=0, name="test-batcher")
+    with pytest.raises(ValueError, match="boom"):
+        batcher("bad")
+    # 실패한 배치 뒤에도 워커는 계속 동작
+    assert batcher("ok") == "ok"
+    assert batcher.stats()["errors"] == 1
@@ -0,0 +1,115 @@
+"""
+NDJSON 내보내기 → 가져오기 왕복: 꿈 / 분석 / 이미지 / 최신 분석 포인터 / 롤업이 그대로 옮겨지는지
+"""
+
+import json
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+
+from fastapi_app.models.dream import Dream, DreamAnalysis, DreamDailyEmotion
+from fastapi_app.models.image import Image
+from fastapi_app.services.dream_transfer import RecordError, export_lines, import_lines, parse_line
+
+DAY = date(2025, 11, 3)
+
+
+def _result(pos: float) -> dict:
+    return {
+        "valence": {"positive": pos, "negative": 1.0 - pos},
+        "facets": {"labels": {"aggression": 1}, "probs": {"aggression": 0.7}},
+        "nlg_notes": ["note"],
+        "model_version": "v-test",
+    }
+
+
+@pytest.fixture
+def source(session):
+    """u 의 꿈 3개: 분석 2개(두 번째가 최신) + 이미지 / 분석 1개 / 분석 없음"""
+    created = datetime(2025, 11, 3, 8, 0, 0)
+    d1 = Dream(input_type="text", text="쫓기는 꿈", user_id="u", date=DAY, created_at=created)
+    d2 = Dream(input_type="voice", text="바다", stt_text="바다", user_id="u", date=DAY, created_at=created)
+    d3 = Dream(input_type="text", text="분석 없는 꿈", user_id="u", date=DAY, created_at=created)
+    session.add_all([d1, d2, d3])
+    session.flush()
+
+    old = DreamAnalysis.from_result(d1.id, _result(0.1))
+    new = DreamAnalysis.from_result(d1.id, _result(0.9))
+    only = DreamAnalysis.from_result(d2.id, _result(0.5))
+    session.add_all([old, new, only])
+    session.flush()
+    d1.latest_analysis_id, d2.latest_analysis_id = new.id, only.id
+    session.add(Image(dream_id=d1.id, image_url="/generated/a.png", description="바다 그림", created_at=created))
+    session.commit()
+    return session
+
+
+def _records(lines):
+    return [json.loads(line) for line in lines][1:]
+
+
+def test_roundtrip_to_other_user(source):
+    session = source
+    exported = list(export_lines(session, "u", batch_size=2))
+    assert json.loads(exported[0])["type"] == "header"
+    assert len(exported) == 4
+
+    calls = []
+
+    def analyze_many(texts):
+        calls.append(texts)
+        return [_result(0.3) for _ in texts]
+
+    summary = import_lines(session, exported, mode="missing", user_id="copy", analyze_many=analyze_many, batch_size=2)
+    assert summary == {"dreams": 3, "analyses": 4, "images": 1, "inferred": 1, "errors": []}
+    # 분석이 없던 꿈만 추론
+    assert calls == [["분석 없는 꿈"]]
+
+    original = _records(export_lines(session, "u"))
+    copied = _records(export_lines(session, "copy"))
+    for rec in copied:
+        assert rec["dream"].pop("user_id") == "copy"
+    for rec in original:
+        rec["dream"].pop("user_id")
+    # 추론으로 새로 생긴 분석 외에는 그대로 (created_at 은 새로 찍힘)
+    inferred = copied[2]["analyses"]
+    assert len(inferred) == 1 and inferred[0]["latest"] and inferred[0]["pos_prob"] == pytest.approx(0.3)
+    assert copied[:2] == original[:2]
+    assert copied[2]["dream"] == original[2]["dream"]
+
+    # 롤업은 꿈마다 최신 분석 하나씩: 0.9 + 0.5 + 0.3
+    rollup = session.execute(
+        select(DreamDailyEmotion).where(DreamDailyEmotion.user_id == "copy")
+    ).scalar_one()
+    assert rollup.day == DAY
+    assert rollup.dream_count == 3
+    assert rollup.pos_sum == pytest.approx(1.7)
+
+    latest = session.execute(
+        select(DreamAnalysis.pos_prob)
+        .join(Dream, Dream.latest_analysis_id == DreamAnalysis.id)
+        .where(Dream.user_id == "copy")
+        .order_by(Dream.id)
+    ).scalars().all()
+    assert latest == pytest.approx([0.9, 0.5, 0.3])
+    assert session.query(Image).join(Dream).filter(Dream.user_id == "copy").count() == 1
+
+
+def test_import_reports_bad_lines(session):
+    lines = [
+        '{"type":"header","format":"dreams-ndjson","version":1}',
+        "not json",
+        '{"type":"dream","dream":{"text":""}}',
+        '{"type":"dream","dream":{"text":"꿈","user_id":"u","date":"2025-11-03"},"analyses":[]}',
+        "",
+    ]
+    summary = import_lines(session, lines, mode="none")
+    assert summary["dreams"] == 1 and summary["inferred"] == 0
+    assert [e["line"] for e in summary["errors"]] == [2, 3]
+
+
+def test_parse_line_rejects_unknown_format():
+    with pytest.raises(RecordError):
+        parse_line('{"type":"header","format":"dreams-ndjson","version":99}')
+    assert parse_line("   ") is None
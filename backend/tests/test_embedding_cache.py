@@ -0,0 +1,102 @@
+"""
+E5 임베딩 캐시: 메모리 / 디스크 적중, 텍스트 정규화, 디스크 한도 초과 시 초기화
+"""
+
+import numpy as np
+import torch
+
+from fastapi_app.services.embedding_cache import DiskStore, EmbeddingCache, cache_key
+
+DIM = 4
+
+
+class Encoder:
+    """compute_fn: 호출된 텍스트를 기록하고 텍스트 길이로 만든 벡터를 돌려줌"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return torch.tensor([[float(len(t)), 1.0, 2.0, 3.0] for t in texts])
+
+
+def _vec(x: float) -> np.ndarray:
+    return np.full(DIM, x, dtype=np.float32)
+
+
+def test_memory_hit_and_dedupe(tmp_path):
+    cache = EmbeddingCache("m", dim=DIM, disk_dir=tmp_path)
+    enc = Encoder()
+
+    first = cache.get_or_compute(["a", "bb", "a"], enc)
+    # 같은 배치 안의 중복은 한 번만 인코딩
+    assert enc.calls == [["a", "bb"]]
+    assert first[:, 0].tolist() == [1.0, 2.0, 1.0]
+
+    again = cache.get_or_compute(["bb", "ccc"], enc)
+    assert enc.calls[-1] == ["ccc"]
+    assert again[:, 0].tolist() == [2.0, 3.0]
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 3)
+
+
+def test_normalized_text_shares_key():
+    assert cache_key("  꿈을\n\n꾸었다 ", "m") == cache_key("꿈을 꾸었다", "m")
+    assert cache_key("꿈", "m") != cache_key("꿈", "other-model")
+
+
+def test_disk_hit_after_restart(tmp_path):
+    enc = Encoder()
+    EmbeddingCache("m", dim=DIM, disk_dir=tmp_path).get_or_compute(["a", "bb"], enc)
+
+    # 새 프로세스처럼 메모리가 빈 캐시 → 디스크에서 읽고 인코딩은 안 함
+    cache = EmbeddingCache("m", dim=DIM, disk_dir=tmp_path)
+    out = cache.get_or_compute(["bb", "a"], enc)
+    assert len(enc.calls) == 1
+    assert out[:, 0].tolist() == [2.0, 1.0]
+    assert cache.stats()["disk_hits"] == 2
+
+    # 다른 모델 이름은 다른 네임스페이스
+    EmbeddingCache("other", dim=DIM, disk_dir=tmp_path).get_or_compute(["a"], enc)
+    assert enc.calls[-1] == ["a"]
+
+
+def test_memory_only_cache():
+    cache = EmbeddingCache("m", dim=DIM, capacity=1, disk_dir=None)
+    enc = Encoder()
+    cache.get_or_compute(["a"], enc)
+    cache.get_or_compute(["bb"], enc)  # 용량 1 → "a" 는 밀려남
+    cache.get_or_compute(["a"], enc)
+    assert enc.calls == [["a"], ["bb"], ["a"]]
+    assert cache.stats()["disk_size"] is None
+
+
+def test_disk_store_resets_when_full(tmp_path):
+    store = DiskStore(tmp_path, "ns", DIM, max_entries=3)
+    store.put_many({"k1": _vec(1), "k2": _vec(2)})
+    store.put_many({"k2": _vec(2)})  # 이미 있는 키는 다시 쓰지 않음
+    assert len(store) == 2 and store.resets == 0
+
+    store.put_many({"k3": _vec(3), "k4": _vec(4)})  # 2 + 2 > 3 → 비우고 새로 씀
+    assert store.resets == 1
+    assert len(store) == 2
+    got = store.get_many(["k1", "k3", "k4"])
+    assert set(got) == {"k3", "k4"}
+    np.testing.assert_array_equal(got["k4"], _vec(4))
+    assert store.vec_path.stat().st_size == 2 * DIM * 4
+
+
+def test_disk_reset_seen_by_other_store(tmp_path):
+    # 같은 디렉터리를 쓰는 다른 워커: 초기화(파일 교체)를 inode 로 알아채고 인덱스를 다시 만듦
+    a = DiskStore(tmp_path, "ns", DIM, max_entries=2)
+    b = DiskStore(tmp_path, "ns", DIM, max_entries=2)
+    a.put_many({"k1": _vec(1), "k2": _vec(2)})
+    assert set(b.get_many(["k1", "k2"])) == {"k1", "k2"}
+
+    a.put_many({"k3": _vec(3)})
+    assert a.resets == 1
+    got = b.get_many(["k1", "k3"])
+    assert set(got) == {"k3"}
+    np.testing.assert_array_equal(got["k3"], _vec(3))
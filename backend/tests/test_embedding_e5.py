@@ -0,0 +1,87 @@
+"""
+E5 인코딩: 길이 버킷 / 슬라이딩 윈도우 분할, 버킷 인코딩이 원래 순서와 값을 유지하는지
+
+실제 E5 대신 토큰 id 를 임베딩하는 작은 모델 + pad 만 하는 토크나이저로 확인
+"""
+
+from types import SimpleNamespace
+
+import pytest
+import torch
+from transformers import BatchEncoding
+
+from fastapi_app.services.embedding_e5 import _encode_ids_bucketed, make_length_buckets, split_windows
+
+
+@pytest.mark.parametrize("lengths", [
+    [5, 100, 7, 6, 98, 3, 250, 5],
+    [10] * 20,
+    [1],
+    [],
+])
+def test_length_buckets_cover_every_index_once(lengths):
+    buckets = make_length_buckets(lengths, max_waste=0.2, max_tokens=1024)
+    flat = [i for b in buckets for i in b]
+    assert sorted(flat) == list(range(len(lengths)))
+    for b in buckets:
+        longest = max(lengths[i] for i in b)
+        real = sum(lengths[i] for i in b)
+        assert len(b) * longest <= 1024 or len(b) == 1
+        assert 1.0 - real / (len(b) * longest) <= 0.2 or len(b) == 1
+
+
+def test_length_buckets_split_short_and_long():
+    lengths = [5, 100, 6, 98, 5]
+    buckets = make_length_buckets(lengths, max_waste=0.2, max_tokens=10_000)
+    assert [sorted(b) for b in buckets] == [[0, 2, 4], [1, 3]]
+
+
+@pytest.mark.parametrize("n_tokens, body, stride", [
+    (10, 254, 192),
+    (254, 254, 192),
+    (600, 254, 192),
+    (1000, 254, 254),
+    (5000, 254, 100),
+])
+def test_split_windows_cover_all_tokens(n_tokens, body, stride):
+    windows = split_windows(n_tokens, body, stride, max_windows=32)
+    assert windows[0][0] == 0
+    assert windows[-1][1] == n_tokens
+    assert len(windows) <= 32
+    assert all(end - start == min(body, n_tokens) for start, end in windows)
+    starts = [s for s, _ in windows]
+    assert starts == sorted(set(starts))
+    if len(windows) < 32:
+        # 제한에 걸리지 않았으면 윈도우 사이에 빈틈이 없음
+        assert all(nxt <= end for (_, end), (nxt, _) in zip(windows, windows[1:]))
+
+
+class _Tokenizer:
+    def pad(self, batch, padding=True, return_tensors="pt"):
+        ids = batch["input_ids"]
+        width = max(len(x) for x in ids)
+        return BatchEncoding({
+            "input_ids": torch.tensor([x + [0] * (width - len(x)) for x in ids]),
+            "attention_mask": torch.tensor([[1] * len(x) + [0] * (width - len(x)) for x in ids]),
+        })
+
+
+class _Model(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.emb = torch.nn.Embedding(50, 8)
+        self.device = torch.device("cpu")
+
+    def forward(self, input_ids, attention_mask):
+        return SimpleNamespace(last_hidden_state=self.emb(input_ids))
+
+
+def test_bucketed_encoding_matches_one_by_one():
+    tok, model = _Tokenizer(), _Model()
+    ids = [[1, 2, 3], [4] * 40, [5, 6], [7] * 38, [8]]
+
+    out = _encode_ids_bucketed(tok, model, ids)
+    expected = torch.cat([_encode_ids_bucketed(tok, model, [x]) for x in ids])
+    assert out.shape == (len(ids), 8)
+    torch.testing.assert_close(out, expected)
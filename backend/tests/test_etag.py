@@ -0,0 +1,79 @@
+"""
+캘린더 조회 ETag: 같은 버전이면 If-None-Match 로 304, 쓰기(유저 버전 / 전역 epoch +1) 뒤에는 200 + 새 ETag
+"""
+
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from fastapi_app.api import dreams as dreams_api
+from fastapi_app.db.session import get_db
+from fastapi_app.services.daily_rollup import add_to_rollup
+from fastapi_app.services.user_version import bump_data_epoch, bump_versions
+
+DAY = date(2025, 11, 3)
+CALENDAR = "/dreams/calendar?user_id=u&month=2025-11"
+
+
+@pytest.fixture
+def client(session):
+    make_session = sessionmaker(bind=session.get_bind())
+
+    def override_get_db():
+        with make_session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(dreams_api.router, prefix="/dreams")
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as c:
+        yield c
+
+
+def _write(session, user_id="u", pos=0.8):
+    add_to_rollup(session, [(user_id, DAY, pos, 1.0 - pos)])
+    bump_versions(session, [user_id])
+    session.commit()
+
+
+def test_calendar_not_modified(session, client):
+    _write(session)
+    first = client.get(CALENDAR)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.json()[0]["dream_count"] == 1
+
+    cached = client.get(CALENDAR, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # 약한 비교 / 여러 태그 목록도 허용
+    assert client.get(CALENDAR, headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+
+
+def test_calendar_etag_changes_after_write(session, client):
+    _write(session)
+    etag = client.get(CALENDAR).headers["etag"]
+
+    # 다른 유저의 쓰기는 이 유저의 ETag 에 영향 없음
+    _write(session, user_id="other")
+    assert client.get(CALENDAR, headers={"If-None-Match": etag}).status_code == 304
+
+    _write(session)
+    fresh = client.get(CALENDAR, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()[0]["dream_count"] == 2
+
+
+def test_calendar_etag_changes_after_data_epoch(session, client):
+    _write(session)
+    etag = client.get(CALENDAR).headers["etag"]
+
+    bump_data_epoch(session)
+    session.commit()
+    assert client.get(CALENDAR, headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,67 @@
+"""
+/dreams/history keyset 페이지네이션: cursor 를 따라 끝까지 넘겼을 때 중복 / 누락 없이
+(created_at DESC, id DESC) 순서가 유지되는지 (같은 created_at 이 여러 개인 경계 포함)
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from fastapi_app.api.dreams import _history_page, _history_stmt
+from fastapi_app.models.dream import Dream
+
+
+T1 = datetime(2025, 11, 1, 9, 0, 0)
+T2 = datetime(2025, 11, 2, 9, 0, 0)
+T3 = datetime(2025, 11, 3, 9, 0, 0, 123456)
+
+
+def _add(session, created_at, user_id="u"):
+    dream = Dream(input_type="text", input_text="x", text="꿈", user_id=user_id, created_at=created_at)
+    session.add(dream)
+    session.flush()
+    return dream.id
+
+
+def _walk(session, user_id: str, limit: int):
+    dialect = session.get_bind().dialect.name
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = _history_page(session.execute(_history_stmt(dialect, user_id, cursor, limit)).all(), limit)
+        ids.extend(item.id for item in page.items)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.fixture
+def dreams(session):
+    """같은 created_at 3개(T2)를 포함한 7개 + 다른 유저 1개 → 기대 순서 반환"""
+    t1 = [_add(session, T1) for _ in range(2)]
+    t2 = [_add(session, T2) for _ in range(3)]
+    t3 = [_add(session, T3) for _ in range(1)]
+    _add(session, T2, user_id="other")
+    # server_default(CURRENT_TIMESTAMP) 로 들어간 행: SQLite 에서 마이크로초 없는 형식으로 저장됨
+    session.execute(insert(Dream).values(input_type="text", text="꿈", user_id="u"))
+    now_id = session.query(Dream.id).order_by(Dream.id.desc()).limit(1).scalar()
+    session.commit()
+    return [now_id] + sorted(t3, reverse=True) + sorted(t2, reverse=True) + sorted(t1, reverse=True)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_history_walk_has_no_duplicates_or_gaps(session, dreams, limit):
+    ids, pages = _walk(session, "u", limit)
+    assert ids == dreams
+    assert pages == max(1, -(-len(dreams) // limit))
+
+
+def test_history_cursor_splits_equal_created_at(session, dreams):
+    # limit=4 면 첫 페이지가 T2 세 개 중간에서 끝남 → 다음 페이지가 나머지 T2 부터 이어져야 함
+    dialect = session.get_bind().dialect.name
+    first = _history_page(session.execute(_history_stmt(dialect, "u", None, 4)).all(), 4)
+    second = _history_page(session.execute(_history_stmt(dialect, "u", first.next_cursor, 4)).all(), 4)
+    assert [i.id for i in first.items] == dreams[:4]
+    assert [i.id for i in second.items] == dreams[4:]
+    assert second.next_cursor is None
@@ -0,0 +1,77 @@
+"""
+조회 쿼리가 풀스캔이 아니라 인덱스 범위 스캔을 쓰는지 (EXPLAIN) 확인
+
+- SQLite: 임시 파일 DB 에 create_all + run_migrations 후 EXPLAIN QUERY PLAN
+- PostgreSQL: TEST_POSTGRES_URL 이 있을 때만 (없으면 skip)
+DB 세션 fixture 는 conftest.py
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from fastapi_app.api.dreams import _encode_cursor, _history_stmt
+from fastapi_app.models.dream import Dream, DreamAnalysis, DreamDailyEmotion
+
+
+DAY = date(2025, 11, 1)
+NEXT_MONTH = date(2025, 12, 1)
+
+# 쿼리 이름 → (statement 또는 dialect 이름 → statement, 사용돼야 하는 인덱스 이름 후보)
+PLAN_QUERIES = {
+    "by-date": (
+        select(Dream.id).where(Dream.user_id == "u", Dream.date == DAY),
+        ("ix_dreams_user_id_date",),
+    ),
+    "dreams-month-range": (
+        select(Dream.id).where(Dream.user_id == "u", Dream.date >= DAY, Dream.date < NEXT_MONTH),
+        ("ix_dreams_user_id_date",),
+    ),
+    # /dreams/history 가 실제로 쓰는 문장 (SQLite 는 created_at 을 문자열로 비교) + 두 번째 페이지 cursor
+    "history-page": (
+        lambda dialect: _history_stmt(dialect, "u", _encode_cursor("2025-11-01T00:00:00", 100), 20),
+        ("ix_dreams_user_id_created_at_id",),
+    ),
+    "facet-trend": (
+        select(Dream.date, func.avg(DreamAnalysis.aggression_prob))
+        .join(DreamAnalysis, DreamAnalysis.id == Dream.latest_analysis_id)
+        .where(Dream.user_id == "u", Dream.date >= DAY, Dream.date < NEXT_MONTH)
+        .group_by(Dream.date),
+        ("ix_dreams_user_id_date",),
+    ),
+    "analyses-by-dream": (
+        select(DreamAnalysis.id).where(DreamAnalysis.dream_id == 1),
+        ("ix_dream_analyses_dream_id",),
+    ),
+    "calendar": (
+        select(DreamDailyEmotion).where(
+            DreamDailyEmotion.user_id == "u",
+            DreamDailyEmotion.day >= DAY,
+            DreamDailyEmotion.day < NEXT_MONTH,
+        ),
+        ("sqlite_autoindex_dream_daily_emotions_1", "dream_daily_emotions_pkey"),
+    ),
+}
+
+
+def _explain(session: Session, stmt) -> str:
+    dialect = session.get_bind().dialect
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    if dialect.name == "sqlite":
+        rows = session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        return "\n".join(str(r[-1]) for r in rows)
+    # PostgreSQL: 테이블이 작으면 seq scan 이 선택되므로 인덱스 사용 가능 여부만 확인
+    session.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = session.execute(text(f"EXPLAIN {compiled}")).all()
+    return "\n".join(r[0] for r in rows)
+
+
+@pytest.mark.parametrize("name", sorted(PLAN_QUERIES))
+def test_query_uses_index(session, name):
+    stmt, indexes = PLAN_QUERIES[name]
+    if callable(stmt):
+        stmt = stmt(session.get_bind().dialect.name)
+    plan = _explain(session, stmt)
+    assert any(ix in plan for ix in indexes), f"{name}: index not used\n{plan}"
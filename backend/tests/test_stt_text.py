@@ -0,0 +1,125 @@
+"""
+STT 후처리 (모델 없이): 병렬 조각 텍스트 잇기 / 스트리밍 VAD 구간 나누기 / 전사 대기열
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from fastapi_app.services.stt_long import join_texts
+from fastapi_app.services.stt_stream import STT_SAMPLE_RATE, EventQueue, StreamSegmenter, pcm16_to_float
+
+SR = STT_SAMPLE_RATE
+
+
+# =========================
+# join_texts
+# =========================
+
+def test_join_texts_dedupes_overlapped_boundary():
+    texts = ["어젯밤 꿈에서 바다를 날았다", "바다를 날았다. 그리고 섬에 내렸다"]
+    assert join_texts(texts, [False, True]) == "어젯밤 꿈에서 바다를 날았다 그리고 섬에 내렸다"
+
+
+def test_join_texts_keeps_repeats_at_silence_boundary():
+    # 무음 경계(겹침 없음)의 반복은 실제로 말한 것일 수 있어서 그대로
+    texts = ["정말 무서웠다", "정말 무서웠다"]
+    assert join_texts(texts, [False, False]) == "정말 무서웠다 정말 무서웠다"
+
+
+def test_join_texts_without_flags_and_empty_parts():
+    assert join_texts(["하나 둘", "", "둘 셋"]) == "하나 둘 셋"
+    assert join_texts([]) == ""
+    assert join_texts(["a b", "c d"], [False, True]) == "a b c d"
+
+
+# =========================
+# StreamSegmenter
+# =========================
+
+def _tone(sec: float, amp: float = 0.3) -> np.ndarray:
+    t = np.arange(int(sec * SR)) / SR
+    return (amp * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(sec: float) -> np.ndarray:
+    return np.zeros(int(sec * SR), dtype=np.float32)
+
+
+def _segmenter(**kwargs):
+    opts = dict(silence_ms=300, min_speech_ms=200, padding_ms=100, max_segment_sec=5, partial_ms=0)
+    opts.update(kwargs)
+    return StreamSegmenter(**opts)
+
+
+def _feed_chunks(seg, audio, chunk=1234):
+    events = []
+    for i in range(0, audio.size, chunk):
+        events.extend(seg.feed(audio[i : i + chunk]))
+    return events + seg.flush()
+
+
+def test_segmenter_splits_on_silence():
+    audio = np.concatenate([_silence(0.5), _tone(1.0), _silence(0.6), _tone(0.8), _silence(0.1)])
+    events = _feed_chunks(_segmenter(), audio)
+
+    assert [(kind, idx) for kind, idx, *_ in events] == [("final", 0), ("final", 1)]
+    (_, _, a0, s0, e0), (_, _, a1, s1, e1) = events
+    # 앞 여유(padding)만큼 발화 시작보다 일찍 열림
+    assert s0 == pytest.approx(0.4, abs=0.03)
+    assert s1 == pytest.approx(2.0, abs=0.03)
+    assert e0 <= s1 and e1 == pytest.approx(audio.size / SR, abs=0.03)
+    assert a0.size == pytest.approx((e0 - s0) * SR, abs=1)
+
+
+def test_segmenter_drops_short_noise_and_caps_length():
+    seg = _segmenter(max_segment_sec=1.0)
+    audio = np.concatenate([_tone(0.05), _silence(0.5), _tone(2.5)])
+    events = _feed_chunks(seg, audio)
+    # 50ms 잡음은 버리고, 2.5초 발화는 1초(프레임 단위로 올림) 이하 구간들로
+    assert all(kind == "final" for kind, *_ in events)
+    assert [idx for _, idx, *_ in events] == list(range(len(events)))
+    assert len(events) == 3
+    assert all(ev[2].size <= SR + seg.frame for ev in events)
+    assert seg.duration_sec == pytest.approx(audio.size / SR)
+
+
+def test_segmenter_partials_before_final():
+    seg = _segmenter(partial_ms=500)
+    events = _feed_chunks(seg, np.concatenate([_tone(1.6), _silence(0.5)]))
+    kinds = [kind for kind, *_ in events]
+    assert kinds == ["partial", "partial", "partial", "final"]
+    assert all(idx == 0 for _, idx, *_ in events)
+
+
+def test_pcm16_resample():
+    pcm = (np.ones(8000, dtype="<i2") * 16384).tobytes()
+    audio = pcm16_to_float(pcm + b"\x00", sample_rate=8000)
+    assert audio.size == SR
+    assert np.allclose(audio, 0.5)
+
+
+# =========================
+# EventQueue
+# =========================
+
+def test_event_queue_order_and_backpressure():
+    empty = np.zeros(0, dtype=np.float32)
+
+    async def run():
+        q = EventQueue(max_pending=2)
+        assert q.put(("partial", 0, empty, 0.0, 1.0))
+        assert q.put(("partial", 0, empty, 0.0, 2.0))  # 더 새 partial 이 덮어씀
+        assert q.put(("final", 0, empty, 0.0, 3.0))
+        assert q.put(("final", 1, empty, 3.0, 4.0))
+        assert not q.put(("final", 2, empty, 4.0, 5.0))  # 꽉 참
+        q.close()
+
+        out = []
+        while (ev := await q.get()) is not None:
+            out.append((ev[0], ev[1], ev[4]))
+        return out
+
+    # final 이 밀려 있으면 final 먼저, partial 은 마지막 것 하나만
+    assert asyncio.run(run()) == [("final", 0, 3.0), ("final", 1, 4.0), ("partial", 0, 2.0)]